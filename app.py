@@ -1,10 +1,14 @@
 
 import streamlit as st
 import re
-from chat import get_agent_response, get_recent_products
+import uuid
+from chat import get_agent_response, stream_agent_response, get_recent_products, get_enrichment_status, clear_session, get_last_turn_trace, get_coalescing_stats, get_upstream_stats, start_enrichment_workers
 
 st.set_page_config(page_title="دستیار خرید هوشمند", layout="wide")
 
+# Resume product enrichment saved before the last restart without waiting for a new search
+start_enrichment_workers()
+
 st.markdown("""
     <style>
     body {
@@ -62,6 +66,8 @@ with st.sidebar:
                             st.write(f"**قیمت:** {product.get('price', 0):,} تومان")
                             st.write(f"**فروشنده:** {product.get('vendor_name', 'نامشخص')}")
                             st.markdown(f'<div class="product-id">شناسه: {product.get("id", "نامشخص")}</div>', unsafe_allow_html=True)
+                            if get_enrichment_status([product.get("id")]).get(product.get("id")) == "ready":
+                                st.caption("📄 جزئیات آماده است")
                             if st.button(f"مشاهده جزئیات", key=f"details_{product.get('id')}"):
                                 st.session_state.show_product_details = product.get('id')
             else:
@@ -96,6 +102,9 @@ st.markdown("سلام! من دستیار خرید شما هستم. محصولا
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
 if "show_product_details" in st.session_state:
     # Show product details if requested from sidebar
     st.info(f"درحال نمایش جزئیات محصول با شناسه: {st.session_state.show_product_details}")
@@ -104,11 +113,33 @@ if "show_product_details" in st.session_state:
     
     try:
         with st.spinner("دریافت جزئیات محصول..."):
-            response = get_agent_response(user_input)
+            response = get_agent_response(user_input, st.session_state.session_id)
         st.markdown(response)
     except Exception as e:
         st.error(f"خطا در دریافت جزئیات: {str(e)}")
 
+def render_streamed_response(user_input):
+    """Render the assistant reply while it streams and return the complete text."""
+    final = {"text": ""}
+
+    def text_chunks():
+        for event in stream_agent_response(user_input, st.session_state.session_id):
+            if event["type"] == "token":
+                yield event["text"]
+            elif event["type"] == "tool_start":
+                status.info(f"🔧 در حال اجرای {event['tool']}...")
+            elif event["type"] == "tool_end":
+                status.empty()
+            elif event["type"] == "final":
+                final["text"] = event["text"]
+
+    st.markdown(f"**شما**: {user_input}")
+    st.markdown("**دستیار**:")
+    status = st.empty()
+    st.write_stream(text_chunks())
+    status.empty()
+    return final["text"]
+
 def is_valid_image_url(url):
     if not url:
         return False
@@ -159,12 +190,56 @@ for message in st.session_state.messages:
             if "💾 محصولات ذخیره شدند!" in message["content"]:
                 st.success("✅ محصولات با موفقیت ذخیره شدند!")
                 # Extract and highlight product IDs
-                product_ids = re.findall(r'[a-f0-9-]{36}', message["content"])
+                product_ids = list(dict.fromkeys(re.findall(r'[a-f0-9-]{36}', message["content"])))
                 if product_ids:
                     st.info(f"🔑 تعداد {len(product_ids)} محصول ذخیره شد. از شناسه‌ها برای دسترسی سریع استفاده کنید.")
+                    statuses = get_enrichment_status(product_ids)
+                    ready = sum(1 for status in statuses.values() if status == "ready")
+                    if statuses and ready == len(statuses):
+                        st.caption("📄 جزئیات همه محصولات آماده است")
+                    elif statuses:
+                        st.caption(f"⏳ جزئیات {ready} از {len(statuses)} محصول آماده است")
         
         st.markdown("---")
 
+def render_timing_waterfall(trace):
+    """Waterfall of the last turn's spans (open the app with ?debug=timing)."""
+    if not trace:
+        return
+    start = trace[0]["start_time_unix_nano"]
+    total = max((s["end_time_unix_nano"] or start) - start for s in trace) or 1
+    depth = {trace[0]["span_id"]: 0}
+    rows = []
+    for s in trace:
+        level = depth.get(s["parent_span_id"], -1) + 1 if s["parent_span_id"] else 0
+        depth[s["span_id"]] = level
+        end = s["end_time_unix_nano"] or start
+        offset = (s["start_time_unix_nano"] - start) / total * 100
+        width = max((end - s["start_time_unix_nano"]) / total * 100, 0.5)
+        color = "#e74c3c" if s["status"] == "ERROR" else "#3498db"
+        rows.append(
+            f'<div style="display:flex;align-items:center;font-size:12px;direction:ltr">'
+            f'<div style="width:35%;padding-left:{level * 12}px;white-space:nowrap;overflow:hidden">{s["name"]}</div>'
+            f'<div style="width:50%;position:relative;height:12px">'
+            f'<div style="position:absolute;left:{offset:.1f}%;width:{width:.1f}%;height:100%;background:{color}"></div></div>'
+            f'<div style="width:15%;text-align:right">{(end - s["start_time_unix_nano"]) / 1e6:.0f}ms</div></div>'
+        )
+    with st.expander("⏱️ زمان‌بندی آخرین نوبت"):
+        st.markdown("".join(rows), unsafe_allow_html=True)
+
+if st.query_params.get("debug") == "timing":
+    render_timing_waterfall(get_last_turn_trace(st.session_state.session_id))
+    with st.expander("🔁 درخواست‌های ادغام‌شده"):
+        for name, stats in get_coalescing_stats().items():
+            st.caption(f"{name}: {stats['upstream']} درخواست واقعی، {stats['coalesced']} ادغام‌شده "
+                       f"({stats['saved_rate']:.0%} صرفه‌جویی)، بیشترین منتظر همزمان: {stats['peak_waiters']}")
+    with st.expander("⚡ وضعیت سرویس‌های باسلام"):
+        state_labels = {"closed": "🟢 عادی", "half_open": "🟡 در حال آزمایش", "open": "🔴 قطع موقت"}
+        for host, stats in get_upstream_stats().items():
+            st.caption(f"{host}: {state_labels[stats['state']]}، سقف همزمانی {stats['concurrency_limit']:g} "
+                       f"({stats['in_flight']} در جریان)، موفق {stats['success']}، ناموفق {stats['failure']}، "
+                       f"ردشده {stats['rejected'] + stats['busy']}")
+
 # Enhanced input area
 col1, col2 = st.columns([4, 1])
 
@@ -221,8 +296,7 @@ if submit_button and user_input:
     st.session_state.messages.append({"role": "user", "content": user_input})
 
     try:
-        with st.spinner("دستیار در حال جستجو و ذخیره محصولات..."):
-            response = get_agent_response(user_input)
+        response = render_streamed_response(user_input)
         st.session_state.messages.append({"role": "assistant", "content": response})
     except Exception as e:
         st.error(f"خطا در دریافت پاسخ: {str(e)}")
@@ -236,6 +310,7 @@ col1, col2, col3 = st.columns(3)
 with col1:
     if st.button("🗑️ پاک کردن تاریخچه"):
         st.session_state.messages = []
+        clear_session(st.session_state.session_id)
         st.rerun()
 
 with col2:
@@ -243,7 +318,7 @@ with col2:
         user_input = "محصولات اخیر من را نشان بده"
         st.session_state.messages.append({"role": "user", "content": user_input})
         try:
-            response = get_agent_response(user_input)
+            response = get_agent_response(user_input, st.session_state.session_id)
             st.session_state.messages.append({"role": "assistant", "content": response})
             st.rerun()
         except Exception as e:
@@ -0,0 +1,59 @@
+"""
+Time to collect N filtered results with the paginated deep search, serial vs. prefetched.
+
+    python -m benchmarks.bench_deep_search
+    python -m benchmarks.bench_deep_search --want 40 --min-rating 4.8 --city تهران --latency 250
+
+Runs iter_search_pages against benchmarks/stub_server.py (whose synthetic
+searches have 60-480 results) for each query, once per --prefetch setting.
+--prefetch 1 is the serial baseline: the next page is requested only after
+the previous one arrived. Reports time to first page, total time, pages
+fetched and products collected.
+"""
+import argparse
+import os
+import statistics
+import time
+
+from benchmarks.stub_server import StubConfig, base_urls, start_server
+
+QUERIES = ["کیف چرم", "کفش ورزشی", "عسل طبیعی", "شال زنانه", "ادویه", "گلیم دستباف", "زعفران", "لیوان سفالی"]
+
+
+def run_query(search, query, args, prefetch):
+    start = time.perf_counter()
+    first_page, pages, products = None, 0, 0
+    for page in search.iter_search_pages(query, min_rating=args.min_rating, vendor_city=args.city, want=args.want,
+                                         max_pages=args.max_pages, budget=args.budget, prefetch=prefetch):
+        if first_page is None:
+            first_page = time.perf_counter() - start
+        pages += 1
+        products += len(page)
+    return first_page or 0.0, time.perf_counter() - start, pages, products
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--want", type=int, default=20)
+    parser.add_argument("--min-rating", type=float, default=4.6)
+    parser.add_argument("--city", default="تبریز")
+    parser.add_argument("--latency", type=float, default=150.0, help="stub server delay per page, ms")
+    parser.add_argument("--jitter", type=float, default=50.0)
+    parser.add_argument("--max-pages", type=int, default=10)
+    parser.add_argument("--budget", type=float, default=6.0)
+    parser.add_argument("--prefetch", type=int, nargs="+", default=[1, 3, 5])
+    args = parser.parse_args()
+
+    server = start_server(StubConfig(latency_ms=args.latency, jitter_ms=args.jitter))
+    os.environ.update(base_urls(server))
+    import tools.basalam_search as search  # reads the search URL at import
+
+    print(f"want {args.want} products with rating >= {args.min_rating} from {args.city}, "
+          f"{args.latency:.0f}±{args.jitter:.0f} ms per page, {len(QUERIES)} queries\n")
+    print(f"{'prefetch':>8}{'first page ms':>15}{'total ms p50':>14}{'total ms max':>14}{'pages':>7}{'products':>10}")
+    for prefetch in args.prefetch:
+        runs = [run_query(search, query, args, prefetch) for query in QUERIES]
+        print(f"{prefetch:>8}{statistics.median(r[0] for r in runs) * 1000:>15.0f}"
+              f"{statistics.median(r[1] for r in runs) * 1000:>14.0f}{max(r[1] for r in runs) * 1000:>14.0f}"
+              f"{sum(r[2] for r in runs):>7}{sum(r[3] for r in runs):>10}")
+    server.shutdown()
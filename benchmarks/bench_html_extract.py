@@ -0,0 +1,109 @@
+"""
+Parse time and peak memory of the product page extraction backends.
+
+    python -m benchmarks.bench_html_extract --pages saved_pages/
+    python -m benchmarks.bench_html_extract --page-cache database/page_cache.db
+
+Pages come from a directory of saved .html files, from the crawler's page
+cache, or (by default) are synthesized to resemble a Basalam product page.
+Each backend's output is checked against the full bs4 tree parse. Peak memory
+is measured with tracemalloc, so it does not count trees built in C (lxml).
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import sqlite3
+import statistics
+import time
+import tracemalloc
+import zlib
+
+from tools.html_extract import BACKENDS, extract_dom_fields, extract_product
+
+
+def synthetic_page(i: int, embedded: bool = False) -> str:
+    rng = random.Random(i)
+    filler = "".join(
+        f'<div class="col-{j} x{rng.randint(0, 999)}"><a href="/c/{j}">دسته {j}</a>'
+        f'<ul>{"".join(f"<li><a href=/p/{k}>محصول مشابه {k}</a></li>" for k in range(8))}</ul></div>'
+        for j in range(250)
+    )
+    specs = "".join(f'<tr><td>ویژگی {k}</td><td>مقدار {k}</td></tr>' for k in range(8))
+    reviews = "".join(f'<div class="review-item">نظر شماره {k}: کیفیت محصول خیلی خوب بود</div>' for k in range(12))
+    images = "".join(f'<img src="https://statics.basalam.com/{i}_{k}.jpg">' for k in range(6))
+    ld_json = ""
+    if embedded:
+        ld_json = '<script type="application/ld+json">' + json.dumps({
+            "@context": "https://schema.org", "@type": "Product", "name": f"کیف چرم {i}",
+            "description": "کیف چرم طبیعی دست‌دوز", "image": [f"https://statics.basalam.com/{i}.jpg"],
+            "offers": {"@type": "Offer", "price": (1200000 + i) * 10, "priceCurrency": "IRR",
+                       "seller": {"name": "غرفه چرم"}},
+            "aggregateRating": {"ratingValue": 4.6},
+            "additionalProperty": [{"name": f"ویژگی {k}", "value": f"مقدار {k}"} for k in range(8)],
+            "review": [{"reviewBody": f"نظر شماره {k}: کیفیت محصول خیلی خوب بود"} for k in range(5)],
+        }, ensure_ascii=False) + '</script>'
+    return (
+        f'<html><head><script>{"var x=1;" * 2000}</script>{ld_json}</head><body>{filler}'
+        f'<h1 class="thh9OB">کیف چرم {i}</h1><span class="PlpxQp">{1200000 + i:,} تومان</span>'
+        f'<p class="fhJOs1 bs-read-more__text">کیف چرم طبیعی دست‌دوز</p>'
+        f'<table class="product-specs">{specs}</table>{images}{reviews}'
+        f'<div class="rating-average">4.6 از 5</div><div class="vendor-name">غرفه چرم</div>'
+        f'{filler}</body></html>'
+    )
+
+
+def load_pages(args) -> list:
+    if args.pages:
+        paths = sorted(glob.glob(os.path.join(args.pages, "*.html")))
+        return [open(path, encoding="utf-8", errors="replace").read() for path in paths]
+    if args.page_cache:
+        conn = sqlite3.connect(args.page_cache)
+        rows = conn.execute("SELECT body FROM pages LIMIT ?", (args.count,)).fetchall()
+        conn.close()
+        return [zlib.decompress(body).decode("utf-8", "replace") for (body,) in rows]
+    return [synthetic_page(i) for i in range(args.count)]
+
+
+def measure(parse, pages: list, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        for html in pages:
+            start = time.perf_counter()
+            extract_dom_fields(parse(html), "")
+            timings.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    extract_dom_fields(parse(pages[0]), "")
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return timings, peak
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", help="directory of saved product pages (*.html)")
+    parser.add_argument("--page-cache", help="page cache database to read bodies from")
+    parser.add_argument("--count", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pages = load_pages(args)
+    if not pages:
+        raise SystemExit("no pages found")
+    print(f"{len(pages)} pages, mean size {statistics.mean(len(p) for p in pages) / 1024:.0f} KiB")
+
+    reference = [extract_dom_fields(BACKENDS["bs4-full"](html), "") for html in pages]
+    for name, parse in BACKENDS.items():
+        timings, peak = measure(parse, pages, args.repeat)
+        same = all(extract_dom_fields(parse(html), "") == ref for html, ref in zip(pages, reference))
+        print(f"{name:<11} median={statistics.median(timings):7.2f}ms  p95={sorted(timings)[int(len(timings) * 0.95)]:7.2f}ms  "
+              f"peak={peak / 1024:8.0f}KiB  matches bs4-full={same}")
+
+    embedded_pages = [synthetic_page(i, embedded=True) for i in range(len(pages))]
+    start = time.perf_counter()
+    for html in embedded_pages:
+        extract_product(html, "")
+    print(f"{'json-ld':<11} mean=  {(time.perf_counter() - start) * 1000 / len(embedded_pages):7.2f}ms  "
+          f"(synthetic pages with embedded Product data, no DOM built)")
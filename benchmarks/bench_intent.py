@@ -0,0 +1,83 @@
+"""
+Latency and accuracy of the local intent classifier against the LLM detect_intent path.
+
+    python -m benchmarks.bench_intent          # local classifier only
+    python -m benchmarks.bench_intent --llm    # also call the LLM (needs API keys)
+"""
+import argparse
+import os
+import statistics
+import time
+
+from tools.intent_classifier import INTENT_CONFIDENCE_THRESHOLD, classify_intent, get_intent_model, load_examples
+
+EVAL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "intent", "eval.jsonl")
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def report(name, latencies_ms, correct, total, extra=""):
+    print(f"{name:<12} accuracy={correct / total:6.1%}  "
+          f"p50={percentile(latencies_ms, 50):9.3f}ms  p95={percentile(latencies_ms, 95):9.3f}ms  "
+          f"mean={statistics.mean(latencies_ms):9.3f}ms {extra}")
+
+
+def bench_local(texts, labels, repeat):
+    get_intent_model()  # exclude one-off training from the timings
+    latencies, correct, confident, confident_correct = [], 0, 0, 0
+    for text, label in zip(texts, labels):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            prediction = classify_intent(text)
+        latencies.append((time.perf_counter() - start) * 1000 / repeat)
+        correct += prediction.intent == label
+        if prediction.confidence >= INTENT_CONFIDENCE_THRESHOLD:
+            confident += 1
+            confident_correct += prediction.intent == label
+    report("local", latencies, correct, len(texts),
+           f"fast-path={confident / len(texts):.0%} (accuracy {confident_correct / max(confident, 1):.1%})")
+    return latencies
+
+
+def bench_llm(texts, labels):
+    from tools.intent_detector import detect_intent
+
+    latencies, correct = [], 0
+    for text, label in zip(texts, labels):
+        start = time.perf_counter()
+        intent = detect_intent.invoke({"input": text}).intent
+        latencies.append((time.perf_counter() - start) * 1000)
+        correct += intent == label
+    report("llm", latencies, correct, len(texts))
+
+
+def bench_hybrid(texts, labels):
+    from tools.intent_detector import detect_intent
+
+    latencies, correct = [], 0
+    for text, label in zip(texts, labels):
+        start = time.perf_counter()
+        prediction = classify_intent(text)
+        intent = prediction.intent
+        if prediction.confidence < INTENT_CONFIDENCE_THRESHOLD:
+            intent = detect_intent.invoke({"input": text}).intent
+        latencies.append((time.perf_counter() - start) * 1000)
+        correct += intent == label
+    report("local+llm", latencies, correct, len(texts))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--llm", action="store_true", help="also benchmark the LLM and hybrid paths")
+    parser.add_argument("--repeat", type=int, default=200, help="local classifications per message")
+    args = parser.parse_args()
+
+    texts, labels = load_examples(EVAL_PATH)
+    print(f"eval set: {len(texts)} messages")
+    bench_local(texts, labels, args.repeat)
+    if args.llm:
+        bench_llm(texts, labels)
+        bench_hybrid(texts, labels)
@@ -0,0 +1,38 @@
+"""
+Time and peak allocation of ProductStore list reads, full rows vs projected columns.
+
+    python -m benchmarks.bench_product_reads --rows 2000
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.bench_product_store import sample_product
+from database.product_store import ProductStore, SUMMARY_COLUMNS
+
+
+def measure(label, read):
+    tracemalloc.start()
+    start = time.perf_counter()
+    rows = read()
+    elapsed = (time.perf_counter() - start) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<34} rows={len(rows):6d}  time={elapsed:8.1f}ms  peak={peak / 1024:9.1f} KiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ProductStore(os.path.join(tmp, "bench.db"))
+        store.save_products([sample_product(i) for i in range(args.rows)], "bench")
+
+        measure("all columns, decoded dicts", lambda: [dict(p) for p in store.get_all_products(args.rows)])
+        measure("all columns, lazy rows", lambda: store.get_all_products(args.rows))
+        measure("summary columns, lazy rows", lambda: store.get_all_products(args.rows, columns=SUMMARY_COLUMNS))
+        store.close()
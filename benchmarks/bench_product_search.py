@@ -0,0 +1,58 @@
+"""
+Lookup latency of ProductStore.search_stored_products on a large synthetic store.
+
+    python -m benchmarks.bench_product_search --rows 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from database.product_store import ProductStore
+
+WORDS = ["کیف", "کفش", "چرم", "زنانه", "مردانه", "طبیعی", "دست‌دوز", "عسل", "زعفران", "قهوه", "سفالی",
+         "چوبی", "نقره", "فرش", "دستباف", "ارگانیک", "کتان", "پشمی", "سرامیکی", "ادویه"]
+QUERIES = ["كيف چرم", "کفش مردانه", "عسل طبیعی", "فرش دستباف", "قهوه", "زعفران ارگانیک", "سفالی"]
+
+
+def fill(store: ProductStore, rows: int, batch: int = 5000):
+    rng = random.Random(7)
+    # A long tail of random terms, with each query word in roughly 2% of products
+    letters = "ابپتثجچحخدذرزژسشصضطظعغفقکگلمنوهی"
+    vocabulary = ["".join(rng.choices(letters, k=rng.randint(3, 7))) for _ in range(50_000)]
+    for start in range(0, rows, batch):
+        products = []
+        for i in range(start, min(start + batch, rows)):
+            name = rng.choices(vocabulary, k=4) + [w for w in WORDS if rng.random() < 0.02]
+            products.append({
+                "product_id": str(i),
+                "name": " ".join(name),
+                "price": rng.randint(10_000, 5_000_000),
+                "description": " ".join(rng.choices(vocabulary, k=20) + [w for w in WORDS if rng.random() < 0.02]),
+                "specifications": {"جنس": rng.choice(vocabulary)},
+            })
+        store.save_products(products, "bench")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ProductStore(os.path.join(tmp, "bench.db"))
+        start = time.perf_counter()
+        fill(store, args.rows)
+        print(f"indexed {args.rows} products in {time.perf_counter() - start:.1f}s")
+
+        for query in QUERIES:
+            timings = []
+            for page in range(args.repeat):
+                start = time.perf_counter()
+                results = store.search_stored_products(query, limit=20, offset=(page % 3) * 20)
+                timings.append((time.perf_counter() - start) * 1000)
+            print(f"{query:<16} median={statistics.median(timings):7.2f}ms  max={max(timings):7.2f}ms  hits/page={len(results)}")
+        store.close()
@@ -0,0 +1,110 @@
+"""
+Save/get throughput of ProductStore under concurrent writers and readers.
+
+    python -m benchmarks.bench_product_store --writers 4 --readers 8 --seconds 5
+
+Runs the pooled WAL store and, for comparison, a connect-per-call store in the
+default rollback-journal mode (the previous behaviour) on a temporary database.
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from database.product_store import ProductStore
+
+
+class ConnectPerCallStore(ProductStore):
+    """Previous behaviour: a fresh connection per call, rollback journal, default pragmas."""
+
+    @contextmanager
+    def _connection(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def init_database(self):
+        super().init_database()
+        with self._connection() as conn:
+            conn.execute("PRAGMA journal_mode=DELETE")
+
+
+def sample_product(i: int) -> dict:
+    return {
+        "product_id": str(i),
+        "name": f"محصول نمونه {i}",
+        "price": 100000 + i,
+        "rating": 4.5,
+        "rating_count": 12,
+        "vendor_name": "vendor",
+        "vendor_city": "تهران",
+        "link": f"https://basalam.com/p/{i}",
+        "description": "توضیحات محصول " * 20,
+        "specifications": {"جنس": "چرم", "رنگ": "قهوه‌ای"},
+        "reviews": ["کیفیت عالی بود و به موقع رسید"] * 3,
+        "additional_images": [f"https://statics.basalam.com/{i}.jpg"],
+    }
+
+
+def run(store: ProductStore, writers: int, readers: int, seconds: float) -> dict:
+    ids = [store.save_product(sample_product(i), "seed") for i in range(200)]
+    counts = {"save": 0, "get": 0, "errors": 0}
+    lock = threading.Lock()
+    stop = time.monotonic() + seconds
+
+    def writer(offset: int):
+        i, done, errors = offset, 0, 0
+        while time.monotonic() < stop:
+            try:
+                store.save_product(sample_product(i), "bench")
+                done += 1
+            except sqlite3.OperationalError:
+                errors += 1
+            i += writers
+        with lock:
+            counts["save"] += done
+            counts["errors"] += errors
+
+    def reader(offset: int):
+        i, done, errors = offset, 0, 0
+        while time.monotonic() < stop:
+            try:
+                store.get_product(ids[i % len(ids)])
+                done += 1
+            except sqlite3.OperationalError:
+                errors += 1
+            i += 1
+        with lock:
+            counts["get"] += done
+            counts["errors"] += errors
+
+    threads = [threading.Thread(target=writer, args=(1000 + w,)) for w in range(writers)]
+    threads += [threading.Thread(target=reader, args=(r,)) for r in range(readers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return {key: value / seconds if key != "errors" else value for key, value in counts.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    for name, store_cls in (("connect-per-call", ConnectPerCallStore), ("pooled+WAL", ProductStore)):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = store_cls(os.path.join(tmp, "bench.db"))
+            result = run(store, args.writers, args.readers, args.seconds)
+            store.close()
+        print(f"{name:<18} save={result['save']:8.0f}/s  get={result['get']:8.0f}/s  "
+              f"lock errors={result['errors']}  ({args.writers} writers, {args.readers} readers)")
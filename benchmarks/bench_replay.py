@@ -0,0 +1,215 @@
+"""
+Load test of get_agent_response against local stand-ins, reported per stage.
+
+    python -m benchmarks.bench_replay --turns 200 --concurrency 8
+    python -m benchmarks.bench_replay --latency 150 --jitter 50 --error-rate 0.05 --llm-latency 600
+    python -m benchmarks.bench_replay --script my_script.json --queries queries.txt --json run.json
+    python -m benchmarks.bench_replay --burst 8 --concurrency 8 --sessions 64    # traffic spike
+
+Starts benchmarks/stub_server.py in-process and points the search tool and the
+crawler at it (BASALAM_SEARCH_URL / BASALAM_WEB_URL), and serves every model
+call from benchmarks/scripted_llm.py. Queries come from --queries (one per
+line) or the search_product examples in data/intent/eval.jsonl. Turns run
+--concurrency at a time; --sessions spreads them over that many chat sessions
+so history carries over between turns of a session.
+
+Per-stage latencies come from the tracing spans (tools/tracing.py), so the
+background crawls of the enrichment queue are included once it has drained.
+Databases are created in a scratch directory (--workdir), never in database/.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.scripted_llm import DEFAULT_FINAL, DEFAULT_PLAIN_REPLY, DEFAULT_SCRIPT, ScriptedChatModel, load_script
+from benchmarks.stub_server import StubConfig, base_urls, start_server
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EVAL_PATH = os.path.join(ROOT, "data", "intent", "eval.jsonl")
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def load_queries(path):
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()]
+    with open(EVAL_PATH, "r", encoding="utf-8") as f:
+        examples = [json.loads(line) for line in f if line.strip()]
+    return [e["text"] for e in examples if e["intent"] == "search_product"]
+
+
+def prepare_workdir(path):
+    """Scratch working directory: the app's relative paths (prompts/, database/) resolve inside it."""
+    os.makedirs(os.path.join(path, "database"), exist_ok=True)
+    for name in ("prompts", "data"):
+        link = os.path.join(path, name)
+        if not os.path.exists(link):
+            os.symlink(os.path.join(ROOT, name), link)
+    os.chdir(path)
+
+
+class StageCollector:
+    """Trace subscriber that keeps span durations per span name."""
+
+    def __init__(self):
+        self.durations = defaultdict(list)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def __call__(self, trace):
+        with self._lock:
+            for s in trace:
+                if s["end_time_unix_nano"] is None:
+                    continue
+                self.durations[s["name"]].append((s["end_time_unix_nano"] - s["start_time_unix_nano"]) / 1e6)
+                self.errors[s["name"]] += s["status"] == "ERROR"
+
+
+def wait_for_enrichment(queue, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        stats = queue.stats()
+        if not stats.get("pending") and not stats.get("running"):
+            return True
+        time.sleep(0.2)
+    return False
+
+
+def run(args):
+    queries = load_queries(args.queries)
+    script = load_script(args.script) if args.script else {}
+    server = start_server(StubConfig(latency_ms=args.latency, jitter_ms=args.jitter,
+                                     error_rate=args.error_rate, seed=args.seed))
+    os.environ.update(base_urls(server))
+    host = "{}:{}".format(*server.server_address[:2])
+    os.environ["BASALAM_HTTP_HOST_LIMITS"] = f"{host}={args.host_limit}"
+    os.environ.setdefault("AVALAI_API_KEY", "bench")
+    os.environ.setdefault("AVALAI_API_BASE", "http://127.0.0.1:9")
+    prepare_workdir(args.workdir or tempfile.mkdtemp(prefix="basalam-bench-"))
+
+    # Imported after the environment is set: the tools read their base URLs at import
+    import chat
+    from tools.llm_metrics import metrics_callback
+    from tools.llm_registry import register_llm
+    from tools.single_flight import coalescing_stats
+    from tools.tracing import recorder
+
+    register_llm(ScriptedChatModel(
+        steps=script.get("steps", DEFAULT_SCRIPT), final=script.get("final", DEFAULT_FINAL),
+        plain_reply=script.get("plain_reply", DEFAULT_PLAIN_REPLY),
+        latency_ms=args.llm_latency, jitter_ms=args.llm_jitter, callbacks=[metrics_callback()],
+    ))
+    collector = StageCollector()
+    recorder.subscribe(collector)
+
+    turn_latencies, failures = [], []
+
+    def turn(i):
+        start = time.perf_counter()
+        try:
+            chat.get_agent_response(queries[(i // args.burst) % len(queries)], f"bench-{i % args.sessions}")
+            turn_latencies.append((time.perf_counter() - start) * 1000)
+        except Exception as e:
+            failures.append(f"{type(e).__name__}: {e}")
+
+    output = io.StringIO() if args.quiet else sys.stdout
+    with contextlib.redirect_stdout(output):
+        chat.get_agent_response(queries[0], "bench-warmup")  # build the agent outside the timings
+        collector.durations.clear()
+        collector.errors.clear()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(turn, range(args.turns)))
+        elapsed = time.perf_counter() - start
+        drained = wait_for_enrichment(chat.enrichment_queue, args.drain)
+    server.shutdown()
+
+    return {
+        "turns": args.turns,
+        "concurrency": args.concurrency,
+        "seconds": elapsed,
+        "throughput": len(turn_latencies) / elapsed if elapsed else 0.0,
+        "failures": len(failures),
+        "failure_samples": failures[:5],
+        "enrichment_drained": drained,
+        "coalescing": coalescing_stats(),
+        "upstreams": chat.get_upstream_stats(),
+        "turn": summarize(turn_latencies),
+        "stages": {name: {**summarize(values), "errors": collector.errors[name]}
+                   for name, values in sorted(collector.durations.items())},
+    }
+
+
+def summarize(values):
+    if not values:
+        return {"count": 0}
+    return {"count": len(values), "p50_ms": percentile(values, 50), "p95_ms": percentile(values, 95),
+            "p99_ms": percentile(values, 99), "max_ms": max(values)}
+
+
+def print_report(report):
+    print(f"{report['turns']} turns at concurrency {report['concurrency']}: {report['seconds']:.1f}s, "
+          f"{report['throughput']:.2f} turns/s, {report['failures']} failed")
+    for sample in report["failure_samples"]:
+        print(f"  ! {sample}")
+    if not report["enrichment_drained"]:
+        print("  (enrichment queue not drained; crawl stages are incomplete)")
+    print(f"\n{'stage':<28}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'errors':>8}")
+    rows = [("turn", {**report["turn"], "errors": report["failures"]})] + list(report["stages"].items())
+    for name, stats in rows:
+        if not stats["count"]:
+            continue
+        print(f"{name:<28}{stats['count']:>7}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}"
+              f"{stats['p99_ms']:>10.1f}{stats['max_ms']:>10.1f}{stats['errors']:>8}")
+    print()
+    for name, stats in report["coalescing"].items():
+        print(f"coalesced {name}: {stats['coalesced']} of {stats['calls']} calls shared an in-flight request "
+              f"({stats['upstream']} upstream, peak {stats['peak_waiters']} waiters)")
+    for host, stats in report["upstreams"].items():
+        print(f"upstream {host}: circuit {stats['state']} (opened {stats['times_opened']}x), "
+              f"{stats['success']} ok / {stats['failure']} failed / {stats['rejected'] + stats['busy']} rejected, "
+              f"concurrency limit {stats['concurrency_limit']:g}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--sessions", type=int, default=16, help="number of chat sessions the turns rotate over")
+    parser.add_argument("--queries", help="file with one query per line")
+    parser.add_argument("--burst", type=int, default=1,
+                        help="send each query this many times in a row (a trending search hit by many sessions)")
+    parser.add_argument("--script", help="JSON script for the scripted model (see benchmarks/scripted_llm.py)")
+    parser.add_argument("--latency", type=float, default=80.0, help="stub server delay per response, ms")
+    parser.add_argument("--jitter", type=float, default=30.0, help="stub server +- delay, ms")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of stub responses that fail")
+    parser.add_argument("--llm-latency", type=float, default=300.0, help="scripted model delay per call, ms")
+    parser.add_argument("--llm-jitter", type=float, default=100.0)
+    parser.add_argument("--host-limit", type=int, default=8, help="concurrent requests to the stub server")
+    parser.add_argument("--drain", type=float, default=30.0, help="seconds to wait for background crawls")
+    parser.add_argument("--workdir", help="scratch directory for the databases (default: a new temp dir)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the report to this file")
+    parser.add_argument("--quiet", action="store_true", help="hide the app's own log lines")
+    args = parser.parse_args()
+
+    if args.json:
+        args.json = os.path.abspath(args.json)
+    report = run(args)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
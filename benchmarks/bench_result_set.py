@@ -0,0 +1,146 @@
+"""
+Filtering, merging and ranking search results: Python loops vs. ResultSet columns.
+
+    python -m benchmarks.bench_result_set                       # 6 lists x 2000 products
+    python -m benchmarks.bench_result_set --lists 6 --size 5000 --repeat 10
+
+Synthesizes eco-search-sized inputs: one API response per component
+(benchmarks/stub_server.py's synthetic search, with some duplicates across
+components). Each stage is timed for the old per-dict code and the
+ResultSet version, and their outputs are checked to be identical:
+
+    clean+filter   API products -> cleaned, filtered, price-sorted list
+    merge          dedupe by product_id across components, k-way merge by price
+                   (eco search keeps the heapq merge, which wins here)
+    rank           price, then rating weighted by rating_count
+    summary        min/max/mean/percentiles of price and rating
+"""
+import argparse
+import heapq
+import random
+import statistics
+import time
+
+from benchmarks.stub_server import synthetic_search
+from tools.result_set import DEFAULT_RATING_PRIOR, ResultSet, _clean_api_product
+
+LINK_BASE = "https://basalam.com"
+
+
+def make_inputs(lists: int, size: int, overlap: float, seed: int):
+    rng = random.Random(seed)
+    responses = [synthetic_search(f"جزء {k}", size)["products"] for k in range(lists)]
+    for products in responses[1:]:
+        # Components often return products already found by the main query
+        for j in rng.sample(range(size), int(size * overlap)):
+            products[j] = rng.choice(responses[0])
+    return responses
+
+
+def loop_filter(products, min_rating, vendor_city):
+    cleaned_products = []
+    for product in products:
+        cleaned = _clean_api_product(product, LINK_BASE)
+        if not cleaned["price"]:
+            continue
+        if min_rating and (not cleaned["rating"] or cleaned["rating"] < min_rating):
+            continue
+        if vendor_city and cleaned["vendor_city"] and cleaned["vendor_city"].lower() != vendor_city.lower():
+            continue
+        cleaned_products.append(cleaned)
+    return sorted(cleaned_products, key=lambda x: x["price"])
+
+
+def loop_merge(result_lists):
+    seen_ids, deduped = set(), []
+    for products in result_lists:
+        new_products = []
+        for p in products:
+            if p.get("product_id") in seen_ids:
+                continue
+            seen_ids.add(p.get("product_id"))
+            new_products.append(p)
+        if new_products:
+            deduped.append(new_products)
+    return list(heapq.merge(*deduped, key=lambda x: x.get("price", 0)))
+
+
+def loop_rank(products, prior=DEFAULT_RATING_PRIOR):
+    rated = [p["rating"] for p in products if p.get("rating") is not None]
+    mean = sum(rated) / len(rated) if rated else 0.0
+
+    def score(p):
+        if p.get("rating") is None:
+            return mean
+        count = p.get("rating_count") or 0
+        return (prior * mean + count * p["rating"]) / (prior + count)
+
+    return sorted(products, key=lambda p: (p.get("price") or 0, -score(p)))
+
+
+def loop_summary(products):
+    result = {"count": len(products)}
+    for name in ("price", "rating"):
+        values = sorted(p[name] for p in products if p.get(name) is not None)
+        if values:
+            quartiles = statistics.quantiles(values, n=4, method="inclusive")
+            result[name] = {"min": values[0], "max": values[-1], "mean": round(statistics.fmean(values), 2),
+                            "p25": round(quartiles[0], 2), "p50": round(quartiles[1], 2), "p75": round(quartiles[2], 2)}
+    return result
+
+
+def timed(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), result
+
+
+def run(args):
+    responses = make_inputs(args.lists, args.size, args.overlap, args.seed)
+    total = sum(len(r) for r in responses)
+    print(f"{args.lists} component lists, {total} products in total, median of {args.repeat} runs\n")
+    print(f"{'stage':<14}{'loops ms':>10}{'columns ms':>12}{'speedup':>9}")
+
+    def report(stage, loop_ms, column_ms):
+        print(f"{stage:<14}{loop_ms:>10.2f}{column_ms:>12.2f}{loop_ms / column_ms:>8.1f}x")
+
+    loop_ms, loop_lists = timed(lambda: [loop_filter(r, args.min_rating, args.city) for r in responses], args.repeat)
+    column_ms, column_sets = timed(lambda: [
+        ResultSet.from_api(r, LINK_BASE).filter(min_rating=args.min_rating, vendor_city=args.city).rank(("price",))
+        for r in responses
+    ], args.repeat)
+    assert [s.to_list() for s in column_sets] == loop_lists
+    report("clean+filter", loop_ms, column_ms)
+
+    # The search tool hands lists of dicts to the eco search, which rebuilds the columns
+    loop_ms, merged = timed(lambda: loop_merge(loop_lists), args.repeat)
+    column_ms, merged_set = timed(
+        lambda: ResultSet.concat([ResultSet.from_records(l) for l in loop_lists]).dedupe().rank(("price",)), args.repeat)
+    assert merged_set.to_list() == merged
+    report("merge", loop_ms, column_ms)
+
+    loop_ms, ranked = timed(lambda: loop_rank(merged), args.repeat)
+    column_ms, ranked_set = timed(lambda: merged_set.rank(("price", "-score")), args.repeat)
+    assert [p["product_id"] for p in ranked_set.to_list()] == [p["product_id"] for p in ranked]
+    report("rank", loop_ms, column_ms)
+
+    loop_ms, summary = timed(lambda: loop_summary(merged), args.repeat)
+    column_ms, column_summary = timed(lambda: merged_set.summary(), args.repeat)
+    assert column_summary["price"] == summary["price"], (column_summary, summary)
+    report("summary", loop_ms, column_ms)
+    print(f"\nmerged: {len(merged)} products")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lists", type=int, default=6, help="component searches to merge")
+    parser.add_argument("--size", type=int, default=2000, help="products per component")
+    parser.add_argument("--overlap", type=float, default=0.2, help="fraction of each component repeating the main query")
+    parser.add_argument("--min-rating", type=float, default=3.5)
+    parser.add_argument("--city", default="تهران")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    run(parser.parse_args())
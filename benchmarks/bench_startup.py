@@ -0,0 +1,75 @@
+"""
+Cold-start import time of the chat module.
+
+    python -m benchmarks.bench_startup --repeat 5
+    python -m benchmarks.bench_startup --compare <git-ref>
+
+Each run imports ``chat`` in a fresh interpreter. With --compare, the same is
+done in an export of <git-ref> (e.g. the commit before a startup change) so
+both numbers come from the same machine and network.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def time_import(tree: str, repeat: int, timeout: float) -> list:
+    env = {**os.environ, "PYTHONPATH": tree}
+    env.setdefault("AVALAI_API_KEY", "bench")
+    env.setdefault("AVALAI_API_BASE", "http://127.0.0.1:9")
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        try:
+            result = subprocess.run([sys.executable, "-c", "import chat"], cwd=tree, env=env,
+                                    capture_output=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            timings.append(None)
+            continue
+        elapsed = time.perf_counter() - start
+        if result.returncode != 0:
+            error = result.stderr.decode("utf-8", "replace").strip().splitlines()[-1:]
+            print(f"  import failed after {elapsed:.2f}s: {error[0] if error else ''}")
+            timings.append(None)
+        else:
+            timings.append(elapsed)
+    return timings
+
+
+def export_ref(ref: str, target: str):
+    archive = subprocess.run(["git", "archive", ref], cwd=ROOT, capture_output=True, check=True).stdout
+    path = os.path.join(target, "tree.tar")
+    with open(path, "wb") as f:
+        f.write(archive)
+    with tarfile.open(path) as tar:
+        tar.extractall(target)
+
+
+def report(label: str, timings: list):
+    ok = [t for t in timings if t is not None]
+    if not ok:
+        print(f"{label:<12} failed in all {len(timings)} runs")
+        return
+    print(f"{label:<12} median={statistics.median(ok):6.2f}s  min={min(ok):6.2f}s  "
+          f"max={max(ok):6.2f}s  failures={len(timings) - len(ok)}/{len(timings)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--compare", metavar="REF", help="git ref to measure as the baseline")
+    args = parser.parse_args()
+
+    if args.compare:
+        with tempfile.TemporaryDirectory() as tmp:
+            export_ref(args.compare, tmp)
+            report(args.compare, time_import(tmp, args.repeat, args.timeout))
+    report("working tree", time_import(ROOT, args.repeat, args.timeout))
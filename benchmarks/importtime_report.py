@@ -0,0 +1,102 @@
+"""
+Startup-cost breakdown per module, from ``python -X importtime``.
+
+    python -m benchmarks.importtime_report                      # import chat
+    python -m benchmarks.importtime_report app --top 30
+    python -m benchmarks.importtime_report --json startup.json
+    python -m benchmarks.importtime_report --baseline startup.json --threshold 15
+
+Imports the module in a fresh interpreter and prints the slowest modules (by
+cumulative and self time) and the total per top-level package. --json saves
+the report; --baseline compares against a saved one and exits with status 1
+when the total import time grew by more than --threshold percent.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def importtime(module: str) -> dict:
+    env = {**os.environ, "PYTHONPATH": ROOT}
+    env.setdefault("AVALAI_API_KEY", "bench")
+    env.setdefault("AVALAI_API_BASE", "http://127.0.0.1:9")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise SystemExit(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = {"self_us": int(self_us), "cumulative_us": int(cumulative_us)}
+    return modules
+
+
+def build_report(module: str) -> dict:
+    modules = importtime(module)
+    packages = defaultdict(int)
+    for name, timing in modules.items():
+        packages[name.split(".")[0]] += timing["self_us"]
+    return {
+        "module": module,
+        "total_us": sum(t["self_us"] for t in modules.values()),
+        "modules": modules,
+        "packages": dict(sorted(packages.items(), key=lambda item: -item[1])),
+    }
+
+
+def print_report(report: dict, top: int):
+    print(f"import {report['module']}: {report['total_us'] / 1000:.0f} ms, {len(report['modules'])} modules\n")
+    by_cumulative = sorted(report["modules"].items(), key=lambda item: -item[1]["cumulative_us"])
+    by_self = sorted(report["modules"].items(), key=lambda item: -item[1]["self_us"])
+
+    print(f"{'cumulative ms':>13}  module")
+    for name, timing in by_cumulative[:top]:
+        print(f"{timing['cumulative_us'] / 1000:13.1f}  {name}")
+    print(f"\n{'self ms':>13}  module")
+    for name, timing in by_self[:top]:
+        print(f"{timing['self_us'] / 1000:13.1f}  {name}")
+    print(f"\n{'total ms':>13}  package")
+    for package, self_us in list(report["packages"].items())[:top]:
+        print(f"{self_us / 1000:13.1f}  {package}")
+
+
+def compare(report: dict, baseline: dict, threshold: float) -> bool:
+    """Print the change against a saved report; True when within the threshold."""
+    before, after = baseline["total_us"], report["total_us"]
+    change = (after - before) / before * 100 if before else 0.0
+    print(f"\ntotal: {before / 1000:.0f} ms -> {after / 1000:.0f} ms ({change:+.1f}%)")
+
+    packages = set(report["packages"]) | set(baseline["packages"])
+    deltas = sorted(((report["packages"].get(p, 0) - baseline["packages"].get(p, 0), p) for p in packages), reverse=True)
+    for delta, package in deltas[:5]:
+        if delta > 0:
+            print(f"  +{delta / 1000:.1f} ms  {package}")
+    return change <= threshold
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("module", nargs="?", default="chat")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--baseline", help="report to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed growth of the total, in percent")
+    args = parser.parse_args()
+
+    report = build_report(args.module)
+    print_report(report, args.top)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            if not compare(report, json.load(f), args.threshold):
+                sys.exit(1)
@@ -0,0 +1,82 @@
+"""
+Chat model stand-in that follows a script instead of calling a provider.
+
+Used by benchmarks/bench_replay.py through tools.llm_registry.register_llm.
+When tools are bound (the agent), each call returns the next tool call of the
+script for that turn, with "{input}" in its arguments replaced by the user's
+message, and the final answer once the script is used up. Calls without tools
+(intent fallback, history summaries, eco expansion) get ``plain_reply``.
+Each call sleeps ``latency_ms`` +- ``jitter_ms`` and reports token usage
+estimated from the text, so the metrics sink sees realistic rows.
+"""
+import json
+import random
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+DEFAULT_SCRIPT = [{"tool": "search_basalam", "args": {"query": "{input}"}}]
+# Mentions products like a real answer does, so the turn goes on to store them
+DEFAULT_FINAL = "نتایج جستجو برای «{input}»:\nنام کالا: {input}\nقیمت: 250,000 تومان"
+DEFAULT_PLAIN_REPLY = "search_product\nکیف چرم\nکفش\nکمربند"
+
+
+def load_script(path: str) -> Dict[str, Any]:
+    """Script file: {"steps": [{"tool": ..., "args": {...}}, ...], "final": "...", "plain_reply": "..."}."""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _fill(value: Any, user_input: str) -> Any:
+    if isinstance(value, str):
+        return value.replace("{input}", user_input)
+    if isinstance(value, dict):
+        return {key: _fill(item, user_input) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_fill(item, user_input) for item in value]
+    return value
+
+
+class ScriptedChatModel(BaseChatModel):
+    steps: List[Dict[str, Any]] = DEFAULT_SCRIPT
+    final: str = DEFAULT_FINAL
+    plain_reply: str = DEFAULT_PLAIN_REPLY
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    model_name: str = "scripted"
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[getattr(t, "name", str(t)) for t in tools], **kwargs)
+
+    def _reply(self, messages: List[BaseMessage], tools: Optional[list]) -> AIMessage:
+        if not tools:
+            return AIMessage(content=self.plain_reply)
+        user_input = next((m.content for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+        done = sum(1 for m in messages if isinstance(m, ToolMessage))
+        if done < len(self.steps):
+            step = self.steps[done]
+            return AIMessage(content="", tool_calls=[{
+                "name": step["tool"], "args": _fill(step.get("args", {}), user_input), "id": uuid.uuid4().hex[:12],
+            }])
+        return AIMessage(content=_fill(self.final, user_input))
+
+    def _generate(self, messages, stop=None, run_manager=None, tools=None, **kwargs) -> ChatResult:
+        delay = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+        message = self._reply(messages, tools)
+        prompt_tokens = sum(len(str(m.content)) for m in messages) // 3 + 1
+        completion_tokens = len(str(message.content) or json.dumps(message.tool_calls, ensure_ascii=False)) // 3 + 1
+        return ChatResult(
+            generations=[ChatGeneration(message=message)],
+            llm_output={"model_name": self.model_name,
+                        "token_usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens}},
+        )
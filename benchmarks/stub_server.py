@@ -0,0 +1,203 @@
+"""
+Local stand-in for the Basalam search API and product pages.
+
+    python -m benchmarks.stub_server --port 8765 --latency 120 --jitter 40 --error-rate 0.02
+    python -m benchmarks.stub_server --record "کیف چرم" "کفش ورزشی"
+
+Serves recorded responses from benchmarks/fixtures: search/<key>.json for a
+query and products/<id>.html for a product page. Queries and products without
+a recording get a deterministic synthetic response of the same shape; synthetic
+searches have 60-480 results, paged with the API's from/size parameters. Every
+response is delayed by --latency +- --jitter ms, and --error-rate of them fail
+with --error-status. --record fetches live responses for the given queries
+(and their first product pages) into the fixtures directory.
+
+Point the tools at it with
+    BASALAM_SEARCH_URL=http://127.0.0.1:8765/ai-engine/api/v2.0/product/search
+    BASALAM_WEB_URL=http://127.0.0.1:8765
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.bench_html_extract import synthetic_page
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+SEARCH_PATH = "/ai-engine/api/v2.0/product/search"
+LIVE_SEARCH_URL = "https://search.basalam.com" + SEARCH_PATH
+_PRODUCT_PATH = re.compile(r"^/(?:p|[^/]+/product)/(\d+)")
+CITIES = ["تهران", "اصفهان", "شیراز", "تبریز", "مشهد", "یزد"]
+
+
+def fixture_key(query: str) -> str:
+    return hashlib.sha1(query.strip().encode("utf-8")).hexdigest()[:16]
+
+
+def synthetic_total(query: str) -> int:
+    """How many results the stand-in has for a query (between 60 and 480)."""
+    return 60 + int(fixture_key(query), 16) % 421
+
+
+def synthetic_search(query: str, count: int = 24, start: int = 0) -> dict:
+    """Search response in the API's shape; result ``start + i`` is the same in every call."""
+    key = fixture_key(query)
+    products = []
+    for i in range(start, start + count):
+        rng = random.Random(f"{key}:{i}")
+        product_id = rng.randint(1_000_000, 30_000_000)
+        products.append({
+            "id": product_id,
+            "name": f"{query} مدل {i + 1}",
+            "price": rng.randint(50, 5000) * 10_000,  # Rial
+            "photo": {"MEDIUM": f"https://statics.basalam.com/public/{product_id}.jpg"},
+            "rating": {"average": round(rng.uniform(3, 5), 1), "count": rng.randint(0, 400)},
+            "vendor": {"name": f"غرفه {rng.randint(1, 500)}", "owner": {"city": rng.choice(CITIES)}},
+        })
+    return {"products": products}
+
+
+class StubConfig:
+    def __init__(self, fixtures_dir: str = FIXTURES_DIR, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 503, seed: int = 0):
+        self.fixtures_dir = fixtures_dir
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw(self):
+        """Delay (seconds) and whether to fail, for one request."""
+        with self._lock:
+            delay = max(0.0, self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+            return delay, self._rng.random() < self.error_rate
+
+    def search_body(self, query: str, start: int = 0, size: int = 24) -> bytes:
+        """One page of results; a recording only has the first page."""
+        path = os.path.join(self.fixtures_dir, "search", fixture_key(query) + ".json")
+        if os.path.exists(path):
+            if start:
+                return b'{"products": []}'
+            with open(path, "rb") as f:
+                return f.read()
+        count = max(0, min(size, synthetic_total(query) - start))
+        return json.dumps(synthetic_search(query, count, start), ensure_ascii=False).encode("utf-8")
+
+    def product_body(self, product_id: str) -> bytes:
+        path = os.path.join(self.fixtures_dir, "products", product_id + ".html")
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                return f.read()
+        return synthetic_page(int(product_id)).encode("utf-8")
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    config: StubConfig = StubConfig()
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real hosts
+
+    def do_GET(self):
+        delay, fail = self.config.draw()
+        time.sleep(delay)
+        if fail:
+            return self._send(self.config.error_status, b'{"error": "injected"}', "application/json")
+
+        url = urlparse(self.path)
+        if url.path == SEARCH_PATH:
+            params = parse_qs(url.query)
+            body = self.config.search_body(params.get("q", [""])[0], int(params.get("from", ["0"])[0]),
+                                           int(params.get("size", ["24"])[0]))
+            return self._send(200, body, "application/json")
+
+        match = _PRODUCT_PATH.match(url.path)
+        if match:
+            body = self.config.product_body(match.group(1))
+            etag = '"%s"' % hashlib.sha1(body).hexdigest()[:16]
+            if self.headers.get("If-None-Match") == etag:
+                return self._send(304, b"", None, {"ETag": etag})
+            return self._send(200, body, "text/html; charset=utf-8", {"ETag": etag})
+
+        self._send(404, b"not found", "text/plain")
+
+    def _send(self, status: int, body: bytes, content_type, headers=None):
+        self.send_response(status)
+        if content_type:
+            self.send_header("Content-Type", content_type)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(config: StubConfig, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Serve in a background thread; ``server.server_address`` has the bound port."""
+    handler = type("ConfiguredStubHandler", (StubHandler,), {"config": config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def base_urls(server: ThreadingHTTPServer) -> dict:
+    """Environment that points the tools at ``server``."""
+    host, port = server.server_address[:2]
+    root = f"http://{host}:{port}"
+    return {"BASALAM_SEARCH_URL": root + SEARCH_PATH, "BASALAM_WEB_URL": root}
+
+
+def record(queries: list, fixtures_dir: str, pages_per_query: int):
+    import requests
+
+    from tools.product_crawler import HEADERS
+
+    os.makedirs(os.path.join(fixtures_dir, "search"), exist_ok=True)
+    os.makedirs(os.path.join(fixtures_dir, "products"), exist_ok=True)
+    for query in queries:
+        response = requests.get(LIVE_SEARCH_URL, params={"q": query}, timeout=15)
+        response.raise_for_status()
+        with open(os.path.join(fixtures_dir, "search", fixture_key(query) + ".json"), "wb") as f:
+            f.write(response.content)
+        products = response.json().get("products", [])
+        print(f"{query}: {len(products)} products")
+        for product in products[:pages_per_query]:
+            page = requests.get(f"https://basalam.com/p/{product['id']}", headers=HEADERS, timeout=15)
+            if page.ok:
+                with open(os.path.join(fixtures_dir, "products", f"{product['id']}.html"), "wb") as f:
+                    f.write(page.content)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixtures", default=FIXTURES_DIR)
+    parser.add_argument("--latency", type=float, default=0.0, help="added delay per response, ms")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+- random delay, ms")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--record", nargs="+", metavar="QUERY", help="record live responses instead of serving")
+    parser.add_argument("--pages-per-query", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.record:
+        record(args.record, args.fixtures, args.pages_per_query)
+    else:
+        config = StubConfig(args.fixtures, args.latency, args.jitter, args.error_rate, args.error_status)
+        server = start_server(config, args.host, args.port)
+        for name, value in base_urls(server).items():
+            print(f"{name}={value}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
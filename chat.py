@@ -1,183 +1,372 @@
 
 import os
+import re
+import queue
+import threading
 from operator import itemgetter
-from dotenv import load_dotenv
+from typing import Iterator
 
-from tools.basalam_search import search_basalam
-from tools.intent_detector import detect_intent
-from tools.generate_message import generate_seller_message
-from tools.product_utils import fix_basalam_product_url
-from tools.product_crawler import crawl_product_page, batch_crawl_products
-from tools.product_manager import (
-    save_product_details, 
-    get_product_details, 
-    search_saved_products, 
-    get_recent_products,
-    compare_products
-)
-from tools.eco_search import eco_search_expand
-from tools.eco_search_manager import perform_eco_search, explain_eco_search
-
-from langchain.chat_models import init_chat_model
-from langchain.agents import AgentExecutor, create_tool_calling_agent
-from langchain import hub
+from dotenv import load_dotenv
 
+# Before the tools are imported: several read their settings from the environment at import
+# (BASALAM_SEARCH_URL, BASALAM_HTTP_HOST_LIMITS, BASALAM_HTTP_RATE_LIMITS, BASALAM_PAGE_TTL, ...)
 load_dotenv()
-os.environ["OPENAI_API_KEY"] = os.getenv("AVALAI_API_KEY")
-os.environ["OPENAI_API_BASE"] = os.getenv("AVALAI_API_BASE")
+
+from tools.intent_classifier import classify_intent, INTENT_CONFIDENCE_THRESHOLD
+from tools.job_queue import JobQueue
+from tools.page_cache import PAGE_CACHE_TTL
+from tools.session_store import SessionStore
+from tools.llm_registry import get_llm
+from tools.llm_metrics import llm_metrics, metrics_scope, new_turn_id
+from tools.tracing import span, start_span, use_span, tracing_callback, recorder as trace_recorder
+from tools.single_flight import coalescing_stats
+from tools.http_client import http_client, serve_metrics
+from tools.tool_registry import get_tool, load_tools
+from database.product_store import get_product_store
+
+# LangChain, the scrapers and the product store are imported on first use
+# (see tools/tool_registry.py) so that importing this module stays cheap.
+
+# Prometheus endpoint for the upstream guards (breaker state, limits, outcomes), e.g. BASALAM_METRICS_PORT=9464
+if os.getenv("BASALAM_METRICS_PORT"):
+    serve_metrics(int(os.getenv("BASALAM_METRICS_PORT")))
 
 with open("prompts/base.txt", "r", encoding="utf-8") as f:
     system_prompt = f.read()
 
-llm = init_chat_model("gpt-4o-mini", model_provider="openai")
-
-# Enhanced tools list with product management and Eco Search
-tools = [
-    search_basalam, 
-    detect_intent, 
-    generate_seller_message, 
-    fix_basalam_product_url, 
-    crawl_product_page,
-    batch_crawl_products,
-    save_product_details,
-    get_product_details,
-    search_saved_products,
-    get_recent_products,
-    compare_products,
-    eco_search_expand,
-    perform_eco_search,
-    explain_eco_search
-]
-
-llm_with_tools = llm.bind_tools(tools)
-
-prompt = hub.pull("hwchase17/openai-tools-agent")
-prompt.messages[0].prompt.template = system_prompt
-
-agent = create_tool_calling_agent(llm, tools, prompt)
-agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=False)
-
-chat_history = []
-stored_products = {}  # Keep track of products by internal ID
-
-def process_and_store_products(products: list, search_query: str = "") -> dict:
+def build_agent_prompt(system_prompt: str):
+    """Local copy of the hwchase17/openai-tools-agent hub prompt, with our system prompt."""
+    from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+    return ChatPromptTemplate.from_messages([
+        ("system", system_prompt),
+        MessagesPlaceholder("chat_history", optional=True),
+        ("human", "{input}"),
+        MessagesPlaceholder("agent_scratchpad"),
+    ])
+
+_agent_executor = None
+_agent_lock = threading.Lock()
+
+def get_agent_executor():
+    """Build the agent (and load every tool) on the first turn rather than at import."""
+    global _agent_executor
+    if _agent_executor is None:
+        with _agent_lock:
+            if _agent_executor is None:
+                from langchain.agents import AgentExecutor, create_tool_calling_agent
+
+                start_enrichment_workers()
+                tools = load_tools()
+                agent = create_tool_calling_agent(get_llm(), tools, build_agent_prompt(system_prompt))
+                _agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=False, return_intermediate_steps=True)
+    return _agent_executor
+
+DEFAULT_SESSION = "default"
+
+def _summarize_history(summary: str, turns: list) -> str:
+    """Fold turns that left the history window into the running conversation summary."""
+    transcript = "\n".join(f"{turn['role']}: {turn['content']}" for turn in turns)
+    with metrics_scope(caller="summarize_history"):
+        response = get_llm().invoke(
+            "خلاصه فعلی گفتگو و پیام‌های جدید زیر را در حداکثر ۵ جمله کوتاه خلاصه کن. "
+            "محصولات، قیمت‌ها و ترجیحات کاربر را حفظ کن.\n\n"
+            f"خلاصه فعلی: {summary or '-'}\n\nپیام‌ها:\n{transcript}"
+        )
+    return response.content
+
+# Conversation history and shown products, kept per chat session
+session_store = SessionStore(summarizer=_summarize_history)
+
+def _enrich_product(job: dict) -> str:
+    """Background job: crawl a stored product's page and save the merged details."""
+    from tools.product_crawler import fetch_product_page
+
+    detailed_info = fetch_product_page(job["url"])
+    if not detailed_info.get('crawled_successfully', False):
+        raise RuntimeError(detailed_info.get('error', 'خطا در دریافت صفحه'))
+
+    # Merge basic info with detailed info; the search API's price (Toman) stays authoritative
+    enhanced_product = {
+        **job["product"],
+        **detailed_info,
+        'price': job["product"].get('price') or detailed_info.get('price', 0),
+        'basalam_id': job["product"].get('product_id'),
+        'search_query': job["search_query"]
+    }
+    internal_id = get_product_store().save_products([enhanced_product], job["search_query"])[0]
+    session = session_store.peek(job.get("session_id", DEFAULT_SESSION))
+    if session is not None:
+        session.remember_product(internal_id, enhanced_product)
+
+    print(f"✅ جزئیات محصول ذخیره شد: {enhanced_product.get('name', 'نامشخص')} (ID: {internal_id})")
+    return internal_id
+
+# Crawl-and-store runs off the request path; jobs are keyed by internal product ID.
+# A product enriched within the page TTL is not crawled again when it shows up in another search.
+enrichment_queue = JobQueue("enrichment", handler=_enrich_product, requeue_after=PAGE_CACHE_TTL)
+
+def start_enrichment_workers():
+    """Start the enrichment workers (idempotent), resuming jobs left pending or interrupted by a restart."""
+    enrichment_queue.start()
+
+def process_and_store_products(products: list, search_query: str = "", session_id: str = DEFAULT_SESSION) -> dict:
     """
-    Process search results, crawl detailed info, and store products.
+    Store search results right away and queue their pages for enrichment.
+    Crawling happens on background workers; get_enrichment_status reports
+    when a product's details are ready.
     Returns a mapping of product IDs to internal storage IDs.
     """
+    products = products[:5]  # Limit to 5 products to avoid overwhelming
     stored_mapping = {}
-    
-    for product in products[:5]:  # Limit to 5 products to avoid overwhelming
-        try:
+    session = session_store.get(session_id)
+
+    try:
+        with span("db.save_products", count=len(products)):
+            internal_ids = get_product_store().save_products(products, search_query)
+    except Exception as e:
+        print(f"❌ خطا در ذخیره محصولات: {str(e)}")
+        return stored_mapping
+
+    with span("crawl.enqueue"):
+        for product, internal_id in zip(products, internal_ids):
+            stored_mapping[product.get('product_id', '')] = internal_id
+            session.remember_product(internal_id, product)
+
             # Get the full URL
             short_url = product.get("link", "")
             vendor_name = product.get("vendor_name", "")
-            
             if short_url and vendor_name:
-                full_url = fix_basalam_product_url(short_url, vendor_name)
-                
-                # Crawl detailed information
-                detailed_info = crawl_product_page(full_url)
-                
-                if detailed_info.get('crawled_successfully', False):
-                    # Merge basic info with detailed info
-                    enhanced_product = {
-                        **product,
-                        **detailed_info,
-                        'basalam_id': product.get('product_id'),
-                        'search_query': search_query
-                    }
-                    
-                    # Save to database
-                    internal_id = save_product_details(enhanced_product, search_query)
-                    
-                    if "شناسه:" in internal_id:
-                        # Extract the actual ID from the response
-                        actual_id = internal_id.split("شناسه: ")[1].strip()
-                        stored_mapping[product.get('product_id', '')] = actual_id
-                        stored_products[actual_id] = enhanced_product
-                        
-                        print(f"✅ محصول ذخیره شد: {product.get('name', 'نامشخص')} (ID: {actual_id})")
-        
-        except Exception as e:
-            print(f"❌ خطا در پردازش محصول: {str(e)}")
-            continue
+                full_url = get_tool("fix_basalam_product_url").invoke({"short_url": short_url, "vendor_name": vendor_name})
+                enrichment_queue.enqueue(internal_id, {
+                    "url": full_url,
+                    "product": product,
+                    "search_query": search_query,
+                    "session_id": session_id
+                })
     
     return stored_mapping
 
-def get_agent_response(user_input: str) -> str:
-    global chat_history, stored_products
-    
-    intent_result = detect_intent.invoke({"input": user_input})
-    intent = intent_result.intent
+def get_recent_products(limit: int = 10) -> list:
+    """Recently stored products, for the sidebar."""
+    return get_tool("get_recent_products").invoke({"limit": limit})
+
+def clear_session(session_id: str):
+    """Forget a session's history and shown products (e.g. when the user clears the chat)."""
+    session_store.clear(session_id)
+
+def get_enrichment_status(internal_ids: list) -> dict:
+    """
+    Map internal product IDs to "ready", "pending" or "failed".
+    Products that were never queued are left out.
+    """
+    labels = {"done": "ready", "pending": "pending", "running": "pending", "failed": "failed"}
+    start_enrichment_workers()
+    return {key: labels[status] for key, status in enrichment_queue.status(internal_ids).items()}
+
+def _direct_response(user_input: str):
+    """
+    Handle messages that do not need the agent: seller messages and stored-product
+    lookups. Returns the reply, or None when the agent should run.
+    """
+    # Clear cases are classified locally; only ambiguous messages go to the LLM
+    with span("intent") as intent_span:
+        prediction = classify_intent(user_input)
+        intent = prediction.intent
+        intent_span.set_attribute("source", prediction.source)
+        if prediction.confidence < INTENT_CONFIDENCE_THRESHOLD:
+            with span("intent.llm"):
+                intent = get_tool("detect_intent").invoke({"input": user_input}).intent
+        intent_span.set_attribute("intent", intent)
 
     if intent == "contact_seller":
         product_title = "عنوان محصول نمونه"
         question = user_input  
-        message = generate_seller_message.invoke({
+        message = get_tool("generate_seller_message").invoke({
             "product_title": product_title,
             "question": question
         })
         print("📩 پیام تولید‌شده برای فروشنده:\n", message)
         return f"پیام برای فروشنده آماده شد ✅ (پیام: {message})"
 
-    else:
-        # Check if user is asking about stored products
-        if any(keyword in user_input.lower() for keyword in ['ذخیره', 'محصولات قبلی', 'جزئیات محصول', 'مقایسه']):
-            # Handle stored product queries directly
-            if 'جزئیات محصول' in user_input and 'شناسه' in user_input:
-                # Extract ID from user input
-                import re
-                id_match = re.search(r'شناسه[:\s]*([a-f0-9-]+)', user_input)
-                if id_match:
-                    product_id = id_match.group(1)
-                    product_details = get_product_details(product_id)
-                    if product_details and 'error' not in product_details:
+    # Check if user is asking about stored products
+    if any(keyword in user_input.lower() for keyword in ['ذخیره', 'محصولات قبلی', 'جزئیات محصول', 'مقایسه']):
+        # Handle stored product queries directly
+        if 'جزئیات محصول' in user_input and 'شناسه' in user_input:
+            # Extract ID from user input
+            id_match = re.search(r'شناسه[:\s]*([a-f0-9-]+)', user_input)
+            if id_match:
+                product_id = id_match.group(1)
+                product_details = get_tool("get_product_details").invoke({"internal_id": product_id})
+                if product_details and 'error' not in product_details:
+                    with span("format"):
                         return format_detailed_product(product_details)
-            
-            elif 'مقایسه' in user_input:
-                # Extract multiple IDs for comparison
-                import re
-                ids = re.findall(r'[a-f0-9-]{36}', user_input)
-                if len(ids) >= 2:
-                    comparison = compare_products(ids[:3])  # Max 3 products
+        
+        elif 'مقایسه' in user_input:
+            # Extract multiple IDs for comparison
+            ids = re.findall(r'[a-f0-9-]{36}', user_input)
+            if len(ids) >= 2:
+                comparison = get_tool("compare_products").invoke({"product_ids": ids[:3]})  # Max 3 products
+                with span("format"):
                     return format_product_comparison(comparison)
 
-        # Normal search and processing
-        result = agent_executor.invoke({
-            "input": user_input,
-            "chat_history": chat_history
-        })
-        
-        chat_history.append({"role": "user", "content": user_input})
-        chat_history.append({"role": "assistant", "content": result["output"]})
+    return None
+
+def _finish_agent_turn(session_id: str, user_input: str, output: str, intermediate_steps: list) -> str:
+    """
+    Record the turn in the session's history and store any searched products.
+    Returns the text to append to the agent's output (may be empty).
+    """
+    with span("history.add_turn"):
+        session = session_store.get(session_id)
+        session_store.add_turn(session, user_input, output)
+
+    # Check if the result contains products from search
+    if "نام کالا:" not in output and "قیمت:" not in output:
+        return ""
+
+    additional_info = ""
+    # Try to extract products from the agent's intermediate steps
+    try:
+        # Look for products in the agent's observation
+        for step in intermediate_steps:
+            if isinstance(step, tuple) and len(step) >= 2:
+                action, observation = step[0], step[1]
+                if hasattr(action, 'tool') and action.tool == 'search_basalam':
+                    if isinstance(observation, list) and observation:
+                        print(f"🔄 پردازش و ذخیره {len(observation)} محصول...")
+                        stored_mapping = process_and_store_products(observation, user_input, session_id)
+                        
+                        if stored_mapping:
+                            additional_info = "\n\n💾 محصولات ذخیره شدند! برای مشاهده جزئیات بیشتر از این شناسه‌ها استفاده کنید:\n"
+                            for basalam_id, internal_id in stored_mapping.items():
+                                product_name = (session.get_product(internal_id) or {}).get('name', 'نامشخص')
+                                additional_info += f"• {product_name}: `{internal_id}`\n"
+                            
+                            additional_info += "\n⏳ جزئیات کامل محصولات در پس‌زمینه دریافت می‌شود."
+                            additional_info += "\nمثال: «جزئیات محصول شناسه: " + list(stored_mapping.values())[0] + "»"
+                        break
+    except Exception as e:
+        print(f"❌ خطا در پردازش محصولات: {str(e)}")
+
+    return additional_info
+
+def _log_turn_metrics(turn_id: str):
+    summary = llm_metrics.turn_summary(turn_id)
+    if summary["calls"]:
+        print(f"📊 {summary['calls']} فراخوانی مدل، {summary['prompt_tokens']}+{summary['completion_tokens']} توکن، "
+              f"{summary['latency_ms']:.0f}ms")
+
+def get_agent_response(user_input: str, session_id: str = DEFAULT_SESSION) -> str:
+    turn_id = new_turn_id()
+    try:
+        with metrics_scope(caller="agent", turn_id=turn_id), span("chat.turn", session_id=session_id, turn_id=turn_id):
+            direct = _direct_response(user_input)
+            if direct is not None:
+                return direct
+
+            # Normal search and processing
+            with span("agent.run"):
+                result = get_agent_executor().invoke({
+                    "input": user_input,
+                    "chat_history": session_store.get(session_id).prompt_history()
+                }, config={"callbacks": [tracing_callback()]})
 
-        # Check if the result contains products from search
-        if "نام کالا:" in result["output"] or "قیمت:" in result["output"]:
-            # Try to extract products from the agent's intermediate steps
+            return result["output"] + _finish_agent_turn(session_id, user_input, result["output"], result.get("intermediate_steps", []))
+    finally:
+        _log_turn_metrics(turn_id)
+
+def _stream_event_handler(events: queue.Queue):
+    """Callback handler that forwards model tokens and tool events from an agent run to a queue."""
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class StreamEventHandler(BaseCallbackHandler):
+        def on_llm_new_token(self, token: str, **kwargs):
+            if token:
+                events.put({"type": "token", "text": token})
+
+        def on_tool_start(self, serialized: dict, input_str: str, **kwargs):
+            events.put({"type": "tool_start", "tool": serialized.get("name", ""), "input": input_str})
+
+        def on_tool_end(self, output, **kwargs):
+            events.put({"type": "tool_end", "tool": kwargs.get("name", "")})
+
+    return StreamEventHandler()
+
+def stream_agent_response(user_input: str, session_id: str = DEFAULT_SESSION) -> Iterator[dict]:
+    """
+    Streaming variant of get_agent_response.
+    Yields events as they happen:
+      {"type": "token", "text": ...}        piece of the reply text
+      {"type": "tool_start", "tool": ..., "input": ...}
+      {"type": "tool_end", "tool": ...}
+      {"type": "final", "text": ...}        the complete reply, last event
+    """
+    # Scopes are opened around synchronous sections only, never across a yield
+    turn_id = new_turn_id()
+    turn_span = start_span("chat.turn", session_id=session_id, turn_id=turn_id, streamed=True)
+    try:
+        with metrics_scope(caller="agent", turn_id=turn_id), use_span(turn_span):
+            direct = _direct_response(user_input)
+        if direct is not None:
+            yield {"type": "token", "text": direct}
+            yield {"type": "final", "text": direct}
+            return
+
+        events: queue.Queue = queue.Queue()
+        done = object()
+        chat_history = session_store.get(session_id).prompt_history()
+
+        def run_agent():
             try:
-                # Look for products in the agent's observation
-                for step in result.get("intermediate_steps", []):
-                    if isinstance(step, tuple) and len(step) >= 2:
-                        action, observation = step[0], step[1]
-                        if hasattr(action, 'tool') and action.tool == 'search_basalam':
-                            if isinstance(observation, list) and observation:
-                                print(f"🔄 پردازش و ذخیره {len(observation)} محصول...")
-                                stored_mapping = process_and_store_products(observation, user_input)
-                                
-                                if stored_mapping:
-                                    additional_info = "\n\n💾 محصولات ذخیره شدند! برای مشاهده جزئیات بیشتر از این شناسه‌ها استفاده کنید:\n"
-                                    for basalam_id, internal_id in stored_mapping.items():
-                                        product_name = stored_products.get(internal_id, {}).get('name', 'نامشخص')
-                                        additional_info += f"• {product_name}: `{internal_id}`\n"
-                                    
-                                    additional_info += "\nمثال: «جزئیات محصول شناسه: " + list(stored_mapping.values())[0] + "»"
-                                    result["output"] += additional_info
-                                break
+                with metrics_scope(caller="agent", turn_id=turn_id), use_span(turn_span), span("agent.run"):
+                    result = get_agent_executor().invoke(
+                        {"input": user_input, "chat_history": chat_history},
+                        config={"callbacks": [_stream_event_handler(events), tracing_callback()]}
+                    )
+                events.put({"type": "result", "result": result})
             except Exception as e:
-                print(f"❌ خطا در پردازش محصولات: {str(e)}")
+                events.put({"type": "error", "error": e})
+            finally:
+                events.put(done)
+
+        threading.Thread(target=run_agent, daemon=True).start()
+
+        result = None
+        while True:
+            event = events.get()
+            if event is done:
+                break
+            if event["type"] == "error":
+                turn_span.record_error(event["error"])
+                raise event["error"]
+            if event["type"] == "result":
+                result = event["result"]
+                continue
+            yield event
+
+        output = result["output"]
+        with use_span(turn_span):
+            additional_info = _finish_agent_turn(session_id, user_input, output, result.get("intermediate_steps", []))
+        if additional_info:
+            yield {"type": "token", "text": additional_info}
+        yield {"type": "final", "text": output + additional_info}
+    finally:
+        # Also on agent errors and when the caller stops reading early
+        _log_turn_metrics(turn_id)
+        turn_span.end()
+
+def get_last_turn_trace(session_id: str = DEFAULT_SESSION) -> list:
+    """Spans of the session's most recent turn, for the timing view."""
+    return trace_recorder.last_trace(session_id)
+
+def get_coalescing_stats() -> dict:
+    """Upstream searches and crawls saved by merging identical in-flight calls."""
+    return coalescing_stats()
 
-        return result["output"]
+def get_upstream_stats() -> dict:
+    """Circuit breaker state, adaptive concurrency limit and call outcomes per Basalam host."""
+    return http_client.host_stats()
 
 def format_detailed_product(product: dict) -> str:
     """Format detailed product information for display"""
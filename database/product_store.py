@@ -2,21 +2,271 @@
 import sqlite3
 import json
 import uuid
+import queue
+import threading
+from contextlib import contextmanager
+from itertools import islice
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Sequence, Iterator, Tuple
 import os
+import re
+from collections.abc import Mapping
+
+from tools.text_utils import normalize_persian
+
+# Per-connection tuning; journal_mode=WAL is persistent and set once in init_database
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-16000",  # KiB
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+# Prepared statements kept per connection. The store runs about 25 distinct statements:
+# the fixed ones below plus get/iter/search for each projection callers use. Batch sizes are
+# passed as JSON, not as "?, ?, ..." lists, so the set does not grow with the data.
+STATEMENT_CACHE_SIZE = 32
+
+# Crawled details (description, specs, reviews, images) are only overwritten by non-empty
+# values, so re-saving a bare search result does not erase an enriched product.
+UPSERT_PRODUCT_SQL = '''
+    INSERT INTO products (
+        id, product_id, name, price, image_url, rating, rating_count,
+        vendor_name, vendor_city, link, description, specifications,
+        reviews, additional_images, search_query, created_at, updated_at
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(product_id) DO UPDATE SET
+        name=excluded.name,
+        price=excluded.price,
+        image_url=COALESCE(NULLIF(excluded.image_url, ''), products.image_url),
+        rating=excluded.rating,
+        rating_count=excluded.rating_count,
+        vendor_name=excluded.vendor_name,
+        vendor_city=COALESCE(NULLIF(excluded.vendor_city, ''), products.vendor_city),
+        link=excluded.link,
+        description=COALESCE(NULLIF(excluded.description, ''), products.description),
+        specifications=COALESCE(NULLIF(excluded.specifications, '{}'), products.specifications),
+        reviews=COALESCE(NULLIF(excluded.reviews, '[]'), products.reviews),
+        additional_images=COALESCE(NULLIF(excluded.additional_images, '[]'), products.additional_images),
+        search_query=excluded.search_query,
+        updated_at=excluded.updated_at
+    RETURNING id
+'''
+
+# Full-text index over normalized text. Plain-SQL triggers only note which products
+# changed in products_fts_dirty, so any writer (sqlite3 CLI, migration scripts) works
+# without custom functions; ProductStore re-indexes the noted rows, normalized in
+# Python, in every write transaction and when it opens the database.
+FTS_SCHEMA = (
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        name, description, specifications, reviews,
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )''',
+    'CREATE TABLE IF NOT EXISTS products_fts_dirty (product_rowid INTEGER PRIMARY KEY)',
+    '''CREATE TRIGGER IF NOT EXISTS products_fts_dirty_insert AFTER INSERT ON products BEGIN
+        INSERT OR IGNORE INTO products_fts_dirty VALUES (new.rowid);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS products_fts_dirty_update
+        AFTER UPDATE OF name, description, specifications, reviews ON products BEGIN
+        INSERT OR IGNORE INTO products_fts_dirty VALUES (new.rowid);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS products_fts_dirty_delete AFTER DELETE ON products BEGIN
+        INSERT OR IGNORE INTO products_fts_dirty VALUES (old.rowid);
+    END''',
+)
+FTS_SYNC_BATCH = 500
+FTS_INSERT_SQL = '''
+    INSERT INTO products_fts(rowid, name, description, specifications, reviews) VALUES (?, ?, ?, ?, ?)
+'''
+# Earlier versions kept the index in sync with triggers calling a Python function
+LEGACY_FTS_TRIGGERS = ('products_fts_insert', 'products_fts_update', 'products_fts_delete')
+
+# BM25 column weights: name, description, specifications, reviews (lower score ranks higher)
+FTS_SEARCH_SQL = '''
+    WITH hits AS (
+        SELECT rowid, bm25(products_fts, 10.0, 4.0, 2.0, 1.0) AS score
+        FROM products_fts WHERE products_fts MATCH :match
+        ORDER BY score LIMIT :limit OFFSET :offset
+    )
+    SELECT {columns}, fa_snippet(:query, p.name, p.description, p.specifications, p.reviews) AS snippet,
+           hits.score
+    FROM hits
+    JOIN products p ON p.rowid = hits.rowid
+    ORDER BY hits.score
+'''
+SNIPPET_WORDS = 12
+
+def fts_match_expression(query: str) -> str:
+    """
+    Turn free text into an FTS5 query: every normalized token must match,
+    the last one as a prefix so partially typed words still hit.
+    """
+    terms = [f'"{token}"' for token in fts_tokens(query)]
+    if terms:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+def fts_tokens(text: str) -> List[str]:
+    return [t for t in re.split(r"[^\w]+", normalize_persian(text)) if t]
+
+def fts_row(texts: Sequence[Optional[str]]) -> List[str]:
+    """Index values for (name, description, specifications, reviews)."""
+    return [normalize_persian(text) for text in texts]
+
+def _readable(value: Optional[str]) -> str:
+    """Column text as a reader would see it: JSON specifications and reviews become plain text."""
+    if not value or value[0] not in "[{":
+        return value or ""
+    try:
+        data = json.loads(value)
+    except ValueError:
+        return value
+    if isinstance(data, dict):
+        return "، ".join(f"{key}: {val}" for key, val in data.items())
+    return " / ".join(str(item) for item in data)
+
+def highlight_snippet(query: str, *texts: Optional[str]) -> str:
+    """
+    Up to SNIPPET_WORDS words around the first match in the first matching
+    column, with matched words in **bold**. Works on the stored wording, so the
+    snippet keeps the original spelling and case; only the matching is normalized.
+    """
+    tokens = fts_tokens(query)
+    if not tokens:
+        return ""
+
+    def is_match(word: str) -> bool:
+        return any(part == token or (token == tokens[-1] and part.startswith(token))
+                   for part in fts_tokens(word) for token in tokens)
+
+    for text in texts:
+        words = _readable(text).split()
+        hits = [i for i, word in enumerate(words) if is_match(word)]
+        if not hits:
+            continue
+        start = max(0, min(hits[0] - 2, len(words) - SNIPPET_WORDS))
+        end = start + SNIPPET_WORDS
+        shown = [f"**{word}**" if i in hits else word for i, word in enumerate(words[start:end], start)]
+        return ("…" if start else "") + " ".join(shown) + ("…" if end < len(words) else "")
+    return ""
+
+PRODUCT_COLUMNS = (
+    'id', 'product_id', 'name', 'price', 'image_url', 'rating', 'rating_count',
+    'vendor_name', 'vendor_city', 'link', 'description', 'specifications',
+    'reviews', 'additional_images', 'search_query', 'created_at', 'updated_at'
+)
+# Columns needed by list views (sidebar, search listings, comparisons)
+SUMMARY_COLUMNS = ('id', 'product_id', 'name', 'price', 'rating', 'vendor_name', 'vendor_city', 'link')
+# JSON-encoded columns and the value used when they are empty
+JSON_COLUMNS = {'specifications': dict, 'reviews': list, 'additional_images': list}
+
+def with_key_columns(columns: Optional[Sequence[str]], keys: Sequence[str]) -> Optional[List[str]]:
+    """Add the keyset pagination columns to a projection if they are missing."""
+    if columns is None:
+        return None
+    return list(columns) + [k for k in keys if k not in columns]
+
+def select_columns(columns: Optional[Sequence[str]], table: str = "") -> str:
+    """Build a validated SELECT list; ``None`` selects every column."""
+    prefix = f"{table}." if table else ""
+    if columns is None:
+        return f"{prefix}*"
+    unknown = [c for c in columns if c not in PRODUCT_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown product columns: {', '.join(unknown)}")
+    return ", ".join(f"{prefix}{c}" for c in columns)
+
+class ProductRow(Mapping):
+    """
+    Read-only product record over a sqlite3.Row.
+    JSON columns are decoded on first access, so rows that are only listed
+    never pay for json.loads. Use ``dict(row)`` for a plain, fully decoded copy.
+    """
+    __slots__ = ('_row', '_decoded')
+
+    def __init__(self, row: sqlite3.Row):
+        self._row = row
+        self._decoded = {}
+
+    def __getitem__(self, key: str) -> Any:
+        if key in JSON_COLUMNS:
+            if key not in self._decoded:
+                try:
+                    raw = self._row[key]
+                except IndexError:
+                    raise KeyError(key) from None
+                self._decoded[key] = json.loads(raw) if raw else JSON_COLUMNS[key]()
+            return self._decoded[key]
+        try:
+            return self._row[key]
+        except IndexError:
+            raise KeyError(key) from None
+
+    def __iter__(self):
+        return iter(self._row.keys())
+
+    def __len__(self) -> int:
+        return len(self._row)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
 
 class ProductStore:
-    def __init__(self, db_path: str = "database/products.db"):
+    def __init__(self, db_path: str = "database/products.db", pool_size: int = 8):
         """Initialize the product store with SQLite database"""
         self.db_path = db_path
+        self.pool_size = pool_size
+        self._pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._created = 0
+        self._pool_lock = threading.Lock()
         # Create database directory if it doesn't exist
-        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
         self.init_database()
+
+    def _open_connection(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False,
+                               cached_statements=STATEMENT_CACHE_SIZE)
+        conn.row_factory = sqlite3.Row
+        conn.create_function("fa_snippet", 5, highlight_snippet, deterministic=True)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        """
+        Borrow a pooled connection for one transaction.
+        Commits on success and rolls back on error; the connection is returned to the pool.
+        """
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            with self._pool_lock:
+                can_open = self._created < self.pool_size
+                if can_open:
+                    self._created += 1
+            conn = self._open_connection() if can_open else self._pool.get()
+        try:
+            with conn:
+                yield conn
+        finally:
+            self._pool.put(conn)
+
+    def close(self):
+        """Close all idle pooled connections"""
+        while True:
+            try:
+                conn = self._pool.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._pool_lock:
+                self._created -= 1
     
     def init_database(self):
         """Create the products table if it doesn't exist"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
             conn.execute('''
                 CREATE TABLE IF NOT EXISTS products (
                     id TEXT PRIMARY KEY,
@@ -42,139 +292,166 @@ class ProductStore:
             # Create index for faster searches
             conn.execute('CREATE INDEX IF NOT EXISTS idx_product_id ON products(product_id)')
             conn.execute('CREATE INDEX IF NOT EXISTS idx_search_query ON products(search_query)')
-            conn.commit()
+            # Keyset pagination indexes for the streaming iterators
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_created_at_id ON products(created_at, id)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_search_query_created ON products(search_query, created_at, id)')
+
+            tracked = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='products_fts_dirty'"
+            ).fetchone()
+            for trigger in LEGACY_FTS_TRIGGERS:
+                conn.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+            for statement in FTS_SCHEMA:
+                conn.execute(statement)
+            if not tracked:
+                # First open with change tracking: index products the old index missed and drop
+                # entries of deleted ones (one-time; earlier outside UPDATEs need a store write)
+                conn.execute('''INSERT OR IGNORE INTO products_fts_dirty
+                                SELECT rowid FROM products WHERE rowid NOT IN (SELECT rowid FROM products_fts)''')
+                conn.execute('''INSERT OR IGNORE INTO products_fts_dirty
+                                SELECT rowid FROM products_fts WHERE rowid NOT IN (SELECT rowid FROM products)''')
+            self._sync_index(conn)
+
+    @staticmethod
+    def _sync_index(conn: sqlite3.Connection) -> int:
+        """Re-index the products noted in products_fts_dirty (by any writer). Returns the row count."""
+        rowids = [row[0] for row in conn.execute('DELETE FROM products_fts_dirty RETURNING product_rowid').fetchall()]
+        for start in range(0, len(rowids), FTS_SYNC_BATCH):
+            batch = json.dumps(rowids[start:start + FTS_SYNC_BATCH])
+            conn.execute('DELETE FROM products_fts WHERE rowid IN (SELECT value FROM json_each(?))', (batch,))
+            rows = conn.execute(
+                'SELECT rowid, name, description, specifications, reviews FROM products '
+                'WHERE rowid IN (SELECT value FROM json_each(?))', (batch,)
+            ).fetchall()
+            conn.executemany(FTS_INSERT_SQL, ((row[0], *fts_row(row[1:])) for row in rows))
+        return len(rowids)
     
     def save_product(self, product_data: Dict[str, Any], search_query: str = "") -> str:
         """Save a product to the database and return the internal ID"""
-        internal_id = str(uuid.uuid4())
+        return self.save_products([product_data], search_query)[0]
+
+    def save_products(self, products: List[Dict[str, Any]], search_query: str = "") -> List[str]:
+        """
+        Upsert several products in a single transaction.
+        Returns the internal IDs in input order; products already stored keep their ID.
+        """
         now = datetime.now().isoformat()
-        
-        with sqlite3.connect(self.db_path) as conn:
-            try:
-                conn.execute('''
-                    INSERT OR REPLACE INTO products (
-                        id, product_id, name, price, image_url, rating, rating_count,
-                        vendor_name, vendor_city, link, description, specifications,
-                        reviews, additional_images, search_query, created_at, updated_at
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    internal_id,
-                    product_data.get('product_id', ''),
-                    product_data.get('name', ''),
-                    product_data.get('price', 0),
-                    product_data.get('image', ''),
-                    product_data.get('rating', 0.0),
-                    product_data.get('rating_count', 0),
-                    product_data.get('vendor_name', ''),
-                    product_data.get('vendor_city', ''),
-                    product_data.get('link', ''),
-                    product_data.get('description', ''),
-                    json.dumps(product_data.get('specifications', {}), ensure_ascii=False),
-                    json.dumps(product_data.get('reviews', []), ensure_ascii=False),
-                    json.dumps(product_data.get('additional_images', []), ensure_ascii=False),
-                    search_query,
-                    now,
-                    now
-                ))
-                conn.commit()
-                return internal_id
-            except sqlite3.IntegrityError:
-                # Product already exists, update it
-                conn.execute('''
-                    UPDATE products SET
-                        name=?, price=?, image_url=?, rating=?, rating_count=?,
-                        vendor_name=?, vendor_city=?, link=?, description=?,
-                        specifications=?, reviews=?, additional_images=?,
-                        search_query=?, updated_at=?
-                    WHERE product_id=?
-                ''', (
-                    product_data.get('name', ''),
-                    product_data.get('price', 0),
-                    product_data.get('image', ''),
-                    product_data.get('rating', 0.0),
-                    product_data.get('rating_count', 0),
-                    product_data.get('vendor_name', ''),
-                    product_data.get('vendor_city', ''),
-                    product_data.get('link', ''),
-                    product_data.get('description', ''),
-                    json.dumps(product_data.get('specifications', {}), ensure_ascii=False),
-                    json.dumps(product_data.get('reviews', []), ensure_ascii=False),
-                    json.dumps(product_data.get('additional_images', []), ensure_ascii=False),
-                    search_query,
-                    now,
-                    product_data.get('product_id', '')
-                ))
-                # Return the existing internal ID
-                cursor = conn.execute('SELECT id FROM products WHERE product_id=?', (product_data.get('product_id', ''),))
-                result = cursor.fetchone()
-                return result[0] if result else internal_id
+        internal_ids = []
+        with self._connection() as conn:
+            for product_data in products:
+                cursor = conn.execute(UPSERT_PRODUCT_SQL, self._product_params(product_data, search_query, now))
+                internal_ids.append(cursor.fetchone()[0])
+            # Indexes the stored (merged) text, plus anything other writers changed
+            self._sync_index(conn)
+        return internal_ids
+
+    @staticmethod
+    def _product_params(product_data: Dict[str, Any], search_query: str, now: str) -> tuple:
+        product_id = product_data.get('product_id')
+        return (
+            str(uuid.uuid4()),
+            str(product_id) if product_id not in (None, '') else None,
+            product_data.get('name', ''),
+            product_data.get('price', 0),
+            product_data.get('image', ''),
+            product_data.get('rating', 0.0),
+            product_data.get('rating_count', 0),
+            product_data.get('vendor_name', ''),
+            product_data.get('vendor_city', ''),
+            product_data.get('link', ''),
+            product_data.get('description', ''),
+            json.dumps(product_data.get('specifications', {}), ensure_ascii=False),
+            json.dumps(product_data.get('reviews', []), ensure_ascii=False),
+            json.dumps(product_data.get('additional_images', []), ensure_ascii=False),
+            search_query,
+            now,
+            now
+        )
     
-    def get_product(self, internal_id: str) -> Optional[Dict[str, Any]]:
+    def get_product(self, internal_id: str, columns: Optional[Sequence[str]] = None) -> Optional[ProductRow]:
         """Get a product by its internal ID"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.execute('SELECT * FROM products WHERE id=?', (internal_id,))
+        with self._connection() as conn:
+            cursor = conn.execute(f'SELECT {select_columns(columns)} FROM products WHERE id=?', (internal_id,))
             row = cursor.fetchone()
-            
-            if row:
-                product = dict(row)
-                # Parse JSON fields
-                product['specifications'] = json.loads(product['specifications']) if product['specifications'] else {}
-                product['reviews'] = json.loads(product['reviews']) if product['reviews'] else []
-                product['additional_images'] = json.loads(product['additional_images']) if product['additional_images'] else []
-                return product
-            return None
+            return ProductRow(row) if row else None
     
-    def get_products_by_search(self, search_query: str) -> List[Dict[str, Any]]:
+    def get_products_by_search(self, search_query: str, columns: Optional[Sequence[str]] = None) -> List[ProductRow]:
         """Get all products from a specific search query"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.execute('SELECT * FROM products WHERE search_query=? ORDER BY created_at DESC', (search_query,))
-            products = []
-            for row in cursor.fetchall():
-                product = dict(row)
-                product['specifications'] = json.loads(product['specifications']) if product['specifications'] else {}
-                product['reviews'] = json.loads(product['reviews']) if product['reviews'] else []
-                product['additional_images'] = json.loads(product['additional_images']) if product['additional_images'] else []
-                products.append(product)
-            return products
+        return list(self.iter_products(search_query=search_query, columns=columns))
+
+    def iter_products(self, batch_size: int = 500, columns: Optional[Sequence[str]] = None,
+                      search_query: Optional[str] = None) -> Iterator[ProductRow]:
+        """
+        Stream products newest first in batches of ``batch_size``.
+        Uses keyset pagination on (created_at, id), so each batch is an index seek
+        and memory stays constant however large the store is. Projections always
+        include created_at and id.
+        """
+        select = select_columns(with_key_columns(columns, ('created_at', 'id')))
+        where = "search_query = ?" if search_query is not None else "1"
+        params: Tuple = (search_query,) if search_query is not None else ()
+        first_sql = f"SELECT {select} FROM products WHERE {where} ORDER BY created_at DESC, id DESC LIMIT ?"
+        next_sql = (f"SELECT {select} FROM products WHERE {where} AND (created_at, id) < (?, ?) "
+                    f"ORDER BY created_at DESC, id DESC LIMIT ?")
+
+        last_key = None
+        while True:
+            with self._connection() as conn:
+                if last_key is None:
+                    rows = conn.execute(first_sql, params + (batch_size,)).fetchall()
+                else:
+                    rows = conn.execute(next_sql, params + last_key + (batch_size,)).fetchall()
+            for row in rows:
+                yield ProductRow(row)
+            if len(rows) < batch_size:
+                return
+            last_key = (rows[-1]['created_at'], rows[-1]['id'])
+
+    def export_jsonl(self, path: str, search_query: Optional[str] = None, batch_size: int = 500) -> int:
+        """Write products to a JSON Lines file in constant memory. Returns the row count."""
+        count = 0
+        with open(path, "w", encoding="utf-8") as f:
+            for product in self.iter_products(batch_size=batch_size, search_query=search_query):
+                f.write(json.dumps(dict(product), ensure_ascii=False) + "\n")
+                count += 1
+        return count
     
-    def get_all_products(self, limit: int = 50) -> List[Dict[str, Any]]:
-        """Get all stored products with a limit"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.execute('SELECT * FROM products ORDER BY created_at DESC LIMIT ?', (limit,))
-            products = []
-            for row in cursor.fetchall():
-                product = dict(row)
-                product['specifications'] = json.loads(product['specifications']) if product['specifications'] else {}
-                product['reviews'] = json.loads(product['reviews']) if product['reviews'] else []
-                product['additional_images'] = json.loads(product['additional_images']) if product['additional_images'] else []
-                products.append(product)
-            return products
+    def get_all_products(self, limit: int = 50, columns: Optional[Sequence[str]] = None) -> List[ProductRow]:
+        """Newest ``limit`` products, read through iter_products in batches of at most 500."""
+        return list(islice(self.iter_products(batch_size=max(1, min(limit, 500)), columns=columns), limit))
     
-    def search_stored_products(self, query: str) -> List[Dict[str, Any]]:
-        """Search through stored products by name or description"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.execute('''
-                SELECT * FROM products 
-                WHERE name LIKE ? OR description LIKE ? 
-                ORDER BY created_at DESC
-            ''', (f'%{query}%', f'%{query}%'))
-            
-            products = []
-            for row in cursor.fetchall():
-                product = dict(row)
-                product['specifications'] = json.loads(product['specifications']) if product['specifications'] else {}
-                product['reviews'] = json.loads(product['reviews']) if product['reviews'] else []
-                product['additional_images'] = json.loads(product['additional_images']) if product['additional_images'] else []
-                products.append(product)
-            return products
+    def search_stored_products(self, query: str, limit: int = 20, offset: int = 0,
+                               columns: Optional[Sequence[str]] = None) -> List[ProductRow]:
+        """
+        Full-text search over name, description, specifications and reviews.
+        Results are BM25-ranked and carry a highlighted ``snippet``; use limit/offset to page.
+        """
+        match = fts_match_expression(query)
+        if not match:
+            return []
+
+        with self._connection() as conn:
+            cursor = conn.execute(FTS_SEARCH_SQL.format(columns=select_columns(columns, 'p')),
+                                  {'match': match, 'query': query, 'limit': limit, 'offset': offset})
+            return [ProductRow(row) for row in cursor.fetchall()]
 
     def delete_product(self, internal_id: str) -> bool:
         """Delete a product by its internal ID"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             cursor = conn.execute('DELETE FROM products WHERE id=?', (internal_id,))
-            conn.commit()
+            self._sync_index(conn)
             return cursor.rowcount > 0
+
+
+_default_store: Optional[ProductStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_product_store() -> ProductStore:
+    """Shared store for the app, opened (and the database initialized) on first use."""
+    global _default_store
+    if _default_store is None:
+        with _default_store_lock:
+            if _default_store is None:
+                _default_store = ProductStore()
+    return _default_store
@@ -1,21 +1,95 @@
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 import requests
 from langchain_core.tools import tool
-from typing import Optional
+from typing import Iterator, List, Optional
+from tools.http_client import http_client
+from tools.search_cache import search_cache, search_cache_key
+from tools.single_flight import search_flights
+from tools.result_set import ResultSet
+from tools.tracing import span
+
+# Overridable so benchmarks can point the tools at a local stand-in (benchmarks/stub_server.py)
+api_url = os.getenv("BASALAM_SEARCH_URL", "https://search.basalam.com/ai-engine/api/v2.0/product/search")
+product_base_url = os.getenv("BASALAM_WEB_URL", "https://basalam.com").rstrip("/")
+
+# Deep search: page through the results until enough products pass the client-side filters
+PAGE_SIZE = 24
+DEEP_SEARCH_RESULTS = 20  # filtered products to collect
+DEEP_SEARCH_MAX_PAGES = 10
+DEEP_SEARCH_BUDGET = 6.0  # seconds for the whole deep search
+DEEP_SEARCH_PREFETCH = 3  # pages requested ahead of the one being read
+
+_page_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="search-page")
+
+
+class SearchError(Exception):
+    """The search API answered with an error status."""
 
-api_url = "https://search.basalam.com/ai-engine/api/v2.0/product/search"
 
 @tool
-def search_basalam(query: str, max_price: Optional[int] = None, min_rating: Optional[float] = None, vendor_city: Optional[str] = None) -> list:
+def search_basalam(query: str, max_price: Optional[int] = None, min_rating: Optional[float] = None, vendor_city: Optional[str] = None, min_results: Optional[int] = None) -> list:
     """
     جستجوی تمیز و مرتب محصولات از باسلام
     فقط اطلاعات مهم هر محصول را برمی‌گرداند و بر اساس قیمت مرتب می‌کند.
+    با فیلتر امتیاز یا شهر (یا min_results) چند صفحه نتیجه بررسی می‌شود تا تعداد کافی محصول پیدا شود.
 
     :param query: عبارت جستجو (مثلاً "کفش")
     :param max_price: حداکثر قیمت به تومان (مثلاً 500000)
     :param min_rating: حداقل امتیاز محصول (مثلاً 4.5)
     :param vendor_city: شهر فروشنده (مثلاً "تهران")
+    :param min_results: حداقل تعداد محصول مورد نیاز (مثلاً 30)
     :return: لیستی از محصولات با اطلاعات تمیز
     """
+    key = search_cache_key(query, max_price, min_rating, vendor_city)
+    # The API does not apply the rating and city filters reliably; they are re-checked here,
+    # which can leave few products from one page, so those searches read several pages
+    deep = bool(min_rating or vendor_city or min_results)
+    if deep:
+        key += (("deep", min_results or DEEP_SEARCH_RESULTS),)
+    with span("search.lookup", query=query, deep=deep) as lookup:
+        lookup.set_attribute("cache", "hit")
+
+        def fetch():
+            if deep:
+                return deep_search(query, max_price, min_rating, vendor_city, want=min_results or DEEP_SEARCH_RESULTS)
+            return fetch_search_results(query, max_price, min_rating, vendor_city)
+
+        caller = threading.get_ident()
+
+        def load():
+            # A stale hit refreshes on a background thread; only a load for this call is a miss
+            refresh = threading.get_ident() != caller
+            if not refresh:
+                lookup.set_attribute("cache", "miss")
+            # Identical searches already in flight (e.g. other sessions) share one API call
+            products, shared = search_flights.do(key, fetch)
+            if not refresh:
+                lookup.set_attribute("coalesced", shared)
+            return products
+
+        try:
+            products = search_cache.get_or_load(key, load)
+        except (SearchError, requests.RequestException) as e:
+            # API failing or its circuit open: answer from an older result if one is still kept
+            products = search_cache.peek(key)
+            if products is None:
+                raise Exception("جستجوی باسلام موقتاً در دسترس نیست، لطفاً کمی بعد دوباره امتحان کنید") from e
+            print(f"⚠️ جستجوی باسلام در دسترس نیست، از نتایج قبلی استفاده شد: {query}")
+            lookup.set_attribute("cache", "stale-fallback")
+        lookup.set_attribute("results", len(products))
+    return list(products)
+
+def fetch_search_page(query: str, page: Optional[int] = None, max_price: Optional[int] = None,
+                      min_rating: Optional[float] = None, vendor_city: Optional[str] = None) -> list:
+    """
+    Raw products from one call to the Basalam search API. With ``page`` set,
+    asks for that page of PAGE_SIZE results; otherwise the API's default first page.
+    """
     headers = {
         "Content-Type": "application/json",
         "Accept": "application/json",
@@ -25,6 +99,10 @@ def search_basalam(query: str, max_price: Optional[int] = None, min_rating: Opti
         "q": query,
     }
 
+    if page is not None:
+        params["from"] = page * PAGE_SIZE
+        params["size"] = PAGE_SIZE
+
     if max_price:
         params["max_price"] = max_price * 10  # Convert to Rial
 
@@ -34,43 +112,84 @@ def search_basalam(query: str, max_price: Optional[int] = None, min_rating: Opti
     if vendor_city:
         params["vendor_city"] = vendor_city
 
-    response = requests.get(api_url, headers=headers, params=params)
+    with span("search.http", page=page or 0) as request:
+        response = http_client.get(api_url, headers=headers, params=params)
+        request.set_attribute("http.status_code", response.status_code)
 
     if response.status_code != 200:
         print("❌ پاسخ API:", response.status_code, response.text)
-        raise Exception("خطا در جستجوی باسلام")
-
-    all_data = response.json()
-    products = all_data.get("products", [])
-
-    cleaned_products = []
-
-    for product in products:
-        cleaned = {
-            "name": product.get("name"),
-            "price": int(product.get("price", 0)) // 10,
-            "image": product.get("photo", {}).get("MEDIUM"),
-            "rating": product.get("rating", {}).get("average"),
-            "rating_count": product.get("rating", {}).get("count"),
-            "vendor_name": product.get("vendor", {}).get("name"),
-            "vendor_city": product.get("vendor", {}).get("owner", {}).get("city"),
-            "product_id": product.get("id"),
-            "link": f"https://basalam.com/p/{product.get('id')}",
-        }
-        
-        # Apply filters
-        if not cleaned["price"]:  # Skip products without price
-            continue
-        
-        if min_rating and (not cleaned["rating"] or cleaned["rating"] < min_rating):
-            continue
-            
-        if vendor_city and cleaned["vendor_city"] and cleaned["vendor_city"].lower() != vendor_city.lower():
-            continue
-            
-        cleaned_products.append(cleaned)
-
-    # مرتب‌سازی بر اساس قیمت
-    sorted_products = sorted(cleaned_products, key=lambda x: x["price"])
-
-    return sorted_products
+        raise SearchError("خطا در جستجوی باسلام")
+
+    return response.json().get("products", [])
+
+def _clean_and_filter(products: list, min_rating: Optional[float], vendor_city: Optional[str]) -> ResultSet:
+    # Skip products without a price, apply the rating/city filters, sort by price
+    results = ResultSet.from_api(products, product_base_url)
+    return results.filter(min_rating=min_rating, vendor_city=vendor_city).rank(("price",))
+
+def fetch_search_results(query: str, max_price: Optional[int] = None, min_rating: Optional[float] = None, vendor_city: Optional[str] = None) -> list:
+    """Call the Basalam search API (uncached) and return cleaned, filtered, price-sorted products."""
+    return _clean_and_filter(fetch_search_page(query, None, max_price, min_rating, vendor_city), min_rating, vendor_city).to_list()
+
+def iter_search_pages(query: str, max_price: Optional[int] = None, min_rating: Optional[float] = None,
+                      vendor_city: Optional[str] = None, want: int = DEEP_SEARCH_RESULTS,
+                      max_pages: int = DEEP_SEARCH_MAX_PAGES, budget: float = DEEP_SEARCH_BUDGET,
+                      prefetch: int = DEEP_SEARCH_PREFETCH) -> Iterator[List[dict]]:
+    """
+    Yield the cleaned, filtered products of each results page, in page order,
+    while the next ``prefetch`` pages are already being fetched.
+
+    Stops once ``want`` products were yielded, after the last page (a short
+    one), after ``max_pages`` pages or when ``budget`` seconds have passed.
+    A failed first page raises; a later failure ends the search early.
+    """
+    deadline = time.monotonic() + budget
+    in_flight = deque()
+    next_page = 0
+    collected = 0
+
+    def submit():
+        nonlocal next_page
+        # Each page request runs in a copy of the caller's context so its span nests under the search
+        future = _page_pool.submit(contextvars.copy_context().run, fetch_search_page, query, next_page,
+                                    max_price, min_rating, vendor_city)
+        in_flight.append((next_page, future))
+        next_page += 1
+
+    try:
+        while len(in_flight) < max(prefetch, 1) and next_page < max_pages:
+            submit()
+        while in_flight:
+            page, future = in_flight.popleft()
+            try:
+                products = future.result(timeout=max(deadline - time.monotonic(), 0))
+            except FutureTimeout:
+                print(f"⏱️ زمان جستجوی عمیق تمام شد ({page} صفحه)")
+                return
+            except Exception as e:
+                if page == 0:
+                    raise
+                print(f"⚠️ خطا در دریافت صفحه {page + 1} نتایج: {str(e)}")
+                return
+
+            results = _clean_and_filter(products, min_rating, vendor_city).to_list()
+            collected += len(results)
+            yield results
+            if collected >= want or len(products) < PAGE_SIZE:
+                return
+            if next_page < max_pages:
+                submit()
+    finally:
+        # Pages not started yet are dropped; ones in progress finish in the background
+        for _, future in in_flight:
+            future.cancel()
+
+def deep_search(query: str, max_price: Optional[int] = None, min_rating: Optional[float] = None,
+                vendor_city: Optional[str] = None, want: int = DEEP_SEARCH_RESULTS) -> list:
+    """Collect pages from iter_search_pages into one price-sorted list without duplicates."""
+    with span("search.deep", want=want) as deep:
+        pages = [ResultSet.from_records(page) for page in iter_search_pages(query, max_price, min_rating, vendor_city, want)]
+        results = ResultSet.concat(pages).dedupe().rank(("price",))
+        deep.set_attribute("pages", len(pages))
+        deep.set_attribute("results", len(results))
+    return results.to_list()
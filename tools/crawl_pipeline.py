@@ -0,0 +1,84 @@
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_PER_HOST_LIMIT = 3
+DEFAULT_DEADLINE = 8.0  # seconds
+
+
+class CrawlPipeline:
+    """
+    Bounded-concurrency crawl pipeline.
+
+    Pages are fetched and parsed in parallel on a shared thread pool, with at most
+    ``per_host_limit`` requests in flight per host. ``run`` waits until the deadline
+    and returns whatever finished in time; the remaining jobs keep running in the
+    background and are handed to ``on_late`` as they complete.
+    """
+
+    def __init__(self, fetch: Callable[[str], Dict[str, Any]],
+                 max_workers: int = DEFAULT_MAX_WORKERS,
+                 per_host_limit: int = DEFAULT_PER_HOST_LIMIT):
+        self.fetch = fetch
+        self.per_host_limit = per_host_limit
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="crawl")
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def _host_slot(self, url: str) -> threading.BoundedSemaphore:
+        host = urlparse(url).netloc
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = threading.BoundedSemaphore(self.per_host_limit)
+                self._host_slots[host] = slot
+            return slot
+
+    def _run_job(self, url: str) -> Dict[str, Any]:
+        with self._host_slot(url):
+            return self.fetch(url)
+
+    def run(self, jobs: List[Tuple[str, Any]], deadline: float = DEFAULT_DEADLINE,
+            on_late: Optional[Callable[[Any, Dict[str, Any]], None]] = None) -> List[Tuple[Any, Dict[str, Any]]]:
+        """
+        Crawl a list of ``(url, payload)`` jobs.
+
+        Returns ``(payload, result)`` pairs for the jobs that finished before the
+        deadline, in input order. Jobs still running at the deadline are not
+        cancelled; ``on_late(payload, result)`` is called for each when it finishes.
+        """
+        # Each job runs in a copy of the caller's context so its spans nest under the caller's
+        futures = [(self._executor.submit(contextvars.copy_context().run, self._run_job, url), payload)
+                   for url, payload in jobs]
+        if not futures:
+            return []
+
+        wait([future for future, _ in futures], timeout=deadline)
+
+        finished = []
+        pending = 0
+        for future, payload in futures:
+            if future.done():
+                try:
+                    finished.append((payload, future.result()))
+                except Exception as e:
+                    print(f"❌ خطا در خزش صفحه: {str(e)}")
+                continue
+            pending += 1
+            if on_late is not None:
+                future.add_done_callback(lambda f, p=payload: self._deliver_late(f, p, on_late))
+
+        if pending:
+            print(f"⏳ {pending} صفحه پس از پایان مهلت در پس‌زمینه ادامه می‌یابد")
+
+        return finished
+
+    @staticmethod
+    def _deliver_late(future, payload, on_late):
+        try:
+            on_late(payload, future.result())
+        except Exception as e:
+            print(f"❌ خطا در پردازش نتیجه دیرهنگام: {str(e)}")
@@ -1,16 +1,12 @@
 
-import os
 from typing import List, Dict, Any
-from dotenv import load_dotenv
 from langchain.tools import tool
-from langchain.chat_models import init_chat_model
 from langchain_core.pydantic_v1 import BaseModel
+from tools.expansion_cache import ExpansionCache, prompt_version
+from tools.llm_registry import get_llm
+from tools.llm_metrics import metrics_scope
 
-load_dotenv()
-os.environ["OPENAI_API_KEY"] = os.getenv("AVALAI_API_KEY")
-os.environ["OPENAI_API_BASE"] = os.getenv("AVALAI_API_BASE")
-
-llm = init_chat_model("gpt-4o-mini", model_provider="openai")
+EXPANSION_MODEL = "gpt-4o-mini"
 
 class EcoSearchInput(BaseModel):
     query: str
@@ -20,13 +16,7 @@ class EcoSearchOutput(BaseModel):
     expanded_components: List[str]
     search_strategy: str
 
-@tool("eco_search_expand", return_direct=False, args_schema=EcoSearchInput)
-def eco_search_expand(query: str) -> EcoSearchOutput:
-    """
-    تبدیل یک جستجوی کلی به جستجوی هوشمند که شامل اجزاء و قطعات مرتبط می‌شود.
-    این ابزار به طور هوشمند اجزاء مرتبط با یک مفهوم را شناسایی می‌کند.
-    """
-    prompt = f"""
+EXPANSION_PROMPT = """
     کاربر جستجوی زیر را وارد کرده است: "{query}"
 
     وظیفه شما این است که:
@@ -55,8 +45,25 @@ def eco_search_expand(query: str) -> EcoSearchOutput:
 
     استراتژی جستجو: [توضیح کوتاه درباره نحوه گسترش جستجو]
     """
+
+# Cached expansions are invalidated whenever the model or prompt changes
+expansion_cache = ExpansionCache(version=prompt_version(EXPANSION_MODEL, EXPANSION_PROMPT))
+
+@tool("eco_search_expand", return_direct=False, args_schema=EcoSearchInput)
+def eco_search_expand(query: str) -> EcoSearchOutput:
+    """
+    تبدیل یک جستجوی کلی به جستجوی هوشمند که شامل اجزاء و قطعات مرتبط می‌شود.
+    این ابزار به طور هوشمند اجزاء مرتبط با یک مفهوم را شناسایی می‌کند.
+    """
+    expansion = expansion_cache.get_or_compute(query, lambda: expand_with_llm(query))
+    return EcoSearchOutput(original_query=query, **expansion)
+
+def expand_with_llm(query: str) -> Dict[str, Any]:
+    """Ask the model for related components (uncached)."""
+    prompt = EXPANSION_PROMPT.format(query=query)
     
-    response = llm.invoke(prompt)
+    with metrics_scope(caller="eco_search_expand"):
+        response = get_llm(EXPANSION_MODEL).invoke(prompt)
     content = response.content.strip()
     
     # Parse the response to extract components
@@ -84,11 +91,10 @@ def eco_search_expand(query: str) -> EcoSearchOutput:
             if component:
                 components.append(component)
     
-    return EcoSearchOutput(
-        original_query=query,
-        expanded_components=components[:10],  # Limit to 10 components
-        search_strategy=strategy or "جستجوی گسترده برای یافتن تمام اجزاء مرتبط"
-    )
+    return {
+        "expanded_components": components[:10],  # Limit to 10 components
+        "search_strategy": strategy or "جستجوی گسترده برای یافتن تمام اجزاء مرتبط"
+    }
 
 if __name__ == "__main__":
     # Test the tool
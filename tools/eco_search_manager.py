@@ -1,10 +1,30 @@
 
-import os
+import contextvars
+import heapq
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from typing import List, Dict, Any
-from dotenv import load_dotenv
 from langchain.tools import tool
 from tools.eco_search import eco_search_expand
 from tools.basalam_search import search_basalam
+from tools.product_manager import get_product_store
+from tools.result_set import ResultSet
+from tools.tracing import span
+
+ECO_SEARCH_DEADLINE = 12.0  # seconds shared by all component searches
+MAX_COMPONENTS = 5  # Limit component searches to avoid too many requests
+
+_search_pool = ThreadPoolExecutor(max_workers=MAX_COMPONENTS + 1, thread_name_prefix="eco-search")
+
+def _timed_search(query: str, max_price: int, min_rating: float, vendor_city: str):
+    start = time.perf_counter()
+    products = search_basalam.invoke({
+        "query": query,
+        "max_price": max_price,
+        "min_rating": min_rating,
+        "vendor_city": vendor_city
+    })
+    return products, time.perf_counter() - start
 
 @tool("perform_eco_search", return_direct=False)
 def perform_eco_search(query: str, max_price: int = 0, min_rating: float = 0.0, vendor_city: str = "") -> Dict[str, Any]:
@@ -14,47 +34,57 @@ def perform_eco_search(query: str, max_price: int = 0, min_rating: float = 0.0,
     """
     try:
         # Step 1: Expand the query to find related components
+        expansion_start = time.perf_counter()
         expansion_result = eco_search_expand.invoke({"query": query})
+        expansion_seconds = time.perf_counter() - expansion_start
         
-        all_products = []
-        search_results = {}
-        
-        # Step 2: Search for the original query
-        original_products = search_basalam.invoke({
-            "query": query,
-            "max_price": max_price,
-            "min_rating": min_rating,
-            "vendor_city": vendor_city
-        })
+        # Step 2: Search the original query and each component concurrently
+        searches = [("جستجوی اصلی", query)]
+        searches += [(component, component) for component in expansion_result.expanded_components[:MAX_COMPONENTS]]
+        futures = [
+            (label, _search_pool.submit(contextvars.copy_context().run, _timed_search, search_query, max_price, min_rating, vendor_city))
+            for label, search_query in searches
+        ]
+        wait([future for _, future in futures], timeout=ECO_SEARCH_DEADLINE)
         
-        if original_products:
-            all_products.extend(original_products)
-            search_results["جستجوی اصلی"] = len(original_products)
-        
-        # Step 3: Search for each expanded component
-        for component in expansion_result.expanded_components[:5]:  # Limit to 5 components to avoid too many requests
+        # Step 3: Deduplicate by product_id, original query first, then components in order
+        seen_ids = set()
+        result_lists = []
+        search_results = {}
+        component_timings = {}
+        for label, future in futures:
+            if not future.done():
+                component_timings[label] = {"status": "timeout", "seconds": ECO_SEARCH_DEADLINE}
+                continue
             try:
-                component_products = search_basalam.invoke({
-                    "query": component,
-                    "max_price": max_price,
-                    "min_rating": min_rating,
-                    "vendor_city": vendor_city
-                })
-                
-                if component_products:
-                    # Filter out duplicates based on product ID
-                    existing_ids = {p.get('id', '') for p in all_products}
-                    new_products = [p for p in component_products if p.get('id', '') not in existing_ids]
-                    
-                    all_products.extend(new_products)
-                    search_results[component] = len(new_products)
-                    
+                component_products, seconds = future.result()
             except Exception as e:
-                print(f"خطا در جستجوی {component}: {str(e)}")
+                print(f"خطا در جستجوی {label}: {str(e)}")
+                component_timings[label] = {"status": "error", "error": str(e)}
                 continue
+            
+            new_products = []
+            for p in component_products or []:
+                product_id = p.get('product_id')
+                if product_id in seen_ids:
+                    continue
+                seen_ids.add(product_id)
+                new_products.append(p)
+            
+            component_timings[label] = {"status": "ok", "seconds": round(seconds, 3), "count": len(new_products)}
+            if new_products:
+                result_lists.append(new_products)
+                search_results[label] = len(new_products)
         
-        # Step 4: Sort all products by price
-        all_products.sort(key=lambda x: x.get('price', 0))
+        # Step 4: Each list is already sorted by price, so a k-way merge keeps the order
+        all_products = list(heapq.merge(*result_lists, key=lambda x: x.get('price', 0)))
+
+        # Persist the results in one transaction so they can be revisited later
+        try:
+            with span("db.save_products", count=len(all_products)):
+                get_product_store().save_products(all_products, query)
+        except Exception as e:
+            print(f"❌ خطا در ذخیره نتایج جستجوی اکولوژیک: {str(e)}")
         
         # Step 5: Prepare result summary
         result = {
@@ -62,7 +92,10 @@ def perform_eco_search(query: str, max_price: int = 0, min_rating: float = 0.0,
             "expanded_components": expansion_result.expanded_components,
             "search_strategy": expansion_result.search_strategy,
             "search_results": search_results,
+            "component_timings": component_timings,
+            "expansion_seconds": round(expansion_seconds, 3),
             "total_products": len(all_products),
+            "summary": ResultSet.from_records(all_products).summary(),
             "products": all_products[:20],  # Limit to 20 products for display
             "eco_search_summary": f"جستجوی اکولوژیک برای '{query}' انجام شد. {len(expansion_result.expanded_components)} جزء شناسایی و {len(all_products)} محصول یافت شد."
         }
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from tools.search_cache import TTLCache
+from tools.text_utils import normalize_persian
+
+EXPANSION_CACHE_PATH = "database/eco_expansions.db"
+EXPANSION_CACHE_TTL = 7 * 24 * 3600  # seconds
+EXPANSION_MEMORY_ENTRIES = 256
+
+
+def prompt_version(*parts: str) -> str:
+    """Version tag for cached expansions; changes whenever the prompt or model changes."""
+    return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()[:12]
+
+
+class ExpansionCache:
+    """
+    Persistent cache of eco-search query expansions, keyed on the normalized concept.
+
+    Entries live in a small SQLite database beside the product DB and are only
+    valid for the ``version`` they were stored under and for ``ttl`` seconds.
+    An in-process LRU sits in front so hot concepts skip SQLite as well.
+    """
+
+    def __init__(self, version: str, db_path: str = EXPANSION_CACHE_PATH,
+                 ttl: float = EXPANSION_CACHE_TTL, memory_entries: int = EXPANSION_MEMORY_ENTRIES):
+        self.version = version
+        self.db_path = db_path
+        self.ttl = ttl
+        self._memory = TTLCache(ttl=ttl, max_entries=memory_entries)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS expansions (
+                    concept TEXT,
+                    version TEXT,
+                    payload TEXT,
+                    created_at REAL,
+                    PRIMARY KEY (concept, version)
+                )
+            ''')
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, concept: str) -> Optional[Dict[str, Any]]:
+        key = normalize_persian(concept)
+        cached = self._memory.get(key)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT payload, created_at FROM expansions WHERE concept=? AND version=?",
+                (key, self.version)
+            ).fetchone()
+        if row is None:
+            return None
+        age = time.time() - row[1]
+        if age > self.ttl:
+            return None
+
+        payload = json.loads(row[0])
+        if not payload.get("expanded_components"):
+            return None  # stored before empty expansions were skipped
+        # Keep the stored age so the memory copy expires with the SQLite row
+        self._memory.set(key, payload, age=age)
+        return payload
+
+    def set(self, concept: str, payload: Dict[str, Any]):
+        key = normalize_persian(concept)
+        self._memory.set(key, payload)
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO expansions (concept, version, payload, created_at) VALUES (?, ?, ?, ?)",
+                    (key, self.version, json.dumps(payload, ensure_ascii=False), time.time())
+                )
+                # Drop entries from older prompt versions or past their TTL
+                conn.execute(
+                    "DELETE FROM expansions WHERE version != ? OR created_at < ?",
+                    (self.version, time.time() - self.ttl)
+                )
+
+    def get_or_compute(self, concept: str, compute: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        try:
+            cached = self.get(concept)
+        except sqlite3.Error as e:
+            print(f"❌ خطا در خواندن کش گسترش جستجو: {str(e)}")
+            cached = None
+        if cached is not None:
+            return cached
+
+        payload = compute()
+        if not payload.get("expanded_components"):
+            return payload  # a failed or unparsable expansion is retried next time
+        try:
+            self.set(concept, payload)
+        except sqlite3.Error as e:
+            print(f"❌ خطا در ذخیره کش گسترش جستجو: {str(e)}")
+        return payload
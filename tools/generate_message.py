@@ -1,18 +1,7 @@
-import os
-from operator import itemgetter
-from dotenv import load_dotenv
-
-
 from langchain.tools import tool
-from langchain.chat_models import init_chat_model
-
-
-load_dotenv()
-os.environ["OPENAI_API_KEY"] = os.getenv("AVALAI_API_KEY")
-os.environ["OPENAI_API_BASE"] = os.getenv("AVALAI_API_BASE")
-
+from tools.llm_registry import get_llm
+from tools.llm_metrics import metrics_scope
 
-llm = init_chat_model("gpt-4o-mini", model_provider="openai")
 
 @tool("generate_seller_message", return_direct=False)
 def generate_seller_message(product_title: str, question: str) -> str:
@@ -32,7 +21,8 @@ def generate_seller_message(product_title: str, question: str) -> str:
 
     فقط پیام نهایی رو بده. چیزی دیگه ننویس.
     """
-    response = llm.invoke(prompt)
+    with metrics_scope(caller="generate_seller_message"):
+        response = get_llm().invoke(prompt)
     return response.content.strip()
 
 
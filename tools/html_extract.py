@@ -0,0 +1,357 @@
+import json
+import os
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+# lxml (with cssselect) and selectolax are optional, much faster parsers.
+# Whichever is installed is picked up; bs4's html.parser is always available.
+try:
+    import lxml.html
+    from lxml.cssselect import CSSSelector
+except ImportError:
+    CSSSelector = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as SelectolaxParser
+except ImportError:
+    try:
+        from selectolax.parser import HTMLParser as SelectolaxParser
+    except ImportError:
+        SelectolaxParser = None
+
+# Classes of elements the product extraction looks at. Only these (plus a few
+# tag names) are turned into a tree when parsing with bs4.
+_WANTED_TAGS = {"h1", "p", "span", "img"}
+_WANTED_CLASS = re.compile(r"spec|review|comment|rating|vendor|seller|product-gallery")
+
+_LD_JSON = re.compile(r'<script[^>]*type=["\']application/ld\+json["\'][^>]*>(.*?)</script>', re.S | re.I)
+_NEXT_DATA = re.compile(r'<script[^>]*id=["\']__NEXT_DATA__["\'][^>]*>(.*?)</script>', re.S | re.I)
+
+
+def _wanted_tag(name: str, attrs) -> bool:
+    if name in _WANTED_TAGS:
+        return True
+    classes = (attrs or {}).get("class") or ""
+    if not isinstance(classes, str):
+        classes = " ".join(classes)
+    return bool(_WANTED_CLASS.search(classes))
+
+
+try:
+    from bs4.filter import ElementFilter  # bs4 >= 4.13
+
+    class _TargetStrainer(ElementFilter):
+        def allow_tag_creation(self, nsprefix, name, attrs) -> bool:
+            return _wanted_tag(name, attrs)
+
+        def allow_string_creation(self, string) -> bool:
+            return False
+
+    def _strainer():
+        return _TargetStrainer()
+except ImportError:
+    def _strainer():
+        return SoupStrainer(_wanted_tag)
+
+
+class _SoupNode:
+    __slots__ = ("el",)
+
+    def __init__(self, el):
+        self.el = el
+
+    def select(self, selector: str) -> List["_SoupNode"]:
+        return [_SoupNode(el) for el in self.el.select(selector)]
+
+    def select_one(self, selector: str) -> Optional["_SoupNode"]:
+        el = self.el.select_one(selector)
+        return _SoupNode(el) if el is not None else None
+
+    def text(self) -> str:
+        return self.el.get_text(strip=True)
+
+    def attr(self, name: str) -> Optional[str]:
+        return self.el.get(name)
+
+
+class _LxmlNode:
+    __slots__ = ("el",)
+
+    def __init__(self, el):
+        self.el = el
+
+    def select(self, selector: str) -> List["_LxmlNode"]:
+        return [_LxmlNode(el) for el in _css(selector)(self.el)]
+
+    def select_one(self, selector: str) -> Optional["_LxmlNode"]:
+        found = _css(selector)(self.el)
+        return _LxmlNode(found[0]) if found else None
+
+    def text(self) -> str:
+        return "".join(part.strip() for part in self.el.itertext())
+
+    def attr(self, name: str) -> Optional[str]:
+        return self.el.get(name)
+
+
+class _SelectolaxNode:
+    __slots__ = ("el",)
+
+    def __init__(self, el):
+        self.el = el
+
+    def select(self, selector: str) -> List["_SelectolaxNode"]:
+        return [_SelectolaxNode(el) for el in self.el.css(selector)]
+
+    def select_one(self, selector: str) -> Optional["_SelectolaxNode"]:
+        el = self.el.css_first(selector)
+        return _SelectolaxNode(el) if el is not None else None
+
+    def text(self) -> str:
+        return self.el.text(deep=True, separator="", strip=True)
+
+    def attr(self, name: str) -> Optional[str]:
+        return self.el.attributes.get(name)
+
+
+@lru_cache(maxsize=64)
+def _css(selector: str):
+    return CSSSelector(selector)
+
+
+def _parse_bs4(html: str):
+    return _SoupNode(BeautifulSoup(html, "html.parser", parse_only=_strainer()))
+
+
+def _parse_bs4_full(html: str):
+    return _SoupNode(BeautifulSoup(html, "html.parser"))
+
+
+def _parse_lxml(html: str):
+    return _LxmlNode(lxml.html.document_fromstring(html))
+
+
+def _parse_selectolax(html: str):
+    return _SelectolaxNode(SelectolaxParser(html).root)
+
+
+# Parsers by name, fastest first; "bs4-full" is the previous full-tree parse
+BACKENDS: Dict[str, Callable[[str], Any]] = {}
+if SelectolaxParser is not None:
+    BACKENDS["selectolax"] = _parse_selectolax
+if CSSSelector is not None:
+    BACKENDS["lxml"] = _parse_lxml
+BACKENDS["bs4"] = _parse_bs4
+BACKENDS["bs4-full"] = _parse_bs4_full
+
+DEFAULT_BACKEND = os.getenv("BASALAM_HTML_BACKEND") or next(iter(BACKENDS))
+
+
+# Fields extract_dom_fields returns; embedded data must have all of them to skip the DOM
+EMBEDDED_FIELDS = ('name', 'price_text', 'description', 'specifications', 'additional_images',
+                   'reviews', 'rating', 'vendor_name')
+
+
+def extract_dom_fields(root, url: str) -> Dict[str, Any]:
+    """Product fields from the rendered page markup, via CSS selectors."""
+    name = root.select_one('h1.thh9OB')
+    name_text = name.text() if name else ''
+
+    price = root.select_one('span.PlpxQp')
+    price_text = price.text() if price else ''
+
+    description = root.select_one('p.fhJOs1.bs-read-more__text')
+    description_text = description.text() if description else ''
+
+    specifications = {}
+    for item in root.select('.specification-item') or root.select('.product-specs tr'):
+        key, value = item.select_one('.spec-key'), item.select_one('.spec-value')
+        if key and value:
+            specifications[key.text()] = value.text()
+            continue
+        cells = item.select('td')
+        if len(cells) == 2:
+            specifications[cells[0].text()] = cells[1].text()
+
+    additional_images = []
+    for img in root.select('img[src*="basalam"]') or root.select('.product-gallery img'):
+        src = img.attr('src') or img.attr('data-src')
+        if src and src not in additional_images and 'basalam' in src:
+            additional_images.append(src)
+
+    reviews = []
+    for review in (root.select('.review-item') or root.select('.comment-item'))[:5]:  # Limit to 5 reviews
+        review_text = review.text()
+        if review_text and len(review_text) > 10:
+            reviews.append(review_text)
+
+    rating_element = root.select_one('.rating-average') or root.select_one('[class*="rating"]')
+    rating = 0.0
+    if rating_element:
+        rating_match = re.search(r'(\d+\.?\d*)', rating_element.text())
+        if rating_match:
+            rating = float(rating_match.group(1))
+
+    vendor_element = root.select_one('.vendor-name') or root.select_one('[class*="seller"]')
+
+    return {
+        'name': name_text,
+        'price_text': price_text,
+        'description': description_text,
+        'specifications': specifications,
+        'additional_images': additional_images,
+        'reviews': reviews,
+        'rating': rating,
+        'vendor_name': vendor_element.text() if vendor_element else '',
+    }
+
+
+def _find_product_node(data: Any) -> Optional[Dict[str, Any]]:
+    """First dict that looks like a product: schema.org Product, or name + price."""
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            node_type = node.get("@type")
+            if node_type == "Product" or (isinstance(node_type, list) and "Product" in node_type):
+                return node
+            if "name" in node and ("price" in node or "offers" in node) and "description" in node:
+                return node
+            stack.extend(reversed(list(node.values())))
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+    return None
+
+
+def _first(value: Any) -> Any:
+    return value[0] if isinstance(value, list) and value else value
+
+
+def _name_of(value: Any) -> str:
+    value = _first(value)
+    if isinstance(value, dict):
+        return str(value.get("name") or "")
+    return str(value or "")
+
+
+def _to_toman(price: Any, currency: Any) -> Optional[int]:
+    """
+    Embedded price in Toman, like the page shows it. Basalam's structured and
+    API data are in Rial, so IRR (or no currency) is divided by 10; other
+    currencies are not used.
+    """
+    currency = str(currency or "IRR").upper()
+    try:
+        price = int(float(str(price).replace(",", "")))
+    except (TypeError, ValueError):
+        return None
+    if currency == "IRR":
+        return price // 10
+    if currency in ("IRT", "TOMAN"):
+        return price
+    return None
+
+
+def extract_embedded_fields(html: str) -> Dict[str, Any]:
+    """
+    Product fields from JSON-LD or Next.js ``__NEXT_DATA__`` blocks, if the
+    page carries them. Only fields that were actually present are returned.
+    """
+    blobs = _LD_JSON.findall(html) + _NEXT_DATA.findall(html)
+    for blob in blobs:
+        try:
+            node = _find_product_node(json.loads(blob))
+        except ValueError:
+            continue
+        if node is None:
+            continue
+
+        fields = {}
+        if node.get("name"):
+            fields["name"] = str(node["name"])
+        if node.get("description"):
+            fields["description"] = str(node["description"])
+
+        offers = _first(node.get("offers")) or {}
+        offers = offers if isinstance(offers, dict) else {}
+        price = node.get("price", offers.get("price"))
+        currency = node.get("priceCurrency") or offers.get("priceCurrency")
+        if isinstance(price, dict):
+            currency = price.get("currency") or currency
+            price = price.get("value") or price.get("amount")
+        toman = _to_toman(price, currency)
+        if toman:
+            fields["price_text"] = f"{toman:,} تومان"
+
+        images = node.get("image") or node.get("images") or node.get("photos") or []
+        images = images if isinstance(images, list) else [images]
+        images = [img.get("url") if isinstance(img, dict) else img for img in images]
+        if images:
+            fields["additional_images"] = [img for img in images if isinstance(img, str) and img]
+
+        rating = node.get("aggregateRating") or node.get("rating") or {}
+        rating = rating.get("ratingValue", rating.get("average")) if isinstance(rating, dict) else rating
+        try:
+            if rating is not None:
+                fields["rating"] = float(rating)
+        except (TypeError, ValueError):
+            pass
+
+        reviews = node.get("review") or node.get("reviews") or []
+        reviews = reviews if isinstance(reviews, list) else [reviews]
+        reviews = [r.get("reviewBody") or r.get("description") or "" if isinstance(r, dict) else str(r) for r in reviews]
+        if reviews:
+            fields["reviews"] = [r for r in reviews if len(r) > 10][:5]
+
+        properties = node.get("additionalProperty") or []
+        specifications = {p.get("name"): str(p.get("value")) for p in properties if isinstance(p, dict) and p.get("name")}
+        if specifications:
+            fields["specifications"] = specifications
+
+        vendor = offers.get("seller") or node.get("vendor") or node.get("brand")
+        if _name_of(vendor):
+            fields["vendor_name"] = _name_of(vendor)
+        return fields
+    return {}
+
+
+def extract_product(html: str, url: str, backend: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Extract product details from a product page.
+
+    Embedded structured data is used alone only when it covers every field,
+    which skips building a DOM entirely; otherwise the page is parsed with
+    ``backend`` (default: the fastest installed) and gaps are filled from any
+    embedded data.
+    """
+    embedded = extract_embedded_fields(html)
+    if all(embedded.get(key) for key in EMBEDDED_FIELDS):
+        fields = dict(embedded)
+    else:
+        fields = extract_dom_fields(BACKENDS[backend or DEFAULT_BACKEND](html), url)
+        for key, value in embedded.items():
+            if not fields.get(key):
+                fields[key] = value
+
+    price_numeric = 0
+    if fields['price_text']:
+        price_numbers = re.findall(r'[\d,]+', fields['price_text'].replace(',', ''))
+        if price_numbers:
+            price_numeric = int(price_numbers[0])
+
+    return {
+        'url': url,
+        'name': fields['name'],
+        'price': price_numeric,
+        'price_text': fields['price_text'],
+        'description': fields['description'],
+        'specifications': fields['specifications'],
+        'additional_images': fields['additional_images'],
+        'reviews': fields['reviews'],
+        'rating': fields['rating'],
+        'vendor_name': fields['vendor_name'],
+        'crawled_successfully': True
+    }
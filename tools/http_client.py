@@ -0,0 +1,247 @@
+import asyncio
+import importlib.util
+import os
+import threading
+import weakref
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from tools.resilience import CLOSED, HALF_OPEN, OPEN, HostGuard
+
+# httpx (with the h2 package) is optional: when installed, the asyncio entry point
+# uses it and negotiates HTTP/2. It is imported on the first async call, as it is
+# slow to import. Without it, async calls run the pooled sync session in a worker thread.
+HTTPX_AVAILABLE = importlib.util.find_spec("httpx") is not None
+HTTP2_AVAILABLE = HTTPX_AVAILABLE and importlib.util.find_spec("h2") is not None
+
+DEFAULT_TIMEOUT = 15  # seconds
+DEFAULT_HOST_LIMIT = 4
+HOST_LIMITS = {
+    "search.basalam.com": 8,
+    "basalam.com": 4,
+}
+# Requests per second and burst size per host; other hosts are not rate limited
+RATE_LIMITS = {
+    "search.basalam.com": (10.0, 20.0),
+    "basalam.com": (5.0, 10.0),
+}
+
+
+def _limits_from_env() -> Dict[str, int]:
+    """Parse BASALAM_HTTP_HOST_LIMITS, e.g. "search.basalam.com=8,basalam.com=4"."""
+    limits = {}
+    for item in os.getenv("BASALAM_HTTP_HOST_LIMITS", "").split(","):
+        host, _, value = item.partition("=")
+        if host.strip() and value.strip().isdigit():
+            limits[host.strip()] = int(value)
+    return limits
+
+
+def _rates_from_env() -> Dict[str, Tuple[float, float]]:
+    """Parse BASALAM_HTTP_RATE_LIMITS, e.g. "search.basalam.com=10:20,basalam.com=5" (rate[:burst])."""
+    rates = {}
+    for item in os.getenv("BASALAM_HTTP_RATE_LIMITS", "").split(","):
+        host, _, value = item.partition("=")
+        rate, _, burst = value.partition(":")
+        try:
+            rates[host.strip()] = (float(rate), float(burst or float(rate) * 2))
+        except ValueError:
+            continue
+    return rates
+
+
+def _as_requests_response(response) -> requests.Response:
+    """Copy an httpx response into a requests.Response, so both entry points return the same type."""
+    converted = requests.Response()
+    converted.status_code = response.status_code
+    converted.headers = CaseInsensitiveDict(response.headers)
+    converted._content = response.content
+    converted.encoding = response.encoding
+    converted.reason = response.reason_phrase
+    converted.url = str(response.url)
+    return converted
+
+
+async def _httpx_get(client, url: str, **kwargs) -> requests.Response:
+    import httpx
+
+    try:
+        response = await client.get(url, **kwargs)
+    except httpx.TimeoutException as e:
+        raise requests.Timeout(str(e)) from e
+    except httpx.HTTPError as e:
+        raise requests.ConnectionError(str(e)) from e
+    return _as_requests_response(response)
+
+
+def _seconds(timeout) -> float:
+    """A requests timeout (number or (connect, read) pair) as one number of seconds."""
+    if isinstance(timeout, (tuple, list)):
+        return float(sum(t for t in timeout if t))
+    return float(timeout or DEFAULT_TIMEOUT)
+
+
+class HttpClient:
+    """
+    Shared HTTP client for the tools package.
+
+    Keeps one keep-alive connection pool per host so repeat calls reuse warm
+    TCP/TLS connections. Every host gets a guard (tools/resilience.py): a
+    token-bucket rate limit, a concurrency limit that adapts to errors and slow
+    responses (AIMD, capped at the host limit) and a circuit breaker. While a
+    host's circuit is open, calls fail at once with CircuitOpenError instead of
+    waiting for timeouts. ``get`` is the sync entry point; ``aget`` is the
+    asyncio one.
+    """
+
+    def __init__(self, host_limits: Optional[Dict[str, int]] = None,
+                 default_limit: int = DEFAULT_HOST_LIMIT,
+                 timeout: float = DEFAULT_TIMEOUT,
+                 rate_limits: Optional[Dict[str, Tuple[float, float]]] = None):
+        self.host_limits = {**HOST_LIMITS, **_limits_from_env(), **(host_limits or {})}
+        self.rate_limits = {**RATE_LIMITS, **_rates_from_env(), **(rate_limits or {})}
+        self.default_limit = default_limit
+        self.timeout = timeout
+
+        self._lock = threading.Lock()
+        self._guards: Dict[str, HostGuard] = {}
+        self._session = self._build_session()
+        # httpx.AsyncClient is bound to one event loop: one client per loop
+        self._async_state = weakref.WeakKeyDictionary()
+
+    def _build_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=max(len(self.host_limits), 10),
+            pool_maxsize=max([self.default_limit, *self.host_limits.values()]),
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def limit_for(self, host: str) -> int:
+        return self.host_limits.get(host, self.default_limit)
+
+    def configure_host(self, host: str, limit: int, rate: Optional[Tuple[float, float]] = None):
+        """Set the concurrency limit (and optionally rate, burst) for a host; resets its guard."""
+        with self._lock:
+            self.host_limits[host] = limit
+            if rate is not None:
+                self.rate_limits[host] = rate
+            self._guards.pop(host, None)
+
+    def guard(self, host: str) -> HostGuard:
+        with self._lock:
+            guard = self._guards.get(host)
+            if guard is None:
+                guard = HostGuard(host, self.limit_for(host), self.rate_limits.get(host))
+                self._guards[host] = guard
+            return guard
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """GET through the pooled keep-alive session and the host's guard."""
+        kwargs.setdefault("timeout", self.timeout)
+        guard = self.guard(urlparse(url).netloc)
+        return guard.call(lambda: self._session.get(url, **kwargs), _seconds(kwargs["timeout"]))
+
+    def _loop_state(self):
+        loop = asyncio.get_running_loop()
+        client = self._async_state.get(loop)
+        if client is None and loop not in self._async_state:
+            if HTTPX_AVAILABLE:
+                import httpx
+
+                client = httpx.AsyncClient(http2=HTTP2_AVAILABLE, timeout=self.timeout, follow_redirects=True)
+            self._async_state[loop] = client
+        return client
+
+    async def aget(self, url: str, **kwargs) -> requests.Response:
+        """
+        Async GET. Uses a pooled httpx client (HTTP/2 when available), or falls
+        back to the sync session in a worker thread. Returns a requests.Response
+        and raises requests exceptions, like ``get``.
+        """
+        client = self._loop_state()
+        if client is None:
+            return await asyncio.to_thread(self.get, url, **kwargs)
+
+        guard = self.guard(urlparse(url).netloc)
+        return await guard.acall(lambda: _httpx_get(client, url, **kwargs), _seconds(kwargs.get("timeout", self.timeout)))
+
+    async def aclose(self):
+        """Close the async client bound to the running event loop."""
+        loop = asyncio.get_running_loop()
+        client = self._async_state.pop(loop, None)
+        if client is not None:
+            await client.aclose()
+
+    def close(self):
+        self._session.close()
+
+    def host_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Breaker state, adaptive limit and call counts per contacted host."""
+        with self._lock:
+            guards = list(self._guards.values())
+        return {guard.host: guard.stats() for guard in guards}
+
+    def prometheus_metrics(self) -> str:
+        """host_stats in the Prometheus text exposition format."""
+        stats = self.host_stats()
+        state_values = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{key}="{val}"' for key, val in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}")
+
+        metric("basalam_upstream_circuit_state", "gauge", "Circuit breaker state (0=closed, 1=half-open, 2=open).",
+               [({"host": h}, state_values[s["state"]]) for h, s in stats.items()])
+        metric("basalam_upstream_circuit_opened_total", "counter", "Times the circuit opened.",
+               [({"host": h}, s["times_opened"]) for h, s in stats.items()])
+        metric("basalam_upstream_concurrency_limit", "gauge", "Current adaptive concurrency limit.",
+               [({"host": h}, s["concurrency_limit"]) for h, s in stats.items()])
+        metric("basalam_upstream_in_flight", "gauge", "Requests in flight.",
+               [({"host": h}, s["in_flight"]) for h, s in stats.items()])
+        metric("basalam_upstream_requests_total", "counter", "Requests by outcome; rejected = failed fast on an open circuit.",
+               [({"host": h, "outcome": outcome}, s[key]) for h, s in stats.items()
+                for outcome, key in (("success", "success"), ("failure", "failure"), ("busy", "busy"), ("rejected", "rejected"))])
+        metric("basalam_upstream_rate_limit_wait_seconds_total", "counter", "Time spent waiting for rate-limit tokens.",
+               [({"host": h}, s["rate_wait_seconds"]) for h, s in stats.items()])
+        return "\n".join(lines) + "\n"
+
+
+# Shared client for every outbound call in the tools package
+http_client = HttpClient()
+
+_metrics_server: Optional[ThreadingHTTPServer] = None
+
+
+def serve_metrics(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serve http_client.prometheus_metrics() at /metrics from a background thread (once per process)."""
+    global _metrics_server
+    if _metrics_server is None:
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = http_client.prometheus_metrics().encode("utf-8")
+                self.send_response(200 if self.path.startswith("/metrics") else 404)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        _metrics_server = ThreadingHTTPServer((host, port), MetricsHandler)
+        _metrics_server.daemon_threads = True
+        threading.Thread(target=_metrics_server.serve_forever, daemon=True).start()
+        print(f"📈 متریک‌های HTTP روی پورت {port} در دسترس است")
+    return _metrics_server
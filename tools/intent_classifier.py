@@ -0,0 +1,143 @@
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from tools.text_utils import normalize_persian
+
+TRAIN_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "intent", "train.jsonl")
+
+# Predictions below this confidence fall back to the LLM detect_intent tool
+INTENT_CONFIDENCE_THRESHOLD = 0.85
+RULE_CONFIDENCE = 0.97
+
+_SELLER = r"(فروشنده|غرفه ?دار|صاحب غرفه)"
+# A request addressed to the seller: the preposition ties the verb to the seller
+# ("از فروشنده بپرس", "به فروشنده پیام بده"). Searches that merely mention sellers
+# ("فروشنده های تهران رو بگو") must not match.
+_SELLER_REQUEST = (
+    r"(از " + _SELLER + r"( [^ ]+){0,3} (بپرس|بپرسم|سوال کن|سوال بپرس|سوال کنم)"
+    r"|(به|برای) " + _SELLER + r"( [^ ]+){0,2} (بگو|بگم|پیام بده|پیام بدم|پیام بدهم|پیام بفرست|پیام بنویس|بنویس|بفرست)"
+    r"|با " + _SELLER + r"( [^ ]+){0,2} (تماس بگیر|تماس بگیرم|صحبت کن|صحبت کنم|حرف بزن|حرف بزنم|در ارتباط باش)"
+    r"|(بپرس|پیام بده|پیام بفرست|پیام بنویس) (از|به|برای) " + _SELLER + r")"
+)
+
+# Intents the n-gram model may decide on its own; its other predictions always go to the LLM
+MODEL_FAST_PATH_INTENTS = ("search_product", "other")
+
+# Keyword/regex rules over normalized text, checked in order
+RULES: List[Tuple[str, re.Pattern]] = [
+    ("contact_seller", re.compile(_SELLER_REQUEST)),
+    ("search_product", re.compile(r"(زیر|کمتر از|بالای|حداکثر) ?\d[\d,.]* ?(هزار|میلیون|تومان)")),
+    ("search_product", re.compile(r"امتیاز (بالای|بیشتر از)")),
+    ("search_product", re.compile(r"(جستجو|پیدا کن|بخرم|خرید|می ?خوام|می ?خواهم|دنبال|معرفی کن|ارزان|ارزون|قیمت)")),
+    ("search_product", re.compile(r"(جزئیات محصول|مقایسه|محصولات (ذخیره|قبلی|اخیر))")),
+    ("other", re.compile(r"^(سلام|ممنون|مرسی|خداحافظ|بای|باشه|اوکی|ok|thanks|hello)( .{0,12})?$")),
+]
+
+
+class IntentPrediction(NamedTuple):
+    intent: str
+    confidence: float
+    source: str  # "rule", "model" or "llm"
+
+
+class NgramIntentModel:
+    """
+    Multinomial naive Bayes over character n-grams of normalized text.
+    ``temperature`` softens the posteriors, which naive Bayes otherwise
+    pushes towards 0/1, so the confidence threshold stays meaningful.
+    """
+
+    def __init__(self, ngram_range: Tuple[int, int] = (2, 4), alpha: float = 0.5, temperature: float = 3.0):
+        self.ngram_range = ngram_range
+        self.alpha = alpha
+        self.temperature = temperature
+        self.log_priors: Dict[str, float] = {}
+        self.log_likelihoods: Dict[str, Dict[str, float]] = {}
+        self.log_unseen: Dict[str, float] = {}
+
+    def ngrams(self, text: str) -> Iterable[str]:
+        text = f" {normalize_persian(text)} "
+        low, high = self.ngram_range
+        for n in range(low, high + 1):
+            for i in range(len(text) - n + 1):
+                yield text[i:i + n]
+
+    def fit(self, texts: List[str], labels: List[str]) -> "NgramIntentModel":
+        counts: Dict[str, Counter] = defaultdict(Counter)
+        for text, label in zip(texts, labels):
+            counts[label].update(self.ngrams(text))
+
+        vocabulary = set()
+        for counter in counts.values():
+            vocabulary.update(counter)
+
+        label_counts = Counter(labels)
+        for label, counter in counts.items():
+            total = sum(counter.values()) + self.alpha * len(vocabulary)
+            self.log_priors[label] = math.log(label_counts[label] / len(labels))
+            self.log_likelihoods[label] = {gram: math.log((c + self.alpha) / total) for gram, c in counter.items()}
+            self.log_unseen[label] = math.log(self.alpha / total)
+        return self
+
+    def predict_proba(self, text: str) -> Dict[str, float]:
+        grams = Counter(self.ngrams(text))
+        scores = {}
+        for label, prior in self.log_priors.items():
+            likelihoods = self.log_likelihoods[label]
+            unseen = self.log_unseen[label]
+            scores[label] = (prior + sum(likelihoods.get(g, unseen) * c for g, c in grams.items())) / self.temperature
+
+        top = max(scores.values())
+        exp_scores = {label: math.exp(score - top) for label, score in scores.items()}
+        total = sum(exp_scores.values())
+        return {label: value / total for label, value in exp_scores.items()}
+
+
+def load_examples(path: str) -> Tuple[List[str], List[str]]:
+    texts, labels = [], []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                texts.append(row["text"])
+                labels.append(row["intent"])
+    return texts, labels
+
+
+_model: Optional[NgramIntentModel] = None
+_model_lock = threading.Lock()
+
+
+def get_intent_model() -> NgramIntentModel:
+    """Train the n-gram model on the labelled examples on first use."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                _model = NgramIntentModel().fit(*load_examples(TRAIN_PATH))
+    return _model
+
+
+def classify_intent(text: str) -> IntentPrediction:
+    """
+    Local intent classification: regex rules first, then the n-gram model.
+    Callers should fall back to the LLM when ``confidence`` is below
+    ``INTENT_CONFIDENCE_THRESHOLD``; model predictions outside
+    MODEL_FAST_PATH_INTENTS are returned with confidence 0.
+    """
+    normalized = normalize_persian(text)
+    for intent, pattern in RULES:
+        if pattern.search(normalized):
+            return IntentPrediction(intent, RULE_CONFIDENCE, "rule")
+
+    probabilities = get_intent_model().predict_proba(text)
+    intent = max(probabilities, key=probabilities.get)
+    if intent not in MODEL_FAST_PATH_INTENTS:
+        # Acting on a wrong contact_seller skips the agent, so the model never decides it alone
+        return IntentPrediction(intent, 0.0, "model")
+    return IntentPrediction(intent, probabilities[intent], "model")
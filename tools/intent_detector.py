@@ -1,18 +1,9 @@
-import os
-from dotenv import load_dotenv
-
 from langchain.tools import tool
 from langchain_core.pydantic_v1 import BaseModel
 from typing import Literal
-from langchain.chat_models import init_chat_model
-
-
-load_dotenv()
-os.environ["OPENAI_API_KEY"] = os.getenv("AVALAI_API_KEY")
-os.environ["OPENAI_API_BASE"] = os.getenv("AVALAI_API_BASE")
-
+from tools.llm_registry import get_llm
+from tools.llm_metrics import metrics_scope
 
-llm = init_chat_model("gpt-4o-mini", model_provider="openai")
 
 class IntentInput(BaseModel):
     input: str
@@ -39,7 +30,8 @@ def detect_intent(input: str) -> IntentOutput:
     
     فقط مقدار یکی از اون‌ها رو به صورت `intent: <value>` چاپ کن.
     """
-    result = llm.invoke(prompt)
+    with metrics_scope(caller="detect_intent"):
+        result = get_llm().invoke(prompt)
 
     content = result.content.strip().lower()
     if "search_product" in content:
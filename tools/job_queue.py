@@ -0,0 +1,204 @@
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+JOBS_DB_PATH = "database/jobs.db"
+JOB_RETENTION = 7 * 24 * 3600  # seconds a finished or failed job row is kept
+PRUNE_INTERVAL = 3600  # seconds between prunes of old rows
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobQueue:
+    """
+    Persistent SQLite-backed job queue with worker threads.
+
+    Jobs are identified by ``job_key``; enqueueing a key that is already pending
+    or running is a no-op, so the same product is never enriched twice at once.
+    Failed jobs are retried with exponential backoff up to ``max_attempts``.
+    A key that finished or failed is not scheduled again until ``requeue_after``
+    seconds later, and its row is deleted once it is older than ``retention``.
+    Jobs left running by a crashed process are picked up again on start.
+    """
+
+    def __init__(self, name: str, handler: Callable[[Dict[str, Any]], Any],
+                 db_path: str = JOBS_DB_PATH, workers: int = 3,
+                 max_attempts: int = 4, base_backoff: float = 2.0, poll_interval: float = 1.0,
+                 requeue_after: float = 0.0, retention: float = JOB_RETENTION):
+        self.name = name
+        self.handler = handler
+        self.db_path = db_path
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.poll_interval = poll_interval
+        self.requeue_after = requeue_after
+        # Rows must outlive the requeue hold, or a pruned key would be scheduled again early
+        self.retention = max(retention, requeue_after)
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._conn: Optional[sqlite3.Connection] = None
+        self._last_prune = 0.0
+
+    def _connection(self) -> sqlite3.Connection:
+        """Shared connection; callers must hold ``self._lock``."""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    queue TEXT,
+                    job_key TEXT,
+                    payload TEXT,
+                    status TEXT,
+                    attempts INTEGER DEFAULT 0,
+                    next_run_at REAL,
+                    last_error TEXT,
+                    result TEXT,
+                    created_at REAL,
+                    updated_at REAL,
+                    PRIMARY KEY (queue, job_key)
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs(queue, status, next_run_at)')
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def start(self):
+        """Start the worker threads (idempotent) and requeue jobs interrupted by a crash."""
+        with self._lock:
+            if self._threads:
+                return
+            conn = self._connection()
+            with conn:
+                conn.execute("UPDATE jobs SET status=? WHERE queue=? AND status=?", (PENDING, self.name, RUNNING))
+            self._prune(conn)
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"{self.name}-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        self._stop.clear()
+
+    def enqueue(self, job_key: str, payload: Dict[str, Any]) -> bool:
+        """
+        Add a job. Returns False when the same key is already pending or running,
+        or finished or failed less than ``requeue_after`` seconds ago; older
+        finished or failed jobs with the same key are scheduled again.
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                cursor = conn.execute('''
+                    INSERT INTO jobs (queue, job_key, payload, status, attempts, next_run_at, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, 0, ?, ?, ?)
+                    ON CONFLICT(queue, job_key) DO UPDATE SET
+                        payload=excluded.payload, status=excluded.status, attempts=0,
+                        next_run_at=excluded.next_run_at, last_error=NULL, updated_at=excluded.updated_at
+                    WHERE jobs.status IN (?, ?) AND jobs.updated_at <= ?
+                ''', (self.name, job_key, json.dumps(payload, ensure_ascii=False, default=str), PENDING,
+                      now, now, now, DONE, FAILED, now - self.requeue_after))
+                added = cursor.rowcount > 0
+        if added:
+            self.start()
+            self._wakeup.set()
+        return added
+
+    def _prune(self, conn: sqlite3.Connection):
+        """Delete finished and failed rows past ``retention``; callers must hold ``self._lock``."""
+        now = time.time()
+        if now - self._last_prune < PRUNE_INTERVAL:
+            return
+        self._last_prune = now
+        with conn:
+            pruned = conn.execute("DELETE FROM jobs WHERE queue=? AND status IN (?, ?) AND updated_at < ?",
+                                  (self.name, DONE, FAILED, now - self.retention)).rowcount
+        if pruned:
+            print(f"🧹 {pruned} کار قدیمی از صف {self.name} حذف شد")
+
+    def _claim(self) -> Optional[tuple]:
+        with self._lock:
+            conn = self._connection()
+            self._prune(conn)
+            with conn:
+                row = conn.execute('''
+                    SELECT job_key, payload, attempts FROM jobs
+                    WHERE queue=? AND status=? AND next_run_at <= ?
+                    ORDER BY next_run_at LIMIT 1
+                ''', (self.name, PENDING, time.time())).fetchone()
+                if row is None:
+                    return None
+                conn.execute("UPDATE jobs SET status=?, updated_at=? WHERE queue=? AND job_key=?",
+                             (RUNNING, time.time(), self.name, row[0]))
+            return row
+
+    def _finish(self, job_key: str, **fields):
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{column}=?" for column in fields)
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute(f"UPDATE jobs SET {assignments} WHERE queue=? AND job_key=?",
+                             (*fields.values(), self.name, job_key))
+
+    def _work(self):
+        while not self._stop.is_set():
+            job = self._claim()
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+
+            job_key, payload, attempts = job
+            attempts += 1
+            try:
+                result = self.handler(json.loads(payload))
+                self._finish(job_key, status=DONE, attempts=attempts, last_error=None,
+                             result=json.dumps(result, ensure_ascii=False, default=str))
+            except Exception as e:
+                if attempts >= self.max_attempts:
+                    print(f"❌ کار {job_key} پس از {attempts} تلاش ناموفق ماند: {str(e)}")
+                    self._finish(job_key, status=FAILED, attempts=attempts, last_error=str(e))
+                else:
+                    delay = self.base_backoff * (2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+                    self._finish(job_key, status=PENDING, attempts=attempts, last_error=str(e),
+                                 next_run_at=time.time() + delay)
+
+    def status(self, job_keys: Iterable[str]) -> Dict[str, str]:
+        """Current status per job key; unknown keys are left out."""
+        job_keys = list(job_keys)
+        if not job_keys:
+            return {}
+        placeholders = ", ".join("?" for _ in job_keys)
+        with self._lock:
+            rows = self._connection().execute(
+                f"SELECT job_key, status FROM jobs WHERE queue=? AND job_key IN ({placeholders})",
+                (self.name, *job_keys)
+            ).fetchall()
+        return dict(rows)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT status, COUNT(*) FROM jobs WHERE queue=? GROUP BY status", (self.name,)
+            ).fetchall()
+        return dict(rows)
@@ -0,0 +1,265 @@
+import argparse
+import contextvars
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+METRICS_DB_PATH = "database/metrics.db"
+
+_caller = contextvars.ContextVar("llm_caller", default="unknown")
+_turn_id = contextvars.ContextVar("llm_turn_id", default=None)
+
+
+@contextmanager
+def metrics_scope(caller: Optional[str] = None, turn_id: Optional[str] = None):
+    """Label model calls made inside the block with a caller and/or a turn."""
+    tokens = []
+    if caller is not None:
+        tokens.append((_caller, _caller.set(caller)))
+    if turn_id is not None:
+        tokens.append((_turn_id, _turn_id.set(turn_id)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+def new_turn_id() -> str:
+    return uuid.uuid4().hex
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile; 0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))]
+
+
+class MetricsSink:
+    """Append-only SQLite table of model calls."""
+
+    def __init__(self, db_path: str = METRICS_DB_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS llm_calls (
+                    ts REAL,
+                    turn_id TEXT,
+                    caller TEXT,
+                    model TEXT,
+                    latency_ms REAL,
+                    prompt_tokens INTEGER,
+                    completion_tokens INTEGER,
+                    total_tokens INTEGER,
+                    error TEXT
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_llm_calls_ts ON llm_calls(ts)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_llm_calls_turn ON llm_calls(turn_id)')
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def record(self, caller: str, model: str, latency_ms: float, prompt_tokens: int = 0,
+               completion_tokens: int = 0, turn_id: Optional[str] = None, error: Optional[str] = None):
+        try:
+            with self._lock:
+                conn = self._connection()
+                with conn:
+                    conn.execute(
+                        "INSERT INTO llm_calls VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (time.time(), turn_id, caller, model, latency_ms, prompt_tokens,
+                         completion_tokens, prompt_tokens + completion_tokens, error)
+                    )
+        except sqlite3.Error as e:
+            print(f"❌ خطا در ثبت متریک مدل: {str(e)}")
+
+    def turn_summary(self, turn_id: str) -> Dict[str, Any]:
+        """Totals for one chat turn."""
+        with self._lock:
+            calls, latency, prompt, completion = self._connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(latency_ms), 0), COALESCE(SUM(prompt_tokens), 0), "
+                "COALESCE(SUM(completion_tokens), 0) FROM llm_calls WHERE turn_id=?", (turn_id,)
+            ).fetchone()
+        return {"calls": calls, "latency_ms": latency, "prompt_tokens": prompt, "completion_tokens": completion}
+
+    def rows(self, since: float = 0.0) -> List[tuple]:
+        with self._lock:
+            return self._connection().execute(
+                "SELECT turn_id, caller, model, latency_ms, prompt_tokens, completion_tokens, error "
+                "FROM llm_calls WHERE ts >= ?", (since,)
+            ).fetchall()
+
+    def report(self, since: float = 0.0) -> Dict[str, Any]:
+        """Latency percentiles and token spend per caller, plus per-turn totals."""
+        callers: Dict[str, Dict[str, Any]] = {}
+        turns: Dict[str, List[float]] = {}
+        for turn_id, caller, model, latency, prompt, completion, error in self.rows(since):
+            stats = callers.setdefault(caller, {"latencies": [], "prompt_tokens": 0, "completion_tokens": 0,
+                                                "errors": 0, "models": set()})
+            stats["latencies"].append(latency)
+            stats["prompt_tokens"] += prompt or 0
+            stats["completion_tokens"] += completion or 0
+            stats["errors"] += 1 if error else 0
+            stats["models"].add(model)
+            if turn_id:
+                turn = turns.setdefault(turn_id, [0, 0.0, 0])
+                turn[0] += 1
+                turn[1] += latency
+                turn[2] += (prompt or 0) + (completion or 0)
+
+        return {
+            "callers": {
+                caller: {
+                    "calls": len(stats["latencies"]),
+                    "p50_ms": percentile(stats["latencies"], 50),
+                    "p95_ms": percentile(stats["latencies"], 95),
+                    "prompt_tokens": stats["prompt_tokens"],
+                    "completion_tokens": stats["completion_tokens"],
+                    "errors": stats["errors"],
+                    "models": sorted(m for m in stats["models"] if m),
+                }
+                for caller, stats in callers.items()
+            },
+            "turns": {
+                "count": len(turns),
+                "calls_p50": percentile([t[0] for t in turns.values()], 50),
+                "latency_p50_ms": percentile([t[1] for t in turns.values()], 50),
+                "latency_p95_ms": percentile([t[1] for t in turns.values()], 95),
+                "tokens_p50": percentile([t[2] for t in turns.values()], 50),
+                "tokens_p95": percentile([t[2] for t in turns.values()], 95),
+            },
+        }
+
+
+# Shared sink for every model client
+llm_metrics = MetricsSink()
+
+
+@functools.lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    """Token count of ``text`` with tiktoken's cl100k_base, or about 3 characters per token without it."""
+    if not text:
+        return 0
+    encoding = _encoding()
+    if encoding is None:
+        return len(text) // 3 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def _message_text(message) -> str:
+    """Content plus tool calls of a message, as the model sees or writes them."""
+    parts = [message.content if isinstance(message.content, str) else json.dumps(message.content, ensure_ascii=False)]
+    tool_calls = getattr(message, "tool_calls", None) or (getattr(message, "additional_kwargs", None) or {}).get("tool_calls")
+    if tool_calls:
+        parts.append(json.dumps(tool_calls, ensure_ascii=False, default=str))
+    return "\n".join(parts)
+
+
+def _estimated_usage(prompt_text: str, response) -> Dict[str, int]:
+    completion = []
+    for generations in response.generations:
+        for generation in generations:
+            message = getattr(generation, "message", None)
+            completion.append(_message_text(message) if message is not None else generation.text)
+    return {"prompt": estimate_tokens(prompt_text), "completion": estimate_tokens("\n".join(completion))}
+
+
+def _usage(response) -> Dict[str, int]:
+    """Token usage from an LLMResult: llm_output for plain calls, usage_metadata for streamed ones."""
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    if usage:
+        return {"prompt": usage.get("prompt_tokens", 0) or 0, "completion": usage.get("completion_tokens", 0) or 0}
+    for generations in response.generations:
+        for generation in generations:
+            metadata = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if metadata:
+                return {"prompt": metadata.get("input_tokens", 0), "completion": metadata.get("output_tokens", 0)}
+    return {"prompt": 0, "completion": 0}
+
+
+def metrics_callback(sink: MetricsSink = llm_metrics):
+    """LangChain callback handler that records every model call into ``sink``."""
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class MetricsCallbackHandler(BaseCallbackHandler):
+        def __init__(self):
+            self.runs: Dict[Any, tuple] = {}
+
+        def _start(self, serialized, run_id, metadata, prompt_text):
+            model = (metadata or {}).get("ls_model_name") or \
+                (serialized or {}).get("kwargs", {}).get("model_name") or ""
+            self.runs[run_id] = (time.perf_counter(), model, _caller.get(), _turn_id.get(), prompt_text)
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+            prompt_text = "\n".join(_message_text(m) for batch in messages for m in batch)
+            self._start(serialized, run_id, metadata, prompt_text)
+
+        def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs):
+            self._start(serialized, run_id, metadata, "\n".join(prompts))
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            started = self.runs.pop(run_id, None)
+            if started is None:
+                return
+            start, model, caller, turn_id, prompt_text = started
+            usage = _usage(response)
+            if not usage["prompt"] and not usage["completion"]:
+                # Streamed calls (the agent's) carry no usage with the pinned client; count the text instead
+                usage = _estimated_usage(prompt_text, response)
+            model = (response.llm_output or {}).get("model_name") or model
+            sink.record(caller, model, (time.perf_counter() - start) * 1000,
+                        usage["prompt"], usage["completion"], turn_id)
+
+        def on_llm_error(self, error, *, run_id, **kwargs):
+            started = self.runs.pop(run_id, None)
+            if started is None:
+                return
+            start, model, caller, turn_id, _ = started
+            sink.record(caller, model, (time.perf_counter() - start) * 1000, turn_id=turn_id, error=str(error))
+
+    return MetricsCallbackHandler()
+
+
+# Report: python -m tools.llm_metrics --hours 24
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Model call latency and token spend per tool.")
+    parser.add_argument("--hours", type=float, default=24.0, help="look back this many hours (0 = all)")
+    parser.add_argument("--db", default=METRICS_DB_PATH)
+    args = parser.parse_args()
+
+    since = time.time() - args.hours * 3600 if args.hours else 0.0
+    report = MetricsSink(args.db).report(since)
+
+    print(f"{'caller':<26}{'calls':>7}{'p50 ms':>10}{'p95 ms':>10}{'prompt tok':>12}{'compl tok':>11}{'errors':>8}  models")
+    for caller, stats in sorted(report["callers"].items(), key=lambda item: -item[1]["calls"]):
+        print(f"{caller:<26}{stats['calls']:>7}{stats['p50_ms']:>10.0f}{stats['p95_ms']:>10.0f}"
+              f"{stats['prompt_tokens']:>12}{stats['completion_tokens']:>11}{stats['errors']:>8}  {', '.join(stats['models'])}")
+
+    turns = report["turns"]
+    print(f"\n{turns['count']} turns: calls/turn p50={turns['calls_p50']:.0f}  "
+          f"latency p50={turns['latency_p50_ms']:.0f}ms p95={turns['latency_p95_ms']:.0f}ms  "
+          f"tokens p50={turns['tokens_p50']:.0f} p95={turns['tokens_p95']:.0f}")
@@ -0,0 +1,48 @@
+import os
+import threading
+from typing import Any, Dict, Tuple
+
+from dotenv import load_dotenv
+
+DEFAULT_MODEL = "gpt-4o-mini"
+DEFAULT_PROVIDER = "openai"
+
+_models: Dict[Tuple, Any] = {}
+_lock = threading.Lock()
+
+
+def _configure_environment():
+    load_dotenv()
+    if os.getenv("AVALAI_API_KEY"):
+        os.environ["OPENAI_API_KEY"] = os.getenv("AVALAI_API_KEY")
+    if os.getenv("AVALAI_API_BASE"):
+        os.environ["OPENAI_API_BASE"] = os.getenv("AVALAI_API_BASE")
+
+
+def get_llm(model: str = DEFAULT_MODEL, provider: str = DEFAULT_PROVIDER, **kwargs):
+    """
+    Shared chat model client, built on first use.
+
+    Every caller asking for the same model and settings gets the same client,
+    so its HTTP connection pool is shared and nothing is constructed at import.
+    Calls are recorded by the metrics handler (see tools/llm_metrics.py).
+    """
+    key = (model, provider, tuple(sorted(kwargs.items())))
+    llm = _models.get(key)
+    if llm is None:
+        with _lock:
+            llm = _models.get(key)
+            if llm is None:
+                from langchain.chat_models import init_chat_model
+                from tools.llm_metrics import metrics_callback
+
+                _configure_environment()
+                llm = init_chat_model(model, model_provider=provider, callbacks=[metrics_callback()], **kwargs)
+                _models[key] = llm
+    return llm
+
+
+def register_llm(llm, model: str = DEFAULT_MODEL, provider: str = DEFAULT_PROVIDER, **kwargs):
+    """Serve ``llm`` for this model and settings instead of building a client (e.g. a scripted model in benchmarks)."""
+    with _lock:
+        _models[(model, provider, tuple(sorted(kwargs.items())))] = llm
@@ -0,0 +1,140 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, NamedTuple, Optional
+
+PAGE_CACHE_PATH = "database/page_cache.db"
+PAGE_CACHE_TTL = float(os.getenv("BASALAM_PAGE_TTL", 6 * 3600))  # seconds
+
+
+class CachedPage(NamedTuple):
+    url: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    body: bytes
+    parsed: Optional[Dict[str, Any]]
+    fetched_at: float
+    ttl: float
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() - self.fetched_at < self.ttl
+
+    def validators(self) -> Dict[str, str]:
+        """Conditional request headers for revalidating this page."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class PageCache:
+    """
+    On-disk HTTP cache for crawled product pages.
+
+    Stores the zlib-compressed body, the parsed result and the ETag /
+    Last-Modified validators per URL. A page is served without touching the
+    network while it is younger than its TTL; after that the caller revalidates
+    with a conditional GET and, on 304, reuses the parsed result as is.
+    The TTL is kept per URL so individual products can be refreshed more or
+    less often than ``default_ttl``.
+    """
+
+    def __init__(self, db_path: str = PAGE_CACHE_PATH, default_ttl: float = PAGE_CACHE_TTL):
+        self.db_path = db_path
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS pages (
+                    url TEXT PRIMARY KEY,
+                    etag TEXT,
+                    last_modified TEXT,
+                    body BLOB,
+                    parsed TEXT,
+                    fetched_at REAL,
+                    ttl REAL
+                )
+            ''')
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, url: str) -> Optional[CachedPage]:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT etag, last_modified, body, parsed, fetched_at, ttl FROM pages WHERE url=?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        etag, last_modified, body, parsed, fetched_at, ttl = row
+        return CachedPage(
+            url=url,
+            etag=etag,
+            last_modified=last_modified,
+            body=zlib.decompress(body) if body else b"",
+            parsed=json.loads(parsed) if parsed else None,
+            fetched_at=fetched_at,
+            ttl=self.default_ttl if ttl is None else ttl,
+        )
+
+    def store(self, url: str, body: bytes, parsed: Dict[str, Any],
+              etag: Optional[str] = None, last_modified: Optional[str] = None, ttl: Optional[float] = None):
+        """Save a freshly downloaded page. ``ttl=None`` keeps the URL's existing TTL."""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute('''
+                    INSERT INTO pages (url, etag, last_modified, body, parsed, fetched_at, ttl)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(url) DO UPDATE SET
+                        etag=excluded.etag, last_modified=excluded.last_modified, body=excluded.body,
+                        parsed=excluded.parsed, fetched_at=excluded.fetched_at,
+                        ttl=COALESCE(excluded.ttl, pages.ttl)
+                ''', (url, etag, last_modified, zlib.compress(body, 6),
+                      json.dumps(parsed, ensure_ascii=False), time.time(), ttl))
+
+    def revalidated(self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        """Mark a page fresh again after a 304, keeping the stored body and parse."""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute('''
+                    UPDATE pages SET fetched_at=?, etag=COALESCE(?, etag), last_modified=COALESCE(?, last_modified)
+                    WHERE url=?
+                ''', (time.time(), etag, last_modified, url))
+
+    def set_ttl(self, url: str, ttl: Optional[float]):
+        """Override the freshness window for one product page (None restores the default)."""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("UPDATE pages SET ttl=? WHERE url=?", (ttl, url))
+
+    def invalidate(self, url: str):
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM pages WHERE url=?", (url,))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pages, stored_bytes = self._connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(body)), 0) FROM pages"
+            ).fetchone()
+        return {"pages": pages, "bytes": stored_bytes}
+
+
+# Shared cache for product page crawls
+page_cache = PageCache()
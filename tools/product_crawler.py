@@ -1,9 +1,101 @@
 
 import requests
-from bs4 import BeautifulSoup
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+from urllib.parse import urlsplit, urlunsplit
 from langchain_core.tools import tool
-import re
+from tools.crawl_pipeline import CrawlPipeline
+from tools.html_extract import extract_product
+from tools.http_client import http_client
+from tools.page_cache import page_cache
+from tools.single_flight import crawl_flights
+from tools.tracing import span
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+def parse_product_page(html: str, url: str) -> Dict[str, Any]:
+    """Extract product details from a downloaded product page."""
+    return extract_product(html, url)
+
+def crawl_key(url: str) -> str:
+    """URL as a coalescing key: lower-case scheme and host, no fragment or trailing slash."""
+    parts = urlsplit(url.strip())
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip("/") or "/", parts.query, ""))
+
+def fetch_product_page(url: str, ttl: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Fetch and parse a Basalam product page.
+    Plain-function form of ``crawl_product_page`` used by the crawl pipeline.
+
+    Pages are served from the page cache while fresh and revalidated with a
+    conditional GET afterwards; a 304 reuses the cached parse. ``ttl`` sets
+    how long this product's page stays fresh (default: PAGE_CACHE_TTL).
+    Concurrent crawls of the same page share one fetch (see tools/single_flight.py);
+    the returned dict is shared between them and must not be modified.
+    """
+    with span("crawl.page", url=url) as page:
+        result, shared = crawl_flights.do(crawl_key(url), lambda: _fetch_product_page(url, ttl))
+        page.set_attribute("coalesced", shared)
+        return result
+
+def _fetch_product_page(url: str, ttl: Optional[float]) -> Dict[str, Any]:
+    with span("crawl.fetch") as page:
+        cached = None
+        try:
+            cached = page_cache.get(url)
+            if ttl is not None and cached is not None and cached.ttl != ttl:
+                page_cache.set_ttl(url, ttl)
+                cached = cached._replace(ttl=ttl)
+            if cached is not None and cached.parsed and cached.fresh:
+                page.set_attribute("cache", "fresh")
+                return cached.parsed
+
+            headers = dict(HEADERS)
+            if cached is not None:
+                headers.update(cached.validators())
+
+            response = http_client.get(url, timeout=15, headers=headers)
+            page.set_attribute("http.status_code", response.status_code)
+            if response.status_code == 304 and cached is not None:
+                page.set_attribute("cache", "revalidated")
+                page_cache.revalidated(url, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+                return cached.parsed or parse_product_page(cached.body.decode('utf-8', 'replace'), url)
+
+            page.set_attribute("cache", "miss")
+            response.raise_for_status()
+            with span("crawl.parse"):
+                result = parse_product_page(response.text, url)
+            page_cache.store(
+                url, response.content, result,
+                etag=response.headers.get('ETag'),
+                last_modified=response.headers.get('Last-Modified'),
+                ttl=ttl
+            )
+            return result
+
+        except requests.RequestException as e:
+            page.record_error(e)
+            if cached is not None and cached.parsed:
+                # Host failing or its circuit open: an old copy beats an error
+                page.set_attribute("cache", "stale")
+                print(f"⚠️ نسخه قبلی صفحه استفاده شد: {url}")
+                return cached.parsed
+            return {
+                'error': f'خطا در دریافت صفحه: {str(e)}',
+                'url': url,
+                'crawled_successfully': False
+            }
+        except Exception as e:
+            page.record_error(e)
+            return {
+                'error': f'خطا در پردازش صفحه: {str(e)}',
+                'url': url,
+                'crawled_successfully': False
+            }
+
+# Shared pipeline for parallel crawls (chat storage step and batch tool)
+crawl_pipeline = CrawlPipeline(fetch_product_page)
 
 @tool
 def crawl_product_page(url: str) -> Dict[str, Any]:
@@ -11,107 +103,7 @@ def crawl_product_page(url: str) -> Dict[str, Any]:
     Crawls a Basalam product page and extracts comprehensive product information.
     Returns a dictionary with all available product details.
     """
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        response = requests.get(url, timeout=15, headers=headers)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        # Extract basic info
-        name = soup.select_one('h1.thh9OB')
-        name_text = name.get_text(strip=True) if name else ''
-
-        price = soup.select_one('span.PlpxQp')
-        price_text = price.get_text(strip=True) if price else ''
-        
-        # Extract numeric price
-        price_numeric = 0
-        if price_text:
-            price_numbers = re.findall(r'[\d,]+', price_text.replace(',', ''))
-            if price_numbers:
-                price_numeric = int(price_numbers[0])
-
-        description = soup.select_one('p.fhJOs1.bs-read-more__text')
-        description_text = description.get_text(strip=True) if description else ''
-
-        # Extract additional details
-        specifications = {}
-        spec_items = soup.select('.specification-item') or soup.select('.product-specs tr')
-        for item in spec_items:
-            try:
-                if item.select('.spec-key') and item.select('.spec-value'):
-                    key = item.select_one('.spec-key').get_text(strip=True)
-                    value = item.select_one('.spec-value').get_text(strip=True)
-                    specifications[key] = value
-                elif len(item.find_all('td')) == 2:
-                    cells = item.find_all('td')
-                    key = cells[0].get_text(strip=True)
-                    value = cells[1].get_text(strip=True)
-                    specifications[key] = value
-            except:
-                continue
-
-        # Extract images
-        additional_images = []
-        img_elements = soup.select('img[src*="basalam"]') or soup.select('.product-gallery img')
-        for img in img_elements:
-            src = img.get('src') or img.get('data-src')
-            if src and src not in additional_images and 'basalam' in src:
-                additional_images.append(src)
-
-        # Extract reviews
-        reviews = []
-        review_elements = soup.select('.review-item') or soup.select('.comment-item')
-        for review in review_elements[:5]:  # Limit to 5 reviews
-            try:
-                review_text = review.get_text(strip=True)
-                if review_text and len(review_text) > 10:
-                    reviews.append(review_text)
-            except:
-                continue
-
-        # Extract rating info
-        rating_element = soup.select_one('.rating-average') or soup.select_one('[class*="rating"]')
-        rating = 0.0
-        if rating_element:
-            rating_text = rating_element.get_text()
-            rating_match = re.search(r'(\d+\.?\d*)', rating_text)
-            if rating_match:
-                rating = float(rating_match.group(1))
-
-        # Extract vendor info
-        vendor_element = soup.select_one('.vendor-name') or soup.select_one('[class*="seller"]')
-        vendor_name = vendor_element.get_text(strip=True) if vendor_element else ''
-
-        return {
-            'url': url,
-            'name': name_text,
-            'price': price_numeric,
-            'price_text': price_text,
-            'description': description_text,
-            'specifications': specifications,
-            'additional_images': additional_images,
-            'reviews': reviews,
-            'rating': rating,
-            'vendor_name': vendor_name,
-            'crawled_successfully': True
-        }
-        
-    except requests.RequestException as e:
-        return {
-            'error': f'خطا در دریافت صفحه: {str(e)}',
-            'url': url,
-            'crawled_successfully': False
-        }
-    except Exception as e:
-        return {
-            'error': f'خطا در پردازش صفحه: {str(e)}',
-            'url': url,
-            'crawled_successfully': False
-        }
+    return fetch_product_page(url)
 
 @tool
 def batch_crawl_products(urls: List[str]) -> List[Dict[str, Any]]:
@@ -124,22 +116,21 @@ def batch_crawl_products(urls: List[str]) -> List[Dict[str, Any]]:
     Returns:
         List of crawled product data
     """
+    urls = urls[:10]  # Limit to 10 products to avoid overloading
+    finished = dict(crawl_pipeline.run([(url, url) for url in urls]))
+
     results = []
-    for url in urls[:10]:  # Limit to 10 products to avoid overloading
-        try:
-            result = crawl_product_page(url)
-            results.append(result)
-        except Exception as e:
-            results.append({
-                'url': url,
-                'error': str(e),
-                'crawled_successfully': False
-            })
+    for url in urls:
+        results.append(finished.get(url, {
+            'url': url,
+            'error': 'مهلت دریافت صفحه به پایان رسید',
+            'crawled_successfully': False
+        }))
     
     return results
 
 if __name__ == "__main__":
     test_url = "https://basalam.com/p/16078271"
     import json
-    result = crawl_product_page(test_url)
+    result = fetch_product_page(test_url)
     print(json.dumps(result, ensure_ascii=False, indent=2))
@@ -1,10 +1,8 @@
 
 from langchain_core.tools import tool
 from typing import Dict, List, Any, Optional
-from database.product_store import ProductStore
-
-# Initialize the product store
-product_store = ProductStore()
+from database.product_store import SUMMARY_COLUMNS, get_product_store
+from tools.result_set import ResultSet
 
 @tool
 def save_product_details(product_data: Dict[str, Any], search_query: str = "") -> str:
@@ -20,7 +18,7 @@ def save_product_details(product_data: Dict[str, Any], search_query: str = "") -
         Internal ID of the saved product
     """
     try:
-        internal_id = product_store.save_product(product_data, search_query)
+        internal_id = get_product_store().save_product(product_data, search_query)
         return f"محصول با موفقیت ذخیره شد. شناسه: {internal_id}"
     except Exception as e:
         return f"خطا در ذخیره محصول: {str(e)}"
@@ -37,28 +35,33 @@ def get_product_details(internal_id: str) -> Optional[Dict[str, Any]]:
         Product details or None if not found
     """
     try:
-        product = product_store.get_product(internal_id)
+        product = get_product_store().get_product(internal_id)
         if product:
-            return product
+            return dict(product)
         else:
             return {"error": "محصول پیدا نشد"}
     except Exception as e:
         return {"error": f"خطا در دریافت اطلاعات محصول: {str(e)}"}
 
 @tool
-def search_saved_products(query: str) -> List[Dict[str, Any]]:
+def search_saved_products(query: str, page: int = 1) -> List[Dict[str, Any]]:
     """
-    Search through saved products by name or description.
+    Search through saved products by name, description, specifications and reviews.
+    Results are ranked by relevance, 20 per page.
     
     Args:
-        query: Search term to look for in product names and descriptions
+        query: Search term to look for in saved products
+        page: Result page, starting from 1
     
     Returns:
-        List of matching products
+        List of matching products, each with a highlighted snippet
     """
     try:
-        products = product_store.search_stored_products(query)
-        return products
+        page_size = 20
+        products = get_product_store().search_stored_products(
+            query, limit=page_size, offset=(max(page, 1) - 1) * page_size, columns=SUMMARY_COLUMNS
+        )
+        return [dict(p) for p in products]
     except Exception as e:
         return [{"error": f"خطا در جستجوی محصولات ذخیره شده: {str(e)}"}]
 
@@ -74,8 +77,8 @@ def get_recent_products(limit: int = 10) -> List[Dict[str, Any]]:
         List of recent products
     """
     try:
-        products = product_store.get_all_products(limit)
-        return products
+        products = get_product_store().get_all_products(limit, columns=SUMMARY_COLUMNS)
+        return [dict(p) for p in products]
     except Exception as e:
         return [{"error": f"خطا در دریافت محصولات اخیر: {str(e)}"}]
 
@@ -93,20 +96,24 @@ def compare_products(product_ids: List[str]) -> Dict[str, Any]:
     try:
         products = []
         for pid in product_ids:
-            product = product_store.get_product(pid)
+            product = get_product_store().get_product(pid, columns=SUMMARY_COLUMNS)
             if product:
-                products.append(product)
+                products.append(dict(product))
         
         if len(products) < 2:
             return {"error": "حداقل دو محصول برای مقایسه نیاز است"}
         
+        results = ResultSet.from_records(products)
         comparison = {
             "products": products,
             "comparison": {
                 "prices": [p['price'] for p in products],
                 "ratings": [p['rating'] for p in products],
                 "vendors": [p['vendor_name'] for p in products],
-                "cities": [p['vendor_city'] for p in products]
+                "cities": [p['vendor_city'] for p in products],
+                "summary": results.summary(),
+                "cheapest_first": [p['id'] for p in results.rank(("price", "-rating")).to_list()],
+                "best_rated_first": [p['id'] for p in results.rank(("-rating", "price")).to_list()]
             }
         }
         
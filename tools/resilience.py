@@ -0,0 +1,264 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import requests
+
+# Circuit breaker: open when at least half of the last BREAKER_WINDOW calls (and
+# BREAKER_MIN_CALLS or more) failed; after the cooldown one probe call decides
+# whether to close again. Each failed probe doubles the cooldown.
+BREAKER_WINDOW = 20
+BREAKER_MIN_CALLS = 5
+BREAKER_FAILURE_RATIO = 0.5
+BREAKER_COOLDOWN = 15.0  # seconds
+BREAKER_MAX_COOLDOWN = 120.0
+
+# AIMD: +1 to the concurrency limit per "limit" good calls, halve it on a failure or slow call
+AIMD_DECREASE = 0.5
+AIMD_SLOW_CALL = 5.0  # seconds; slower calls count as congestion
+
+MAX_RATE_WAIT = 10.0  # seconds a call may queue for a rate-limit token
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised without calling the host while its circuit is open."""
+
+    def __init__(self, host: str, retry_after: float):
+        super().__init__(f"circuit open for {host}, retry in {retry_after:.0f}s")
+        self.host = host
+        self.retry_after = retry_after
+
+
+class UpstreamBusyError(requests.RequestException):
+    """The host's rate limit or concurrency limit would make the call wait too long."""
+
+
+class TokenBucket:
+    """Allows ``rate`` calls per second on average, with bursts of up to ``burst``."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait: float = MAX_RATE_WAIT) -> float:
+        """Take a token; returns how long to wait before using it. Raises UpstreamBusyError past ``max_wait``."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            wait = (1 - self.tokens) / self.rate if self.tokens < 1 else 0.0
+            if wait > max_wait:
+                raise UpstreamBusyError(f"rate limit queue is {wait:.1f}s long")
+            self.tokens -= 1
+            return wait
+
+
+class AimdLimiter:
+    """Concurrency limit that grows by one per window of good calls and halves on trouble."""
+
+    def __init__(self, max_limit: int, min_limit: int = 1, decrease: float = AIMD_DECREASE,
+                 slow_call: float = AIMD_SLOW_CALL):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.decrease = decrease
+        self.slow_call = slow_call
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def _has_room(self) -> bool:
+        return self.in_flight < max(int(self.limit), self.min_limit)
+
+    def acquire(self, timeout: float) -> bool:
+        with self._cond:
+            if not self._cond.wait_for(self._has_room, timeout):
+                return False
+            self.in_flight += 1
+            return True
+
+    def try_acquire(self) -> bool:
+        with self._cond:
+            if not self._has_room():
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self, ok: bool, started: float):
+        """End a call that began at ``started`` (time.monotonic())."""
+        now = time.monotonic()
+        with self._cond:
+            self.in_flight -= 1
+            if ok and now - started < self.slow_call:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            elif started >= self._last_decrease:
+                # Calls that were already in flight at the last decrease don't cut the limit again
+                self.limit = max(self.min_limit, self.limit * self.decrease)
+                self._last_decrease = now
+            self._cond.notify_all()
+
+
+class CircuitBreaker:
+    def __init__(self, host: str, window: int = BREAKER_WINDOW, min_calls: int = BREAKER_MIN_CALLS,
+                 failure_ratio: float = BREAKER_FAILURE_RATIO, cooldown: float = BREAKER_COOLDOWN,
+                 max_cooldown: float = BREAKER_MAX_COOLDOWN):
+        self.host = host
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.rejected = 0
+        self._outcomes = deque(maxlen=window)
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> bool:
+        """Raise CircuitOpenError if the call may not go out; returns True for the half-open probe."""
+        with self._lock:
+            if self.state == OPEN:
+                remaining = self.opened_at + self.cooldown - time.monotonic()
+                if remaining > 0:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.host, remaining)
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN:
+                if self._probing:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.host, 1.0)
+                self._probing = True
+                return True
+            return False
+
+    def cancel(self, probe: bool):
+        """The call was allowed but never sent."""
+        if probe:
+            with self._lock:
+                self._probing = False
+
+    def after_call(self, ok: bool, probe: bool):
+        with self._lock:
+            if probe:
+                self._probing = False
+                if ok:
+                    self.state = CLOSED
+                    self.cooldown = self.base_cooldown
+                    self._outcomes.clear()
+                else:
+                    self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+                    self._open()
+                return
+            if self.state != CLOSED:
+                return  # started before the circuit opened
+            self._outcomes.append(ok)
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_ratio:
+                self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+        self._outcomes.clear()
+        print(f"⚡ مدار {self.host} باز شد؛ درخواست‌ها تا {self.cooldown:.0f} ثانیه متوقف می‌شوند")
+
+
+def _is_success(response) -> bool:
+    return response.status_code < 500 and response.status_code != 429
+
+
+class HostGuard:
+    """Rate limit, adaptive concurrency limit and circuit breaker for one upstream host."""
+
+    def __init__(self, host: str, max_concurrency: int, rate: Optional[Tuple[float, float]] = None):
+        self.host = host
+        self.bucket = TokenBucket(*rate) if rate else None
+        self.limiter = AimdLimiter(max_concurrency)
+        self.breaker = CircuitBreaker(host)
+        self.counts = {"success": 0, "failure": 0, "busy": 0}
+        self.rate_wait_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def _admit(self) -> tuple:
+        probe = self.breaker.before_call()
+        try:
+            wait = self.bucket.reserve() if self.bucket else 0.0
+        except UpstreamBusyError:
+            self.breaker.cancel(probe)
+            self._count("busy")
+            raise
+        return probe, wait
+
+    def _count(self, outcome: str):
+        with self._lock:
+            self.counts[outcome] += 1
+
+    def _count_wait(self, wait: float):
+        with self._lock:
+            self.rate_wait_seconds += wait
+
+    def _finish(self, probe: bool, ok: bool, started: float):
+        self.limiter.release(ok, started)
+        self.breaker.after_call(ok, probe)
+        self._count("success" if ok else "failure")
+
+    def call(self, send: Callable[[], Any], timeout: float):
+        probe, wait = self._admit()
+        if wait:
+            time.sleep(wait)
+            self._count_wait(wait)
+        if not self.limiter.acquire(timeout):
+            self.breaker.cancel(probe)
+            self._count("busy")
+            raise UpstreamBusyError(f"no free slot for {self.host} within {timeout:.0f}s")
+        started, ok = time.monotonic(), False
+        try:
+            response = send()
+            ok = _is_success(response)
+            return response
+        finally:
+            self._finish(probe, ok, started)
+
+    async def acall(self, send: Callable[[], Any], timeout: float):
+        probe, wait = self._admit()
+        if wait:
+            await asyncio.sleep(wait)
+            self._count_wait(wait)
+        deadline = time.monotonic() + timeout
+        while not self.limiter.try_acquire():
+            if time.monotonic() >= deadline:
+                self.breaker.cancel(probe)
+                self._count("busy")
+                raise UpstreamBusyError(f"no free slot for {self.host} within {timeout:.0f}s")
+            await asyncio.sleep(0.01)
+        started, ok = time.monotonic(), False
+        try:
+            response = await send()
+            ok = _is_success(response)
+            return response
+        finally:
+            self._finish(probe, ok, started)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self.counts)
+            rate_wait = self.rate_wait_seconds
+        return {
+            "state": self.breaker.state,
+            "times_opened": self.breaker.times_opened,
+            "rejected": self.breaker.rejected,
+            "concurrency_limit": round(self.limiter.limit, 2),
+            "in_flight": self.limiter.in_flight,
+            "rate_wait_seconds": round(rate_wait, 3),
+            **counts,
+        }
@@ -0,0 +1,211 @@
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+# Weight of the set-wide mean rating in the weighted score, in "ratings"
+DEFAULT_RATING_PRIOR = 10
+
+
+def _clean_api_product(product: Dict[str, Any], link_base: str) -> Dict[str, Any]:
+    vendor = product.get("vendor", {})
+    rating = product.get("rating", {})
+    return {
+        "name": product.get("name"),
+        "price": int(product.get("price", 0)) // 10,
+        "image": product.get("photo", {}).get("MEDIUM"),
+        "rating": rating.get("average"),
+        "rating_count": rating.get("count"),
+        "vendor_name": vendor.get("name"),
+        "vendor_city": vendor.get("owner", {}).get("city"),
+        "product_id": product.get("id"),
+        "link": f"{link_base}/p/{product.get('id')}",
+    }
+
+
+def _id_column(ids: List[Any]) -> np.ndarray:
+    """product_id column: int64 when every id is numeric, else strings ("" for a missing id)."""
+    try:
+        return np.array(ids, dtype=np.int64)
+    except (TypeError, ValueError, OverflowError):
+        return np.array(["" if i is None else str(i) for i in ids], dtype=object)
+
+
+class ResultSet:
+    """
+    Product list with the fields used for filtering and ranking held as
+    NumPy columns.
+
+    Filtering, ranking and summaries work on the columns; product dicts are
+    only built for the rows that are turned back into a list. Operations
+    return a new ResultSet that shares the columns, so chaining them does
+    not copy anything but the row index.
+    """
+
+    __slots__ = ("records", "convert", "product_id", "price", "rating", "rating_count", "city", "group", "index")
+
+    def __init__(self, records: List[Dict[str, Any]], product_id: np.ndarray, price: np.ndarray,
+                 rating: np.ndarray, rating_count: np.ndarray, city: np.ndarray, group: np.ndarray,
+                 index: Optional[np.ndarray] = None, convert: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None):
+        self.records = records
+        self.convert = convert  # turns a stored record into the output dict (raw API rows)
+        self.product_id = product_id
+        self.price = price
+        self.rating = rating  # NaN where the product has no rating
+        self.rating_count = rating_count
+        self.city = city  # lower-cased, "" when unknown
+        self.group = group  # which input list each row came from (see concat)
+        self.index = np.arange(len(records)) if index is None else index
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]]) -> "ResultSet":
+        """Columns from cleaned product dicts (search results or stored products)."""
+        records = list(records)
+        n = len(records)
+        # float arrays turn None into NaN in C, which is much faster than testing each value
+        return cls(
+            records,
+            _id_column([r.get("product_id") for r in records]),
+            np.nan_to_num(np.array([r.get("price") for r in records], dtype=np.float64)).astype(np.int64),
+            np.array([r.get("rating") for r in records], dtype=np.float64),
+            np.nan_to_num(np.array([r.get("rating_count") for r in records], dtype=np.float64)).astype(np.int64),
+            np.array([(r.get("vendor_city") or "").lower() for r in records], dtype=object),
+            np.zeros(n, dtype=np.int32),
+        )
+
+    @classmethod
+    def from_api(cls, products: List[Dict[str, Any]], link_base: str = "https://basalam.com") -> "ResultSet":
+        """Columns straight from raw search API products (prices in Rial); rows are cleaned on output."""
+        n = len(products)
+        ratings = [p.get("rating", {}) for p in products]
+        return cls(
+            products,
+            _id_column([p.get("id") for p in products]),
+            np.fromiter((int(p.get("price", 0)) for p in products), dtype=np.int64, count=n) // 10,
+            np.fromiter((np.nan if r.get("average") is None else r["average"] for r in ratings), dtype=np.float64, count=n),
+            np.fromiter((r.get("count") or 0 for r in ratings), dtype=np.int64, count=n),
+            np.array([(p.get("vendor", {}).get("owner", {}).get("city") or "").lower() for p in products], dtype=object),
+            np.zeros(n, dtype=np.int32),
+            convert=partial(_clean_api_product, link_base=link_base),
+        )
+
+    @classmethod
+    def concat(cls, sets: Sequence["ResultSet"]) -> "ResultSet":
+        """One set with the rows of ``sets`` in order; ``group`` holds each row's position in ``sets``."""
+        parts = [(g, s) for g, s in enumerate(sets) if len(s)]
+        if not parts:
+            return cls.from_records([])
+        ids = [s.product_id[s.index] for _, s in parts]
+        if any(i.dtype != np.int64 for i in ids):
+            ids = [i.astype(str) if i.dtype == np.int64 else i for i in ids]
+        return cls(
+            [record for _, s in parts for record in s.to_list()],
+            np.concatenate(ids),
+            np.concatenate([s.price[s.index] for _, s in parts]),
+            np.concatenate([s.rating[s.index] for _, s in parts]),
+            np.concatenate([s.rating_count[s.index] for _, s in parts]),
+            np.concatenate([s.city[s.index] for _, s in parts]),
+            np.concatenate([np.full(len(s), g, dtype=np.int32) for g, s in parts]),
+        )
+
+    def _select(self, index: np.ndarray) -> "ResultSet":
+        return ResultSet(self.records, self.product_id, self.price, self.rating, self.rating_count,
+                         self.city, self.group, index, self.convert)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def filter(self, max_price: Optional[int] = None, min_rating: Optional[float] = None,
+               vendor_city: Optional[str] = None, require_price: bool = True) -> "ResultSet":
+        """
+        Keep rows that have a price, cost at most ``max_price``, are rated at
+        least ``min_rating`` and are sold from ``vendor_city``. Falsy filter
+        values are ignored; products with no city pass the city filter.
+        """
+        i = self.index
+        keep = np.ones(len(i), dtype=bool)
+        if require_price:
+            keep &= self.price[i] != 0
+        if max_price:
+            keep &= self.price[i] <= max_price
+        if min_rating:
+            keep &= self.rating[i] >= min_rating  # NaN compares False
+        if vendor_city:
+            cities = self.city[i]
+            keep &= (cities == "") | (cities == vendor_city.lower())
+        return self._select(i[keep])
+
+    def weighted_rating(self, prior: float = DEFAULT_RATING_PRIOR) -> np.ndarray:
+        """
+        Rating pulled towards the set's mean rating, more so for products with
+        few ratings: (prior * mean + count * rating) / (prior + count).
+        Unrated products score the mean.
+        """
+        i = self.index
+        rating, count = self.rating[i], self.rating_count[i].astype(np.float64)
+        rated = ~np.isnan(rating)
+        if not rated.any():
+            return np.zeros(len(i))
+        mean = rating[rated].mean()
+        count = np.where(rated, count, 0.0)
+        return (prior * mean + count * np.where(rated, rating, 0.0)) / (prior + count)
+
+    def rank(self, keys: Sequence[str] = ("price",), prior: float = DEFAULT_RATING_PRIOR) -> "ResultSet":
+        """
+        Stable multi-key sort. Keys are "price", "rating", "rating_count" or
+        "score" (the weighted rating), with a leading "-" for descending;
+        the first key is the primary one. Unrated products sort last by rating.
+        """
+        i = self.index
+        columns = []
+        for key in keys:
+            descending = key.startswith("-")
+            name = key.lstrip("-")
+            if name == "score":
+                values = self.weighted_rating(prior)
+            elif name == "rating":
+                values = np.nan_to_num(self.rating[i], nan=-np.inf if descending else np.inf)
+            else:
+                values = getattr(self, name)[i]
+            columns.append(-values if descending else values)
+        if not columns:
+            return self
+        # lexsort sorts by the last key first and is stable
+        return self._select(i[np.lexsort(columns[::-1])])
+
+    def dedupe(self) -> "ResultSet":
+        """Keep the first row of each product_id (rows without an id are kept)."""
+        i = self.index
+        ids = self.product_id[i]
+        has_id = np.ones(len(i), dtype=bool) if ids.dtype == np.int64 else ids != ""
+        keep = ~has_id
+        _, first = np.unique(ids[has_id], return_index=True)
+        keep[np.flatnonzero(has_id)[first]] = True
+        return self._select(i[keep])
+
+    def head(self, n: int) -> "ResultSet":
+        return self._select(self.index[:n])
+
+    def group_counts(self) -> Dict[int, int]:
+        groups, counts = np.unique(self.group[self.index], return_counts=True)
+        return dict(zip(groups.tolist(), counts.tolist()))
+
+    def summary(self, percentiles: Sequence[float] = (25, 50, 75)) -> Dict[str, Any]:
+        """Count, min/max/mean and percentiles of price and of rating (rated products only)."""
+        result: Dict[str, Any] = {"count": len(self)}
+        for name, values in (("price", self.price[self.index]), ("rating", self.rating[self.index])):
+            values = values[~np.isnan(values)] if values.dtype.kind == "f" else values
+            if not len(values):
+                result[name] = None
+                continue
+            stats = {"min": values.min().item(), "max": values.max().item(), "mean": round(float(values.mean()), 2)}
+            for q, value in zip(percentiles, np.percentile(values, percentiles)):
+                stats[f"p{q:g}"] = round(float(value), 2)
+            result[name] = stats
+        return result
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        records = self.records
+        if self.convert is not None:
+            return [self.convert(records[j]) for j in self.index.tolist()]
+        return [records[j] for j in self.index.tolist()]
@@ -0,0 +1,181 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from tools.text_utils import normalize_persian
+
+SEARCH_CACHE_TTL = 300  # seconds a result is served as fresh
+SEARCH_CACHE_STALE_TTL = 1800  # extra seconds a result may be served while refreshing
+SEARCH_CACHE_FALLBACK_TTL = 6 * 3600  # extra seconds a result is kept for when the API is down
+SEARCH_CACHE_MAX_ENTRIES = 512
+SEARCH_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+
+def approx_size(value: Any) -> int:
+    """Rough in-memory size of a JSON-like value, used for the memory bound."""
+    try:
+        return len(json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"))
+    except (TypeError, ValueError):
+        return 1024
+
+
+class _Entry:
+    __slots__ = ("value", "stored_at", "size")
+
+    def __init__(self, value: Any, stored_at: float, size: int):
+        self.value = value
+        self.stored_at = stored_at
+        self.size = size
+
+
+class TTLCache:
+    """
+    Thread-safe TTL + LRU cache with a memory bound and stale-while-revalidate.
+
+    Entries younger than ``ttl`` are served as hits. Entries older than ``ttl`` but
+    within ``ttl + stale_ttl`` are served immediately while a background thread
+    reloads them. Older entries count as misses but are kept for another
+    ``fallback_ttl`` seconds, for ``peek`` to return when reloading fails. Least
+    recently used entries are evicted once ``max_entries`` or ``max_bytes`` is
+    exceeded.
+    """
+
+    def __init__(self, ttl: float, stale_ttl: float = 0, max_entries: int = 1024,
+                 max_bytes: Optional[int] = None, sizeof: Callable[[Any], int] = approx_size,
+                 fallback_ttl: float = 0):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.fallback_ttl = fallback_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._stats = {"hits": 0, "stale_hits": 0, "misses": 0, "evictions": 0, "refreshes": 0, "refresh_errors": 0}
+
+    def _lookup(self, key: Hashable) -> Tuple[Optional[_Entry], bool]:
+        """Return (entry, fresh). Expired entries are dropped. Caller holds the lock."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None, False
+        age = time.monotonic() - entry.stored_at
+        if age <= self.ttl:
+            return entry, True
+        if age <= self.ttl + self.stale_ttl:
+            return entry, False
+        if age > self.ttl + self.stale_ttl + self.fallback_ttl:
+            self._remove(key)
+        return None, False
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a fresh value or ``default``. Does not trigger refreshes."""
+        with self._lock:
+            entry, fresh = self._lookup(key)
+            if entry is None or not fresh:
+                return default
+            self._entries.move_to_end(key)
+            return entry.value
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Return any value still kept for ``key``, however old (fallback for failed loads)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry.stored_at > self.ttl + self.stale_ttl + self.fallback_ttl:
+                return default
+            return entry.value
+
+    def set(self, key: Hashable, value: Any, age: float = 0.0):
+        """Store ``value``; ``age`` (seconds) is how old it already is, e.g. when copied from a slower cache."""
+        size = self.sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(value, time.monotonic() - age, size)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or
+                                     (self.max_bytes is not None and self._bytes > self.max_bytes)):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._stats["evictions"] += 1
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Return the cached value for ``key``, calling ``loader`` on a miss."""
+        with self._lock:
+            entry, fresh = self._lookup(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if fresh:
+                    self._stats["hits"] += 1
+                    return entry.value
+                self._stats["stale_hits"] += 1
+                if key not in self._refreshing:
+                    self._refreshing.add(key)
+                    threading.Thread(target=self._refresh, args=(key, loader), daemon=True).start()
+                return entry.value
+            self._stats["misses"] += 1
+
+        value = loader()
+        self.set(key, value)
+        return value
+
+    def _refresh(self, key: Hashable, loader: Callable[[], Any]):
+        try:
+            self.set(key, loader())
+            with self._lock:
+                self._stats["refreshes"] += 1
+        except Exception as e:
+            with self._lock:
+                self._stats["refresh_errors"] += 1
+            print(f"❌ خطا در به‌روزرسانی کش: {str(e)}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["stale_hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hit_rate": (self._stats["hits"] + self._stats["stale_hits"]) / lookups if lookups else 0.0,
+            }
+
+
+def search_cache_key(query: str, max_price: Optional[int] = None, min_rating: Optional[float] = None,
+                     vendor_city: Optional[str] = None) -> tuple:
+    """Cache key for a Basalam search; falsy filters are treated as unset, like the API call."""
+    return (
+        normalize_persian(query),
+        int(max_price) if max_price else None,
+        float(min_rating) if min_rating else None,
+        normalize_persian(vendor_city) if vendor_city else None,
+    )
+
+
+search_cache = TTLCache(
+    ttl=SEARCH_CACHE_TTL,
+    stale_ttl=SEARCH_CACHE_STALE_TTL,
+    fallback_ttl=SEARCH_CACHE_FALLBACK_TTL,
+    max_entries=SEARCH_CACHE_MAX_ENTRIES,
+    max_bytes=SEARCH_CACHE_MAX_BYTES,
+)
+
+
+def get_search_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters and size of the Basalam search cache."""
+    return search_cache.stats()
@@ -0,0 +1,174 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, List, Optional
+
+HISTORY_TOKEN_BUDGET = 1500
+SUMMARY_TOKEN_BUDGET = 300
+MAX_STORED_PRODUCTS = 50
+SESSION_IDLE_TTL = 2 * 3600  # seconds
+MAX_SESSIONS = 1000
+
+
+def approx_tokens(text: str) -> int:
+    """Rough token count; Persian text averages about three characters per token."""
+    return len(text) // 3 + 1
+
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    limit = budget * 3
+    return text if len(text) <= limit else "…" + text[-limit:]
+
+
+def extractive_summary(summary: str, turns: List[Dict[str, str]]) -> str:
+    """Summarizer used when no LLM summarizer is configured: keeps what the user asked for."""
+    asked = "؛ ".join(turn["content"][:80] for turn in turns if turn["role"] == "user")
+    return f"{summary}؛ {asked}" if summary else asked
+
+
+class Session:
+    """Conversation state of one user: a bounded history window and recently shown products."""
+
+    def __init__(self, session_id: str, max_products: int):
+        self.session_id = session_id
+        self.history: List[Dict[str, str]] = []
+        self.summary = ""
+        self.stored_products: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.max_products = max_products
+        self.last_seen = time.monotonic()
+        self.lock = threading.Lock()
+        self.pending_turns: "deque[List[Dict[str, str]]]" = deque()  # dropped turns awaiting summary, oldest first
+        self.summarizing = False  # a summarization worker is draining pending_turns
+
+    def remember_product(self, internal_id: str, product: Dict[str, Any]):
+        with self.lock:
+            self.stored_products[internal_id] = product
+            self.stored_products.move_to_end(internal_id)
+            while len(self.stored_products) > self.max_products:
+                self.stored_products.popitem(last=False)
+
+    def get_product(self, internal_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            return self.stored_products.get(internal_id)
+
+    def prompt_history(self) -> List[Dict[str, str]]:
+        """History to send with the next turn: the summary of older turns plus the recent window."""
+        with self.lock:
+            messages = list(self.history)
+            if self.summary:
+                messages.insert(0, {"role": "system", "content": f"خلاصه گفتگوی قبلی با کاربر: {self.summary}"})
+            return messages
+
+
+class SessionStore:
+    """
+    Per-session conversation state with bounded memory.
+
+    Each session keeps the most recent turns within ``history_tokens``; older
+    turns are folded into a running summary by ``summarizer`` on one background
+    worker per session, oldest first, so the prompt stays the same size however
+    long the conversation runs. Sessions idle for ``idle_ttl`` seconds are dropped, and at most
+    ``max_sessions`` are kept (least recently used first out).
+    """
+
+    def __init__(self, summarizer: Optional[Callable[[str, List[Dict[str, str]]], str]] = None,
+                 history_tokens: int = HISTORY_TOKEN_BUDGET, summary_tokens: int = SUMMARY_TOKEN_BUDGET,
+                 max_products: int = MAX_STORED_PRODUCTS, idle_ttl: float = SESSION_IDLE_TTL,
+                 max_sessions: int = MAX_SESSIONS):
+        self.summarizer = summarizer or extractive_summary
+        self.history_tokens = history_tokens
+        self.summary_tokens = summary_tokens
+        self.max_products = max_products
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.summaries = 0
+
+    def get(self, session_id: str) -> Session:
+        """Session for ``session_id``, created on first use. Also evicts idle sessions."""
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now, self.max_sessions if session_id in self._sessions else self.max_sessions - 1)
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = Session(session_id, self.max_products)
+                self._sessions[session_id] = session
+            self._sessions.move_to_end(session_id)
+            session.last_seen = now
+            return session
+
+    def peek(self, session_id: str) -> Optional[Session]:
+        """Existing session without touching its idle timer."""
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def _evict(self, now: float, keep: int):
+        # Sessions are ordered by last use, so idle ones are at the front
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_seen <= self.idle_ttl and len(self._sessions) <= keep:
+                break
+            del self._sessions[session_id]
+            self.evictions += 1
+
+    def add_turn(self, session: Session, user_input: str, output: str):
+        """Append a turn and move whatever no longer fits the budget into the summary."""
+        with session.lock:
+            session.history.append({"role": "user", "content": user_input})
+            session.history.append({"role": "assistant", "content": output})
+
+            dropped = []
+            while len(session.history) > 2 and \
+                    sum(approx_tokens(m["content"]) for m in session.history) > self.history_tokens:
+                dropped.extend(session.history[:2])
+                del session.history[:2]
+
+            # A single oversized turn is trimmed rather than dropped
+            for message in session.history:
+                message["content"] = truncate_to_tokens(message["content"], self.history_tokens // 2)
+
+            if not dropped:
+                return
+            session.pending_turns.append(dropped)
+            if session.summarizing:
+                return
+            session.summarizing = True
+
+        threading.Thread(target=self._summarize, args=(session,), daemon=True).start()
+
+    def _summarize(self, session: Session):
+        """Fold the session's dropped turns into its summary, oldest first, until none are left."""
+        while True:
+            with session.lock:
+                if not session.pending_turns:
+                    session.summarizing = False
+                    return
+                # Everything queued so far goes in one call, in the order it was dropped
+                turns = [message for batch in session.pending_turns for message in batch]
+                session.pending_turns.clear()
+                previous = session.summary
+            try:
+                summary = self.summarizer(previous, turns) or extractive_summary(previous, turns)
+            except Exception as e:
+                print(f"❌ خطا در خلاصه‌سازی گفتگو: {str(e)}")
+                summary = extractive_summary(previous, turns)
+            with session.lock:
+                session.summary = truncate_to_tokens(summary, self.summary_tokens)
+            self.summaries += 1
+
+    def clear(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return {
+            "sessions": len(sessions),
+            "history_messages": sum(len(s.history) for s in sessions),
+            "stored_products": sum(len(s.stored_products) for s in sessions),
+            "evictions": self.evictions,
+            "summaries": self.summaries,
+        }
@@ -0,0 +1,79 @@
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class _Call:
+    __slots__ = ("done", "value", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Merges concurrent calls for the same key into one.
+
+    The first caller for a key runs the function; callers arriving while it is
+    still running wait for it and get the same result (or exception). Nothing
+    is kept once the call finishes, so this only removes duplicate in-flight
+    work; caching stays with the caches. The shared result must not be mutated.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "upstream": 0, "coalesced": 0, "errors": 0, "peak_waiters": 0}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Run ``fn`` once for all concurrent callers with ``key``; returns (result, shared)."""
+        with self._lock:
+            self._stats["calls"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._stats["upstream"] += 1
+            else:
+                call.waiters += 1
+                self._stats["coalesced"] += 1
+                self._stats["peak_waiters"] = max(self._stats["peak_waiters"], call.waiters)
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+
+        try:
+            call.value = fn()
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self._stats["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value, False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                "in_flight": len(self._calls),
+                "saved_rate": self._stats["coalesced"] / self._stats["calls"] if self._stats["calls"] else 0.0,
+            }
+
+
+# Shared groups for outbound calls: identical searches and page crawls in flight at once
+search_flights = SingleFlight("search")
+crawl_flights = SingleFlight("crawl")
+
+
+def coalescing_stats() -> Dict[str, Dict[str, Any]]:
+    """Stats of every shared group, by name."""
+    return {group.name: group.stats() for group in (search_flights, crawl_flights)}
@@ -0,0 +1,38 @@
+import re
+
+PERSIAN_DIGITS = "۰۱۲۳۴۵۶۷۸۹"
+ARABIC_DIGITS = "٠١٢٣٤٥٦٧٨٩"
+
+_CHAR_MAP = {
+    **{ord(d): str(i) for i, d in enumerate(PERSIAN_DIGITS)},
+    **{ord(d): str(i) for i, d in enumerate(ARABIC_DIGITS)},
+    ord("ي"): "ی",
+    ord("ى"): "ی",
+    ord("ك"): "ک",
+    ord("ة"): "ه",
+    ord("ۀ"): "ه",
+    ord("أ"): "ا",
+    ord("إ"): "ا",
+    ord("ٱ"): "ا",
+    ord("\u200c"): " ",  # ZWNJ
+    ord("\u200d"): None,  # ZWJ
+    ord("\u0640"): None,  # tatweel
+    ord("٬"): ",",
+    ord("٫"): ".",
+}
+
+# Arabic diacritics (harakat, tanwin, superscript alef)
+_DIACRITICS = re.compile("[\u064b-\u065f\u0670]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_persian(text: str) -> str:
+    """
+    Normalize Persian/Arabic text for matching and cache keys:
+    Arabic letter variants to Persian, Persian/Arabic digits to ASCII,
+    ZWNJ to space, diacritics and tatweel removed, whitespace collapsed, lowercased.
+    """
+    if not text:
+        return ""
+    text = _DIACRITICS.sub("", str(text).translate(_CHAR_MAP))
+    return _WHITESPACE.sub(" ", text).strip().lower()
@@ -0,0 +1,36 @@
+import importlib
+from typing import Dict, List, Optional
+
+# Agent tools in the order they are offered to the model: tool name -> module.
+# Each tool is exported under its own name by its module.
+TOOL_MODULES: Dict[str, str] = {
+    "search_basalam": "tools.basalam_search",
+    "detect_intent": "tools.intent_detector",
+    "generate_seller_message": "tools.generate_message",
+    "fix_basalam_product_url": "tools.product_utils",
+    "crawl_product_page": "tools.product_crawler",
+    "batch_crawl_products": "tools.product_crawler",
+    "save_product_details": "tools.product_manager",
+    "get_product_details": "tools.product_manager",
+    "search_saved_products": "tools.product_manager",
+    "get_recent_products": "tools.product_manager",
+    "compare_products": "tools.product_manager",
+    "eco_search_expand": "tools.eco_search",
+    "perform_eco_search": "tools.eco_search_manager",
+    "explain_eco_search": "tools.eco_search_manager",
+}
+
+_loaded = {}
+
+
+def get_tool(name: str):
+    """Tool by name; its module (and whatever it depends on) is imported on first use."""
+    tool = _loaded.get(name)
+    if tool is None:
+        tool = getattr(importlib.import_module(TOOL_MODULES[name]), name)
+        _loaded[name] = tool
+    return tool
+
+
+def load_tools(names: Optional[List[str]] = None) -> list:
+    return [get_tool(name) for name in (names or TOOL_MODULES)]
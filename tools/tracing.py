@@ -0,0 +1,236 @@
+import contextvars
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+# When the OpenTelemetry API is installed, every span is mirrored into it, so a
+# configured SDK/collector receives the same trace. Without it, spans go only
+# to the built-in exporters below.
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:
+    otel_trace = None
+
+# BASALAM_TRACE_EXPORT: comma-separated exporters, "console" and/or "jsonl"
+TRACE_EXPORT = {name.strip() for name in os.getenv("BASALAM_TRACE_EXPORT", "").split(",") if name.strip()}
+TRACE_FILE = os.getenv("BASALAM_TRACE_FILE", "database/traces.jsonl")
+MAX_RECORDED_TRACES = 200
+
+_current = contextvars.ContextVar("trace_span", default=None)
+
+
+class Span:
+    """One timed stage of a turn; fields follow the OTLP span model."""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns",
+                 "attributes", "status", "_otel")
+
+    def __init__(self, name: str, parent: Optional["Span"] = None, attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = dict(attributes or {})
+        self.status = "UNSET"
+        self._otel = None
+        if otel_trace is not None:
+            context = otel_trace.set_span_in_context(parent._otel) if parent and parent._otel else None
+            self._otel = otel_trace.get_tracer("basalam").start_span(name, context=context, attributes=self.attributes)
+
+    def set_attribute(self, key: str, value: Any):
+        # An ended span has already been exported; late writes (e.g. from a background refresh) are dropped
+        if self.end_ns is not None:
+            return
+        self.attributes[key] = value
+        if self._otel is not None:
+            self._otel.set_attribute(key, value)
+
+    def record_error(self, error: BaseException):
+        if self.end_ns is not None:
+            return
+        self.status = "ERROR"
+        self.attributes["error"] = f"{type(error).__name__}: {error}"
+        if self._otel is not None:
+            self._otel.record_exception(error)
+            self._otel.set_status(otel_trace.Status(otel_trace.StatusCode.ERROR))
+
+    def end(self):
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        if self.status == "UNSET":
+            self.status = "OK"
+        if self._otel is not None:
+            self._otel.end()
+        recorder.on_end(self)
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "attributes": dict(self.attributes),
+            "status": self.status,
+        }
+
+
+class TraceRecorder:
+    """
+    Collects finished spans per trace and hands complete traces to the exporters.
+    The latest trace per session is kept in memory for the debug view.
+    """
+
+    def __init__(self, exporters=TRACE_EXPORT, trace_file: str = TRACE_FILE,
+                 max_traces: int = MAX_RECORDED_TRACES):
+        self.exporters = set(exporters)
+        self.trace_file = trace_file
+        self.max_traces = max_traces
+        self._open: Dict[str, List[Span]] = {}
+        self._closed: "OrderedDict[str, None]" = OrderedDict()
+        self._latest: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._subscribers: List[Callable[[List[Dict[str, Any]]], None]] = []
+        self._lock = threading.Lock()
+
+    def on_end(self, span: Span):
+        with self._lock:
+            if span.trace_id in self._closed:
+                # Finished after its root (e.g. a crawl past the deadline): exported on its own
+                trace = [span.to_dict()]
+            else:
+                spans = self._open.setdefault(span.trace_id, [])
+                spans.append(span)
+                if span.parent_id is not None:
+                    return
+                # The root span closes the trace
+                del self._open[span.trace_id]
+                self._closed[span.trace_id] = None
+                trace = [s.to_dict() for s in sorted(spans, key=lambda s: s.start_ns)]
+                key = str(span.attributes.get("session_id", "default"))
+                self._latest[key] = trace
+                self._latest.move_to_end(key)
+                while len(self._latest) > self.max_traces:
+                    self._latest.popitem(last=False)
+                while len(self._closed) > self.max_traces:
+                    self._closed.popitem(last=False)
+        self._export(trace)
+
+    def subscribe(self, callback: Callable[[List[Dict[str, Any]]], None]):
+        """Also hand every finished trace to ``callback`` (called on the thread that ended the root)."""
+        self._subscribers.append(callback)
+
+    def _export(self, trace: List[Dict[str, Any]]):
+        for callback in self._subscribers:
+            callback(trace)
+        if "console" in self.exporters:
+            root = trace[0]
+            print(f"⏱️ {root['name']} ({(root['end_time_unix_nano'] - root['start_time_unix_nano']) / 1e6:.0f}ms)")
+            for span in trace[1:]:
+                print(f"   {span['name']:<32} {(span['end_time_unix_nano'] - span['start_time_unix_nano']) / 1e6:8.1f}ms")
+        if "jsonl" in self.exporters:
+            try:
+                os.makedirs(os.path.dirname(self.trace_file) or ".", exist_ok=True)
+                with open(self.trace_file, "a", encoding="utf-8") as f:
+                    for span in trace:
+                        f.write(json.dumps(span, ensure_ascii=False, default=str) + "\n")
+            except OSError as e:
+                print(f"❌ خطا در نوشتن ردیابی: {str(e)}")
+
+    def last_trace(self, session_id: str = "default") -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._latest.get(session_id, []))
+
+
+# Shared recorder for all spans in the process
+recorder = TraceRecorder()
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def start_span(name: str, **attributes) -> Span:
+    """Start a child of the current span without making it current; call ``end()`` yourself."""
+    return Span(name, _current.get(), attributes)
+
+
+@contextmanager
+def use_span(span_: Span, end: bool = False):
+    """Make ``span_`` the current span inside the block."""
+    token = _current.set(span_)
+    try:
+        yield span_
+    except BaseException as e:
+        span_.record_error(e)
+        raise
+    finally:
+        _current.reset(token)
+        if end:
+            span_.end()
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time the block as a child of the current span (or as a new trace)."""
+    with use_span(start_span(name, **attributes), end=True) as s:
+        yield s
+
+
+def tracing_callback():
+    """LangChain callback handler that turns model and tool runs into spans."""
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class TracingCallbackHandler(BaseCallbackHandler):
+        def __init__(self):
+            self.spans: Dict[Any, Span] = {}
+            self.previous: Dict[Any, Optional[Span]] = {}
+
+        def _start(self, name: str, run_id, parent_run_id, **attributes) -> Span:
+            s = Span(name, self.spans.get(parent_run_id) or _current.get(), attributes)
+            self.spans[run_id] = s
+            return s
+
+        def _end(self, run_id, error: Optional[BaseException] = None):
+            s = self.spans.pop(run_id, None)
+            if s is not None:
+                if error is not None:
+                    s.record_error(error)
+                s.end()
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+            self._start("llm", run_id, parent_run_id)
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            self._end(run_id)
+
+        def on_llm_error(self, error, *, run_id, **kwargs):
+            self._end(run_id, error)
+
+        def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+            s = self._start(f"tool.{serialized.get('name', '')}", run_id, parent_run_id)
+            # Spans opened while the tool runs nest under it
+            self.previous[run_id] = _current.get()
+            _current.set(s)
+
+        def on_tool_end(self, output, *, run_id, **kwargs):
+            _current.set(self.previous.pop(run_id, None))
+            self._end(run_id)
+
+        def on_tool_error(self, error, *, run_id, **kwargs):
+            _current.set(self.previous.pop(run_id, None))
+            self._end(run_id, error)
+
+    return TracingCallbackHandler()